@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Compares the cost of handling a large list jobs response with requests'
+`Response.json()` against the client's raw bytes path, using the standard
+library decoder and, when installed, orjson.
+
+Usage, from the repository root:
+
+    PYTHONPATH=. python benchmarks/json_decode.py [--jobs N] [--repeat N]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import timeit
+
+from requests.models import Response
+
+from scrapyd_api.client import Client
+
+
+def make_response(jobs):
+    body = {
+        'status': 'ok',
+        'node_name': 'bench',
+        'pending': [],
+        'running': [],
+        'finished': [{
+            'id': '{0:032x}'.format(i),
+            'project': 'project',
+            'spider': 'spider',
+            'start_time': '2014-06-17 22:45:31.975358',
+            'end_time': '2014-06-23 14:01:18.209680',
+            'log_url': '/logs/project/spider/{0:032x}.log'.format(i),
+        } for i in range(jobs)],
+    }
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode('utf-8')
+    response.encoding = None
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--jobs', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    response = make_response(args.jobs)
+    print('{0} finished jobs, {1:.1f} MB body'.format(
+        args.jobs, len(response.content) / 1e6))
+
+    def baseline():
+        # What the client did before decoding straight from bytes.
+        fresh = make_copy(response)
+        data = fresh.json()
+        data.pop('status')
+
+    def make_copy(original):
+        copy = Response()
+        copy.status_code = original.status_code
+        copy._content = original._content
+        copy.encoding = None
+        return copy
+
+    cases = [('Response.json()', baseline)]
+    decoders = [('json.loads on bytes', json.loads)]
+    try:
+        import orjson
+        decoders.append(('orjson.loads on bytes', orjson.loads))
+    except ImportError:
+        pass
+    for name, loads in decoders:
+        client = Client(json_loads=loads)
+        cases.append((name, lambda client=client: client._handle_response(
+            make_copy(response))))
+
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print('{0:>24}: {1:8.1f} ms'.format(name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
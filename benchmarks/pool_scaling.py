@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Measures how throughput scales with the number of threads sharing a single
+ScrapydAPI, for the default connection pool and for one sized to the thread
+count, against a local stand-in for Scrapyd's daemon status endpoint.
+
+Usage, from the repository root:
+
+    PYTHONPATH=. python benchmarks/pool_scaling.py [--requests N] [--latency S]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from scrapyd_api import ScrapydAPI
+
+THREAD_COUNTS = (1, 4, 16, 64)
+BODY = json.dumps({'status': 'ok', 'running': 0, 'pending': 0,
+                   'finished': 0, 'node_name': 'bench'}).encode('utf-8')
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_handler(latency):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run(api, threads, total):
+    per_thread = max(total // threads, 1)
+
+    def work():
+        for _ in range(per_thread):
+            api.daemon_status()
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(work) for _ in range(threads)]:
+            future.result()
+    return per_thread * threads / (time.time() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='requests per measurement')
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='simulated server latency in seconds')
+    args = parser.parse_args()
+
+    # A full pool logs a warning for every discarded connection.
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+
+    server = StandInServer(('127.0.0.1', 0), make_handler(args.latency))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    target = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+    print('{0:>8} {1:>18} {2:>18}'.format('threads', 'default pool req/s',
+                                          'sized pool req/s'))
+    try:
+        for threads in THREAD_COUNTS:
+            default = run(ScrapydAPI(target), threads, args.requests)
+            sized = run(ScrapydAPI(target, pool_maxsize=threads,
+                                   pool_block=True),
+                        threads, args.requests)
+            print('{0:>8} {1:>18.0f} {2:>18.0f}'.format(threads, default,
+                                                        sized))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
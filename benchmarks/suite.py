@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Measures the library's overhead on its hot paths against a local
+`FakeScrapyd`: schedule throughput, list jobs round trips (in full and for
+running jobs only) at 1k, 10k and 100k jobs, job status lookups, daemon
+status throughput from many threads and the import time of the package.
+
+Results are written as JSON to benchmarks/results/<label>.json, so that runs
+for successive releases can be compared with --compare. The label defaults
+to the package version marked '+dev'; pass the plain version when measuring
+a release. An existing results file is only replaced with --force.
+--transport picks the transport the requests are made with, so that
+transports can be compared the same way.
+
+Usage, from the repository root:
+
+    PYTHONPATH=. python benchmarks/suite.py [--quick] [--label L] [--force]
+                                            [--transport requests|urllib3]
+                                            [--compare results/x.json]
+"""
+from __future__ import division, print_function
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+
+import scrapyd_api
+from scrapyd_api import ScrapydAPI, constants
+from scrapyd_api.client import Client
+from scrapyd_api.polling import index_job_states
+from scrapyd_api.testing import FakeScrapyd
+
+PROJECT = 'project'
+SPIDER = 'spider'
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'results')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRANSPORTS = ('requests', 'urllib3')
+
+IMPORT_SNIPPET = ('from timeit import default_timer; t = default_timer(); '
+                  'import scrapyd_api; print(default_timer() - t)')
+
+
+def load_transport(name):
+    """
+    Returns the transport class named on the command line, importing the
+    urllib3 transport only when it is asked for.
+    """
+    if name == 'urllib3':
+        from scrapyd_api.urllib3_transport import Urllib3Transport
+        return Urllib3Transport
+    return Client
+
+
+def best_of(func, repeat):
+    """
+    Returns the fastest of `repeat` timed calls to `func`, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = default_timer()
+        func()
+        timings.append(default_timer() - started)
+    return min(timings)
+
+
+def bench_import(repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SNIPPET], env=env)
+        timings.append(float(output.decode('ascii').strip()))
+    return {'import_ms': (min(timings) * 1000, 'ms')}
+
+
+def bench_schedule(target, calls, transport):
+    api = ScrapydAPI(target, transport=transport)
+    seconds = best_of(lambda: [api.schedule(PROJECT, SPIDER)
+                               for _ in range(calls)], 3)
+    return {'schedule_per_s': (calls / seconds, 'calls/s')}
+
+
+def bench_list_jobs(sizes, repeat, transport):
+    results = {}
+    for size in sizes:
+        with FakeScrapyd() as server:
+            server.add_project(PROJECT)
+            job_ids = server.add_history(PROJECT, size)
+            api = ScrapydAPI(server.url, transport=transport)
+            api.list_jobs(PROJECT)  # Warms the server's listing cache.
+            seconds = best_of(lambda: api.list_jobs(PROJECT), repeat)
+            results['list_jobs_{0}_ms'.format(size)] = (seconds * 1000, 'ms')
+
+            seconds = best_of(lambda: api.list_jobs(
+                PROJECT, states=[constants.RUNNING]), repeat)
+            results['list_running_jobs_{0}_ms'.format(size)] = (
+                seconds * 1000, 'ms')
+
+            listing = api.list_jobs(PROJECT)
+            seconds = best_of(lambda: index_job_states(listing), repeat)
+            results['index_jobs_{0}_ms'.format(size)] = (seconds * 1000, 'ms')
+
+            job_id = job_ids[len(job_ids) // 2]
+            seconds = best_of(lambda: api.job_status(PROJECT, job_id),
+                              repeat)
+            results['job_status_{0}_ms'.format(size)] = (seconds * 1000, 'ms')
+    return results
+
+
+def bench_threads(target, thread_counts, calls, transport):
+    results = {}
+    for threads in thread_counts:
+        api = ScrapydAPI(target, pool_maxsize=threads, transport=transport)
+        per_thread = max(calls // threads, 1)
+
+        def work():
+            for _ in range(per_thread):
+                api.daemon_status()
+
+        started = default_timer()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(work) for _ in range(threads)]:
+                future.result()
+        seconds = default_timer() - started
+        results['daemon_status_{0}_threads_per_s'.format(threads)] = (
+            per_thread * threads / seconds, 'calls/s')
+    return results
+
+
+def compare(results, path):
+    with open(path) as fh:
+        previous = json.load(fh)
+    print('\nCompared with {0} ({1}):'.format(previous['label'], path))
+    for name, (value, unit) in sorted(results.items()):
+        if name not in previous['results']:
+            continue
+        old = previous['results'][name][0]
+        change = (value - old) / old * 100 if old else 0.0
+        # Lower is better for timings, higher for throughputs.
+        worse = change > 0 if unit == 'ms' else change < 0
+        print('{0:>32}: {1:>10.2f} -> {2:>10.2f} {3:<8} {4:+6.1f}%{5}'.format(
+            name, old, value, unit, change, '  (worse)' if worse else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller sizes and fewer repeats, for a smoke '
+                             'test rather than a measurement')
+    parser.add_argument('--label',
+                        default='{0}+dev'.format(scrapyd_api.__version__),
+                        help='names the results file')
+    parser.add_argument('--force', action='store_true',
+                        help='replace an existing results file')
+    parser.add_argument('--output', default=RESULTS_DIR,
+                        help='directory the results are written to')
+    parser.add_argument('--transport', choices=TRANSPORTS,
+                        default='requests',
+                        help='the transport requests are made with')
+    parser.add_argument('--compare', help='a previous results file')
+    args = parser.parse_args()
+    path = os.path.join(args.output, '{0}.json'.format(args.label))
+    if os.path.exists(path) and not args.force:
+        parser.error('{0} already exists; pick another --label or pass '
+                     '--force to replace it'.format(path))
+
+    # A full pool logs a warning for every discarded connection.
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+
+    if args.quick:
+        sizes, repeat, calls, threads = (1000,), 2, 200, (1, 8)
+    else:
+        sizes, repeat, calls, threads = (1000, 10000, 100000), 5, 2000, \
+            (1, 8, 32)
+
+    transport = load_transport(args.transport)
+    results = {}
+    results.update(bench_import(repeat))
+    with FakeScrapyd() as server:
+        server.add_project(PROJECT, spiders=[SPIDER])
+        results.update(bench_schedule(server.url, calls, transport))
+        results.update(bench_threads(server.url, threads, calls, transport))
+    results.update(bench_list_jobs(sizes, repeat, transport))
+
+    for name, (value, unit) in sorted(results.items()):
+        print('{0:>32}: {1:>10.2f} {2}'.format(name, value, unit))
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    with open(path, 'w') as fh:
+        json.dump({
+            'label': args.label,
+            'date': time.strftime('%Y-%m-%d'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+            'transport': args.transport,
+            'results': results,
+        }, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+    print('\nResults written to {0}'.format(path))
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from .cluster import ScrapydCluster
 from .constants import (
     FINISHED,
     PENDING,
@@ -18,4 +19,5 @@ __copyright__ = 'Copyright 2014 Darian Moody'
 
 VERSION = __version__
 
-__all__ = ['ScrapydError', 'ScrapydAPI', 'FINISHED', 'PENDING', 'RUNNING']
+__all__ = ['ScrapydError', 'ScrapydAPI', 'ScrapydCluster', 'FINISHED',
+           'PENDING', 'RUNNING']
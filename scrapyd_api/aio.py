@@ -0,0 +1,550 @@
+"""
+An asyncio flavour of the wrapper, backed by aiohttp.
+
+This module requires Python 3.6+ and the optional `aiohttp` dependency, which
+can be installed with `pip install python-scrapyd-api[async]`.
+"""
+from __future__ import unicode_literals
+
+import asyncio
+
+from . import constants
+from .base import BaseScrapydAPI
+from .compat import iteritems, json_loads as default_json_loads
+from .exceptions import ScrapydResponseError
+from .jobs import JobList
+from .logs import DEFAULT_CHUNK_SIZE
+from .polling import (
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    JobWaiter,
+    index_job_states
+)
+from .transport import handle_data, status_error
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncClient(object):
+    """
+    A small requests-like client built on an `aiohttp.ClientSession` whose
+    connector keeps a pool of keep-alive connections open to the target.
+    Responses are handled in the same Scrapyd-specific way as the
+    synchronous `scrapyd_api.client.Client`.
+
+    The underlying session is created lazily on the first request so that
+    the client can be instantiated outside of a running event loop. As with
+    the synchronous client, bodies are decoded from raw bytes with
+    `json_loads`.
+    """
+
+    def __init__(self, auth=None, limit=100, limit_per_host=0,
+                 keepalive_timeout=15, json_loads=None):
+        if aiohttp is None:
+            raise ImportError('AsyncClient requires the `aiohttp` package, '
+                              'install it with `pip install aiohttp`.')
+        self.auth = auth
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.json_loads = json_loads or default_json_loads
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _build_auth(self):
+        if self.auth is None:
+            return None
+        return aiohttp.BasicAuth(*self.auth)
+
+    def _build_timeout(self, timeout):
+        """
+        Converts a requests-style timeout, either a float or a
+        (connect timeout, read timeout) tuple, to the aiohttp equivalent.
+        """
+        if timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        if isinstance(timeout, (tuple, list)):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    def _build_form(self, data, files):
+        """
+        Flattens a requests-style `data` dict (whose values may be lists) and
+        `files` dict into an aiohttp form.
+        """
+        form = aiohttp.FormData()
+        for key, value in iteritems(data or {}):
+            if isinstance(value, (list, tuple)):
+                for item in value:
+                    form.add_field(key, str(item))
+            else:
+                form.add_field(key, str(value))
+        for key, value in iteritems(files or {}):
+            form.add_field(key, value, filename=key)
+        return form
+
+    def _handle_response(self, status, body):
+        """
+        Handles the response received from Scrapyd.
+        """
+        if status >= 400:
+            raise status_error(status, _text(body))
+        try:
+            data = self.json_loads(body)
+        except ValueError:
+            raise ScrapydResponseError("Scrapyd returned an invalid JSON "
+                                       "response: {0}".format(_text(body)))
+        return handle_data(data)
+
+    async def request(self, method, url, params=None, data=None, files=None,
+                      timeout=None):
+        session = self._get_session()
+        form = None
+        if data is not None or files is not None:
+            form = self._build_form(data, files)
+        async with session.request(
+                method, url, params=params, data=form,
+                auth=self._build_auth(),
+                timeout=self._build_timeout(timeout)) as response:
+            body = await response.read()
+            return self._handle_response(response.status, body)
+
+    async def iter_bytes(self, url, offset=0, chunk_size=65536,
+                         timeout=None):
+        """
+        Yields the raw body of a GET request to `url` in chunks, starting
+        `offset` bytes in; the asynchronous counterpart of
+        `Client.iter_bytes`.
+        """
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+        session = self._get_session()
+        async with session.get(
+                url, headers=headers, auth=self._build_auth(),
+                timeout=self._build_timeout(timeout)) as response:
+            if response.status == 416:
+                # Range not satisfiable: there is nothing past `offset`.
+                return
+            if response.status >= 400:
+                raise status_error(response.status,
+                                   _text(await response.read()))
+            skip = offset if response.status != 206 else 0
+            async for chunk in response.content.iter_chunked(chunk_size):
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk, skip = chunk[skip:], 0
+                yield chunk
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncLogTail(object):
+    """
+    The asynchronous counterpart of `scrapyd_api.logs.LogTail`: follows a
+    job's log, requesting only the bytes appended since the last read.
+    Iterate over it with `async for`.
+    """
+
+    def __init__(self, api, project, spider, job, offset=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=1.0):
+        self.api = api
+        self.project = project
+        self.spider = spider
+        self.job = job
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+
+    async def read_new(self):
+        """
+        Yields the chunks appended to the log since the last read. A log
+        which does not exist yet reads as empty.
+        """
+        chunks = self.api.job_log(self.project, self.spider, self.job,
+                                  offset=self.offset,
+                                  chunk_size=self.chunk_size)
+        try:
+            async for chunk in chunks:
+                self.offset += len(chunk)
+                yield chunk
+        except ScrapydResponseError as exc:
+            if exc.status_code != 404:
+                raise
+
+    async def follow(self):
+        """
+        Yields new chunks as they are written, until the job has finished (or
+        is unknown to Scrapyd) and the log has been read to the end.
+        """
+        while True:
+            received = False
+            async for chunk in self.read_new():
+                received = True
+                yield chunk
+            if received:
+                continue
+            state = await self.api.job_status(self.project, self.job)
+            if state in (constants.FINISHED, ''):
+                # Catch anything written between the last read and the end.
+                async for chunk in self.read_new():
+                    yield chunk
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def __aiter__(self):
+        return self.follow()
+
+
+class AsyncScrapydAPI(BaseScrapydAPI):
+    """
+    The asyncio equivalent of `ScrapydAPI`. Its request methods are
+    coroutines returning what their synchronous counterparts return, with
+    these differences:
+
+    - only the target, auth, endpoints, client and timeout arguments are
+      accepted; caching, retries, circuit breaking, hooks, coalescing and
+      custom transports are not supported,
+    - `add_version` takes the egg's bytes only, without the `stream`,
+      `progress` and `use_mmap` options,
+    - `iter_job_transitions` and `job_log` are asynchronous generators, and
+      `tail_log` returns an `AsyncLogTail`, all used with `async for`.
+
+    Use it as an async context manager, or call `close()`, to release the
+    pooled connections when finished.
+    """
+
+    def __init__(self, target='http://localhost:6800', auth=None,
+                 endpoints=None, client=None, timeout=None):
+        """
+        Instantiates the AsyncScrapydAPI wrapper for use.
+
+        Args:
+          target (str): the hostname/port to hit with requests.
+          auth (str, str): a 2-item tuple containing user/pass details. Only
+                           used when `client` is not passed.
+          endpoints: a dictionary of custom endpoints to apply on top of
+                     the pre-existing defaults.
+          client: a pre-instantiated client exposing coroutine `get` and
+                  `post` methods, and an `iter_bytes` asynchronous generator
+                  for the log methods. By default, an `AsyncClient`.
+          timeout: timeout for client requests in seconds.
+        """
+        super(AsyncScrapydAPI, self).__init__(target, endpoints=endpoints,
+                                              timeout=timeout)
+        if client is None:
+            client = AsyncClient(auth=auth)
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the underlying client's pooled connections.
+        """
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            await close()
+
+    async def add_version(self, project, version, egg):
+        """
+        Adds a new project egg to the Scrapyd service.
+        """
+        url = self._build_url(constants.ADD_VERSION_ENDPOINT)
+        data = {
+            'project': project,
+            'version': version
+        }
+        files = {
+            'egg': egg
+        }
+        json = await self.client.post(url, data=data, files=files,
+                                      timeout=self.timeout)
+        return json['spiders']
+
+    async def cancel(self, project, job, signal=None):
+        """
+        Cancels a job from a specific project.
+        """
+        url = self._build_url(constants.CANCEL_ENDPOINT)
+        data = {
+            'project': project,
+            'job': job,
+        }
+        if signal is not None:
+            data['signal'] = signal
+        json = await self.client.post(url, data=data, timeout=self.timeout)
+        return json['prevstate']
+
+    async def cancel_many(self, project, job_ids, signal=None, max_workers=8,
+                          grace_period=None, escalation_signal='KILL',
+                          poll_interval=1.0):
+        """
+        Cancels many jobs concurrently, with at most `max_workers` requests
+        in flight, and optionally escalates; see `ScrapydAPI.cancel_many`.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def submit(job_id, signal=signal):
+            async with semaphore:
+                try:
+                    return await self.cancel(project, job_id, signal=signal)
+                except Exception as exc:
+                    return exc
+
+        job_ids = list(job_ids)
+        prevstates = dict(zip(job_ids, await asyncio.gather(
+            *[submit(job_id) for job_id in job_ids])))
+        if grace_period is None:
+            return prevstates
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + grace_period
+        remaining = [job_id for job_id, state in iteritems(prevstates)
+                     if state in (constants.PENDING, constants.RUNNING)]
+        while remaining:
+            active = await self._active_job_ids(project)
+            remaining = [job_id for job_id in remaining if job_id in active]
+            if not remaining or loop.time() >= deadline:
+                break
+            await asyncio.sleep(min(poll_interval,
+                                    max(deadline - loop.time(), 0)))
+        await asyncio.gather(*[submit(job_id, signal=escalation_signal)
+                               for job_id in remaining])
+        return prevstates
+
+    async def cancel_matching(self, project, spider=None,
+                              states=(constants.PENDING, constants.RUNNING),
+                              **kwargs):
+        """
+        Cancels every job of a project in the given `states`, optionally only
+        those of one `spider`; see `ScrapydAPI.cancel_matching`.
+        """
+        jobs = await self.list_jobs(project, states=list(states))
+        job_ids = [job['id'] for state in states for job in jobs[state]
+                   if spider is None or job.get('spider') == spider]
+        return await self.cancel_many(project, job_ids, **kwargs)
+
+    async def _active_job_ids(self, project):
+        """
+        Returns the ids of a project's pending and running jobs.
+        """
+        jobs = await self.list_jobs(
+            project, states=[constants.PENDING, constants.RUNNING])
+        return set(job['id'] for state in (constants.PENDING,
+                                           constants.RUNNING)
+                   for job in jobs[state])
+
+    async def delete_project(self, project):
+        """
+        Deletes all versions of a project.
+        """
+        url = self._build_url(constants.DELETE_PROJECT_ENDPOINT)
+        data = {
+            'project': project,
+        }
+        await self.client.post(url, data=data, timeout=self.timeout)
+        return True
+
+    async def delete_version(self, project, version):
+        """
+        Deletes a specific version of a project.
+        """
+        url = self._build_url(constants.DELETE_VERSION_ENDPOINT)
+        data = {
+            'project': project,
+            'version': version
+        }
+        await self.client.post(url, data=data, timeout=self.timeout)
+        return True
+
+    async def job_status(self, project, job_id):
+        """
+        Retrieves the 'status' of a specific job specified by its id.
+        """
+        all_jobs = await self.list_jobs(project)
+        # Job not found, state unknown.
+        return index_job_states(all_jobs).get(job_id, '')
+
+    async def job_statuses(self, project, job_ids):
+        """
+        Retrieves the 'status' of many jobs at once from a single listing.
+        """
+        index = index_job_states(await self.list_jobs(project))
+        return dict((job_id, index.get(job_id, '')) for job_id in job_ids)
+
+    async def iter_job_transitions(self, project, job_ids, timeout=None,
+                                   min_interval=DEFAULT_MIN_INTERVAL,
+                                   max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        Yields a `JobTransition` each time one of the given jobs changes
+        state, stopping once all of them are finished or unknown; an
+        asynchronous generator, to be used with `async for`.
+        """
+        waiter = JobWaiter(job_ids, timeout=timeout,
+                           min_interval=min_interval,
+                           max_interval=max_interval)
+        while True:
+            for transition in waiter.update(await self.list_jobs(project)):
+                yield transition
+            if waiter.done:
+                return
+            await asyncio.sleep(waiter.next_wait())
+
+    async def wait_for_jobs(self, project, job_ids, timeout=None,
+                            min_interval=DEFAULT_MIN_INTERVAL,
+                            max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        Waits until all of the given jobs are finished or unknown, polling
+        the list jobs endpoint once per interval for all of them. Returns a
+        dict of job id to final state.
+        """
+        waiter = JobWaiter(job_ids, timeout=timeout,
+                           min_interval=min_interval,
+                           max_interval=max_interval)
+        while True:
+            waiter.update(await self.list_jobs(project))
+            if waiter.done:
+                return dict(waiter.states)
+            await asyncio.sleep(waiter.next_wait())
+
+    def job_log(self, project, spider, job, offset=0,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Returns an asynchronous generator of the chunks of a job's log,
+        starting `offset` bytes in; requires a client with an `iter_bytes`
+        method such as `AsyncClient`.
+        """
+        url = self._build_log_url(project, spider, job)
+        return self.client.iter_bytes(url, offset=offset,
+                                      chunk_size=chunk_size,
+                                      timeout=self.timeout)
+
+    def tail_log(self, project, spider, job, offset=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=1.0):
+        """
+        Returns an `AsyncLogTail` which follows a job's log.
+        """
+        return AsyncLogTail(self, project, spider, job, offset=offset,
+                            chunk_size=chunk_size,
+                            poll_interval=poll_interval)
+
+    async def list_jobs(self, project, typed=False, states=None):
+        """
+        Lists all known jobs for a project, optionally as a
+        `scrapyd_api.jobs.JobList` or only in the given `states`. The
+        response is decoded in full either way.
+        """
+        url = self._build_url(constants.LIST_JOBS_ENDPOINT)
+        params = {'project': project}
+        jobs = await self.client.get(url, params=params, timeout=self.timeout)
+        if states is not None:
+            jobs = dict((key, value) for key, value in iteritems(jobs)
+                        if key in states or key == 'node_name')
+            for state in states:
+                jobs.setdefault(state, [])
+        if typed:
+            return JobList.from_response(jobs)
+        return jobs
+
+    async def list_projects(self):
+        """
+        Lists all deployed projects.
+        """
+        url = self._build_url(constants.LIST_PROJECTS_ENDPOINT)
+        json = await self.client.get(url, timeout=self.timeout)
+        return json['projects']
+
+    async def list_spiders(self, project):
+        """
+        Lists all known spiders for a specific project.
+        """
+        url = self._build_url(constants.LIST_SPIDERS_ENDPOINT)
+        params = {'project': project}
+        json = await self.client.get(url, params=params, timeout=self.timeout)
+        return json['spiders']
+
+    async def list_versions(self, project):
+        """
+        Lists all deployed versions of a specific project.
+        """
+        url = self._build_url(constants.LIST_VERSIONS_ENDPOINT)
+        params = {'project': project}
+        json = await self.client.get(url, params=params, timeout=self.timeout)
+        return json['versions']
+
+    async def schedule(self, project, spider, settings=None, **kwargs):
+        """
+        Schedules a spider from a specific project to run.
+        """
+        url = self._build_url(constants.SCHEDULE_ENDPOINT)
+        data = {
+            'project': project,
+            'spider': spider
+        }
+        data.update(kwargs)
+        if settings:
+            setting_params = []
+            for setting_name, value in iteritems(settings):
+                setting_params.append('{0}={1}'.format(setting_name, value))
+            data['setting'] = setting_params
+        json = await self.client.post(url, data=data, timeout=self.timeout)
+        return json['jobid']
+
+    async def schedule_many(self, requests, max_workers=8):
+        """
+        Schedules many spider runs concurrently, with at most `max_workers`
+        requests in flight. Returns a list of job ids or exceptions in the
+        same order as the requests.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def submit(request):
+            async with semaphore:
+                try:
+                    return await self.schedule(**request)
+                except Exception as exc:
+                    return exc
+
+        return list(await asyncio.gather(*[submit(request)
+                                           for request in requests]))
+
+    async def daemon_status(self):
+        """
+        Displays the load status of a service.
+        :rtype: dict
+        """
+        url = self._build_url(constants.DAEMON_STATUS_ENDPOINT)
+        json = await self.client.get(url, timeout=self.timeout)
+        return json
+
+
+def _text(body):
+    return body.decode('utf-8', 'replace')
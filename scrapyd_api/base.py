@@ -0,0 +1,44 @@
+from __future__ import unicode_literals
+
+from copy import deepcopy
+
+from . import constants
+from .compat import quote, urljoin
+
+
+class BaseScrapydAPI(object):
+    """
+    The URL building shared by `scrapyd_api.ScrapydAPI` and the asyncio
+    `scrapyd_api.aio.AsyncScrapydAPI`: the target, its endpoints and the
+    request timeout. It makes no requests itself, so neither wrapper
+    inherits methods written for the other.
+    """
+
+    def __init__(self, target='http://localhost:6800', endpoints=None,
+                 timeout=None):
+        if endpoints is None:
+            endpoints = {}
+
+        self.target = target
+        self.timeout = timeout
+        self.endpoints = deepcopy(constants.DEFAULT_ENDPOINTS)
+        self.endpoints.update(endpoints)
+
+    def _build_url(self, endpoint):
+        """
+        Builds the absolute URL using the target and desired endpoint.
+        """
+        try:
+            path = self.endpoints[endpoint]
+        except KeyError:
+            msg = 'Unknown endpoint `{0}`'
+            raise ValueError(msg.format(endpoint))
+        absolute_url = urljoin(self.target, path)
+        return absolute_url
+
+    def _build_log_url(self, project, spider, job):
+        """
+        Builds the absolute URL of a job's log file.
+        """
+        path = '/'.join(quote(part) for part in (project, spider, job))
+        return self._build_url(constants.LOGS_ENDPOINT) + path + '.log'
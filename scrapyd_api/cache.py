@@ -0,0 +1,82 @@
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+from copy import copy
+
+from .compat import monotonic
+
+DEFAULT_TTL = 60
+DEFAULT_MAXSIZE = 1024
+
+
+class TTLCache(object):
+    """
+    A small thread-safe in-memory cache whose entries expire after a
+    per-endpoint time to live and which evicts the least recently used entry
+    once `maxsize` entries are held.
+
+    Entries are keyed by endpoint name plus a key within that endpoint,
+    typically the project name, so that one project's entries can be
+    invalidated without touching another's.
+    """
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL,
+                 maxsize=DEFAULT_MAXSIZE, timer=monotonic):
+        """
+        Args:
+          ttls: a dict of endpoint name to time to live in seconds.
+          default_ttl (float): the time to live of endpoints missing from
+                               `ttls`.
+          maxsize (int): the maximum number of entries held.
+          timer: the clock used to expire entries.
+        """
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.maxsize = maxsize
+        self.timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, endpoint, key=None, default=None):
+        """
+        Returns a copy of the live entry for `endpoint` and `key`, or
+        `default` when there is none.
+        """
+        with self._lock:
+            try:
+                expires, value = self._entries.pop((endpoint, key))
+            except KeyError:
+                return default
+            if expires <= self.timer():
+                return default
+            # Re-insert to mark the entry as the most recently used.
+            self._entries[(endpoint, key)] = (expires, value)
+            return copy(value)
+
+    def set(self, endpoint, key, value):
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop((endpoint, key), None)
+            self._entries[(endpoint, key)] = (self.timer() + ttl, copy(value))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint, key=None):
+        """
+        Drops the entry for `endpoint` and `key`, if any.
+        """
+        with self._lock:
+            self._entries.pop((endpoint, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,38 +1,110 @@
 from __future__ import unicode_literals
 
+from contextlib import closing
+
 from requests import Session
+from requests.adapters import HTTPAdapter
 
 from .exceptions import ScrapydResponseError
+from .streaming import filter_object
+from .transport import Transport, skip_bytes, status_error
 
 
-class Client(Session):
+class Client(Session, Transport):
     """
     The client is a thin wrapper around the requests Session class which
     allows us to wrap the response handler so that we can handle it in a
-    Scrapyd-specific way.
+    Scrapyd-specific way. It is the default `Transport`.
+
+    The connection pool can be tuned for use from many threads at once:
+    `pool_connections` is the number of per-host pools kept, `pool_maxsize`
+    the number of connections kept open to each host, and `pool_block`
+    whether a request waits for a free connection rather than opening an
+    extra, unpooled one once `pool_maxsize` are in use. Setting `keep_alive`
+    to False closes each connection after its request.
+
+    Response bodies are decoded straight from the raw bytes with `json_loads`,
+    which defaults to the standard library's `json.loads` but can be swapped
+    for a faster drop-in such as `orjson.loads`; the body is only decoded to
+    text when it is needed for an error message.
     """
 
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, json_loads=None):
+        super(Client, self).__init__()
+        if json_loads is not None:
+            self.json_loads = json_loads
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
     def _handle_response(self, response):
         """
         Handles the response received from Scrapyd.
         """
-        if not response.ok:
-            raise ScrapydResponseError(
-                "Scrapyd returned a {0} error: {1}".format(
-                    response.status_code,
-                    response.text))
-
+        self._check_status_code(response)
         try:
-            json = response.json()
+            data = self.json_loads(response.content)
         except ValueError:
             raise ScrapydResponseError("Scrapyd returned an invalid JSON "
                                        "response: {0}".format(response.text))
-        if json['status'] == 'ok':
-            json.pop('status')
-            return json
-        elif json['status'] == 'error':
-            raise ScrapydResponseError(json['message'])
+        return self._handle_data(data)
+
+    def _check_status_code(self, response):
+        if response.status_code >= 400:
+            raise status_error(response.status_code, response.text)
 
     def request(self, *args, **kwargs):
         response = super(Client, self).request(*args, **kwargs)
         return self._handle_response(response)
+
+    def get_members(self, url, keys, chunk_size=65536, **kwargs):
+        """
+        Makes a GET request and handles the JSON response like `request`,
+        except that only the top level members named in `keys` are decoded.
+
+        The body is parsed incrementally as it is streamed in, and the
+        values of all other members are skipped over without being decoded,
+        so memory use stays flat however large they are.
+        """
+        keys = frozenset(keys) | frozenset(['status', 'message'])
+        response = super(Client, self).request('GET', url, stream=True,
+                                               **kwargs)
+        with closing(response):
+            self._check_status_code(response)
+            try:
+                data = filter_object(response.iter_content(chunk_size), keys,
+                                     self.json_loads)
+            except ValueError:
+                raise ScrapydResponseError("Scrapyd returned an invalid JSON "
+                                           "response")
+        return self._handle_data(data)
+
+    def iter_bytes(self, url, offset=0, chunk_size=65536, **kwargs):
+        """
+        Yields the raw body of a GET request to `url` in chunks, starting
+        `offset` bytes in, without buffering the whole body in memory.
+
+        A `Range` request is made so only the bytes from `offset` onwards are
+        transferred; should the server ignore it the leading bytes are
+        discarded as they arrive instead. Nothing is yielded when `offset` is
+        already at the end of the body.
+        """
+        headers = kwargs.pop('headers', None) or {}
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+        response = super(Client, self).request('GET', url, headers=headers,
+                                               stream=True, **kwargs)
+        with closing(response):
+            if response.status_code == 416:
+                # Range not satisfiable: there is nothing past `offset`.
+                return
+            if not response.ok:
+                raise status_error(response.status_code, response.text)
+            skip = offset if response.status_code != 206 else 0
+            for chunk in skip_bytes(response.iter_content(chunk_size), skip):
+                yield chunk
@@ -0,0 +1,440 @@
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from io import BytesIO
+
+from .exceptions import ScrapydBusyError, ScrapydTimeoutError
+from .jobs import JobList
+from .wrapper import ScrapydAPI
+
+# The request timeout of the nodes a cluster builds, in seconds, so that a
+# node which accepts connections but never answers frees its thread.
+DEFAULT_NODE_TIMEOUT = 60.0
+
+
+class ClusterResult(object):
+    """
+    The outcome of a call fanned out across a cluster. `results` maps each
+    target which answered successfully to its return value, `errors` maps
+    each target which failed to the exception it raised. When a failed
+    deploy was rolled back, `rollback` holds the result of the rollback.
+    """
+
+    def __init__(self, results=None, errors=None, rollback=None):
+        self.results = results if results is not None else OrderedDict()
+        self.errors = errors if errors is not None else OrderedDict()
+        self.rollback = rollback
+
+    @property
+    def ok(self):
+        """
+        True when every node in the cluster answered successfully.
+        """
+        return not self.errors
+
+    def __getitem__(self, target):
+        if target in self.errors:
+            raise self.errors[target]
+        return self.results[target]
+
+    def __repr__(self):
+        return 'ClusterResult(results={0!r}, errors={1!r})'.format(
+            dict(self.results), dict(self.errors))
+
+
+class ClusterJobs(object):
+    """
+    The jobs of many projects across a cluster, merged into one index of
+    `scrapyd_api.jobs.Job` records keyed by `(target, project, job_id)`.
+    `errors` maps the `(target, project)` listings which failed to the
+    exception raised; the project is None when the node's projects could not
+    be listed.
+    """
+
+    def __init__(self):
+        self.jobs = OrderedDict()
+        self.errors = OrderedDict()
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_listing(self, target, project, all_jobs):
+        """
+        Adds the jobs of one `list_jobs` response from `target`.
+        """
+        for job in JobList.from_response(all_jobs):
+            job.project = project
+            self.jobs[(target, project, job.id)] = job
+
+    def by_state(self, state):
+        """
+        Returns a dict of the jobs in `state`, with the same keys.
+        """
+        return OrderedDict((key, job) for key, job in self.jobs.items()
+                           if job.state == state)
+
+    def __getitem__(self, key):
+        return self.jobs[key]
+
+    def __contains__(self, key):
+        return key in self.jobs
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+    def __repr__(self):
+        return 'ClusterJobs(jobs={0}, errors={1!r})'.format(
+            len(self.jobs), dict(self.errors))
+
+
+class ScrapydCluster(object):
+    """
+    Wraps a `ScrapydAPI` per Scrapyd node and issues calls to all of them
+    concurrently on a thread pool, so a cluster-wide call costs roughly one
+    round trip to the slowest node rather than one round trip per node.
+    """
+
+    def __init__(self, targets, auth=None, endpoints=None,
+                 timeout=DEFAULT_NODE_TIMEOUT,
+                 max_workers=None, retry=None, circuit_breaker=False,
+                 hooks=None, cache=False, coalesce=False, transport=None,
+                 json_loads=None):
+        """
+        Instantiates the cluster for use.
+
+        Args:
+          targets: an iterable of hostname/port strings, or pre-instantiated
+                   `ScrapydAPI` objects, one per Scrapyd node.
+          auth (str, str): user/pass details applied to every node built
+                           from a target string.
+          endpoints: custom endpoints applied to every node built from a
+                     target string.
+          timeout: per-request timeout applied to every node built from a
+                   target string, `DEFAULT_NODE_TIMEOUT` by default. With
+                   None, a node which never answers holds a thread until
+                   the interpreter exits.
+          max_workers: the size of the thread pool; defaults to one thread
+                       per node, which each node only ever holds one of.
+          retry: a `scrapyd_api.retry.RetryPolicy` applied to every node
+                 built from a target string.
+          circuit_breaker (bool): whether every node built from a target
+                                  string gets its own circuit breaker.
+          hooks: request hooks, such as a shared
+                 `scrapyd_api.metrics.MetricsCollector`, applied to every
+                 node built from a target string.
+          cache (bool): whether every node built from a target string
+                        caches its project metadata, as per `ScrapydAPI`.
+          coalesce (bool): whether every node built from a target string
+                           coalesces concurrent identical reads, as per
+                           `ScrapydAPI`.
+          transport: the `scrapyd_api.transport.Transport` class each node
+                     built from a target string makes its requests with.
+          json_loads: the JSON decoder every node built from a target
+                      string decodes responses with, as per `ScrapydAPI`.
+        """
+        self.nodes = OrderedDict()
+        for target in targets:
+            if isinstance(target, ScrapydAPI):
+                api = target
+            else:
+                api = ScrapydAPI(target, auth=auth, endpoints=endpoints,
+                                 timeout=timeout, retry=retry,
+                                 circuit_breaker=circuit_breaker or None,
+                                 hooks=hooks, cache=cache or None,
+                                 coalesce=coalesce, transport=transport,
+                                 json_loads=json_loads)
+            self.nodes[api.target] = api
+        self.max_workers = max_workers or max(len(self.nodes), 1)
+        self._executor = None
+        self._abandoned = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        """
+        Shuts down the thread pool without waiting on outstanding calls.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def call(self, method, *args, **kwargs):
+        """
+        Calls `method` on every node concurrently with the given arguments.
+
+        The optional `deadline` keyword argument bounds, in seconds, how long
+        to wait for the slowest node; nodes which have not answered by then
+        are reported in the result's errors as a `ScrapydTimeoutError`.
+        """
+        deadline = kwargs.pop('deadline', None)
+        calls = OrderedDict()
+        for target, api in self.nodes.items():
+            calls[target] = partial(getattr(api, method), *args, **kwargs)
+        return self._collect(self._submit(calls), deadline)
+
+    def _submit(self, calls):
+        """
+        Submits a dict of target to function to the thread pool and returns
+        a dict of futures with the same keys.
+
+        A node still running a call which outlived its deadline is not given
+        more work to queue behind it: its futures fail straight away with a
+        `ScrapydBusyError`, so one hung node cannot take over the pool.
+        """
+        futures = OrderedDict()
+        with self._lock:
+            for target, func in calls.items():
+                if any(not future.done()
+                       for future in self._abandoned.get(target, ())):
+                    future = Future()
+                    future.set_exception(ScrapydBusyError(
+                        'Node {0} is still busy with an earlier '
+                        'call'.format(target)))
+                else:
+                    future = self.executor.submit(func)
+                futures[target] = future
+        return futures
+
+    def _collect(self, futures, deadline):
+        """
+        Waits up to `deadline` seconds on a dict of futures keyed by target
+        and gathers their outcomes into a `ClusterResult`.
+        """
+        wait(list(futures.values()), timeout=deadline)
+
+        result = ClusterResult()
+        for target, future in futures.items():
+            if not future.done():
+                if not future.cancel():
+                    self._abandon(target, future)
+                result.errors[target] = ScrapydTimeoutError(
+                    'Node {0} did not answer within {1}s'.format(
+                        target, deadline))
+                continue
+            exc = future.exception()
+            if exc is not None:
+                result.errors[target] = exc
+            else:
+                result.results[target] = future.result()
+        return result
+
+    def _abandon(self, target, future):
+        """
+        Marks `target` as busy until `future`, a call which is still running
+        past its deadline, finishes.
+        """
+        with self._lock:
+            self._abandoned.setdefault(target, []).append(future)
+        future.add_done_callback(partial(self._release, target))
+
+    def _release(self, target, future):
+        with self._lock:
+            running = [abandoned for abandoned
+                       in self._abandoned.get(target, ())
+                       if not abandoned.done()]
+            if running:
+                self._abandoned[target] = running
+            else:
+                self._abandoned.pop(target, None)
+
+    def add_version(self, project, version, egg, targets=None,
+                    max_concurrency=None, rollback=False, deadline=None):
+        """
+        Uploads one egg as a new project version to every node, or to the
+        given `targets`, concurrently. The result maps each node to the
+        number of spiders it found in the egg.
+
+        The egg, given as bytes, a path or a file opened in binary mode, is
+        read once and every node streams its upload from that one copy.
+        At most `max_concurrency` uploads run at a time, by default one per
+        node. With `rollback`, if some nodes fail the version is deleted
+        again from those which succeeded, so the cluster is not left running
+        mixed versions; the outcome is in the result's `rollback`.
+        """
+        data = self._read_egg(egg)
+        if targets is None:
+            targets = list(self.nodes)
+        workers = min(max_concurrency or len(targets), len(targets)) or 1
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = OrderedDict()
+            for target in targets:
+                futures[target] = executor.submit(
+                    self.nodes[target].add_version, project, version,
+                    BytesIO(data), stream=True)
+            result = self._collect(futures, deadline)
+        finally:
+            executor.shutdown(wait=False)
+
+        if rollback and result.errors:
+            # Uploads which missed the deadline may still succeed, so they
+            # are waited on and rolled back as well.
+            late = [future for target, future in futures.items()
+                    if target in result.errors and not future.cancelled()]
+            wait(late)
+            succeeded = [target for target, future in futures.items()
+                         if target in result.results or
+                         (future in late and future.exception() is None)]
+            if succeeded:
+                calls = OrderedDict()
+                for target in succeeded:
+                    calls[target] = partial(self.nodes[target].delete_version,
+                                            project, version)
+                result.rollback = self._collect(self._submit(calls),
+                                                deadline)
+        return result
+
+    def _read_egg(self, egg):
+        if isinstance(egg, bytes):
+            return egg
+        if hasattr(egg, 'read'):
+            return egg.read()
+        with open(egg, 'rb') as fh:
+            return fh.read()
+
+    def deploy(self, project, project_dir, builder=None,
+               max_concurrency=None, rollback=False, deadline=None):
+        """
+        Builds `project_dir` once and deploys it as `project` to every node
+        whose newest version does not already have the same contents; see
+        `scrapyd_api.deploy.deploy`.
+
+        Nodes which were already up to date are reported with a result of
+        None, and nodes whose versions could not be listed are deployed to.
+        Returns the `ClusterResult` of the upload.
+        """
+        # Imported here as deploying is rare next to the other calls, and
+        # the module pulls in subprocess, hashlib and tempfile.
+        from .deploy import (EggBuilder, content_version, fingerprint,
+                             hash_project)
+        digest = hash_project(project_dir)
+        current = fingerprint(digest)
+        listed = self.list_versions(project, deadline=deadline)
+        up_to_date = [target for target, versions in listed.results.items()
+                      if versions and versions[-1].split('.')[-1] == current]
+        stale = [target for target in self.nodes if target not in up_to_date]
+
+        result = ClusterResult()
+        if stale:
+            if builder is None:
+                builder = EggBuilder()
+            egg = builder.build(project_dir, digest=digest)
+            result = self.add_version(
+                project, content_version(digest), egg, targets=stale,
+                max_concurrency=max_concurrency, rollback=rollback,
+                deadline=deadline)
+        for target in up_to_date:
+            result.results[target] = None
+        return result
+
+    def daemon_status(self, deadline=None):
+        """
+        Retrieves the load status of every node.
+        """
+        return self.call('daemon_status', deadline=deadline)
+
+    def job_status(self, project, job_id, deadline=None):
+        """
+        Retrieves the status of a job on every node.
+        """
+        return self.call('job_status', project, job_id, deadline=deadline)
+
+    def list_jobs(self, project, deadline=None, **kwargs):
+        """
+        Lists all known jobs for a project on every node. Accepts the same
+        `typed` and `states` arguments as `ScrapydAPI.list_jobs`.
+        """
+        return self.call('list_jobs', project, deadline=deadline, **kwargs)
+
+    def list_all_jobs(self, states=None, projects=None, deadline=None):
+        """
+        Lists the jobs of every project on every node as one `ClusterJobs`
+        index. Each node's projects are discovered first, then every node
+        lists its projects' jobs in turn, all nodes concurrently; one task
+        per node keeps a slow node from holding more than one thread of the
+        pool.
+
+        Pass `states` to only fetch the jobs in those states, as per
+        `ScrapydAPI.list_jobs`, and `projects` to skip discovery and list
+        the given projects on every node. With `cache=True` the discovered
+        project lists are reused between calls until they expire. The
+        `deadline` applies to discovery and to the listings separately;
+        listings a node had not reached by then are reported with its
+        `ScrapydTimeoutError`.
+        """
+        index = ClusterJobs()
+        if projects is None:
+            listed = self.list_projects(deadline=deadline)
+            for target, exc in listed.errors.items():
+                index.errors[(target, None)] = exc
+            found = listed.results
+        else:
+            found = OrderedDict((target, projects) for target in self.nodes)
+
+        listings = OrderedDict((target, {}) for target in found)
+        calls = OrderedDict()
+        for target, node_projects in found.items():
+            calls[target] = partial(self._list_node_jobs, target,
+                                    node_projects, states, listings[target])
+        result = self._collect(self._submit(calls), deadline)
+        for target, node_projects in found.items():
+            for project in node_projects:
+                outcome = listings[target].get(project, result.errors.get(
+                    target))
+                if isinstance(outcome, Exception):
+                    index.errors[(target, project)] = outcome
+                else:
+                    index.add_listing(target, project, outcome)
+        return index
+
+    def _list_node_jobs(self, target, projects, states, listings):
+        """
+        Lists the jobs of each of `projects` on one node in turn, recording
+        each listing, or the exception it raised, in `listings` as it goes
+        so that those finished before a deadline are kept.
+        """
+        for project in projects:
+            try:
+                listings[project] = self.nodes[target].list_jobs(
+                    project, states=states)
+            except Exception as exc:
+                listings[project] = exc
+
+    def list_projects(self, deadline=None):
+        """
+        Lists the deployed projects on every node.
+        """
+        return self.call('list_projects', deadline=deadline)
+
+    def list_spiders(self, project, deadline=None):
+        """
+        Lists the known spiders of a project on every node.
+        """
+        return self.call('list_spiders', project, deadline=deadline)
+
+    def list_versions(self, project, deadline=None):
+        """
+        Lists the deployed versions of a project on every node.
+        """
+        return self.call('list_versions', project, deadline=deadline)
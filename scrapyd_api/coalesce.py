@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+
+import threading
+from copy import copy
+
+from . import constants
+from .compat import iteritems
+
+# Endpoints which only read state, so that concurrent identical requests to
+# them may share one answer.
+COALESCED_ENDPOINTS = frozenset([
+    constants.DAEMON_STATUS_ENDPOINT,
+    constants.LIST_JOBS_ENDPOINT,
+    constants.LIST_PROJECTS_ENDPOINT,
+    constants.LIST_SPIDERS_ENDPOINT,
+    constants.LIST_VERSIONS_ENDPOINT,
+])
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Collapses concurrent calls made under the same key into one: the first
+    caller runs the function, and every caller arriving while it is still in
+    flight waits for and shares its result, or its exception.
+
+    Waiting callers receive a shallow copy of the result, as `TTLCache` hands
+    out, so the containers nested in it are shared and should be treated as
+    read-only. Once a call has returned, the next one under its key runs
+    afresh; nothing is cached.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, func):
+        """
+        Returns `func()`, or the result of the call already in flight under
+        `key`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy(call.result)
+
+        try:
+            call.result = func()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def request_key(method, url, kwargs):
+    """
+    Returns a hashable key identifying a request by its method, URL and
+    keyword arguments.
+    """
+    return (method, url, _freeze(kwargs))
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item))
+                            for key, item in iteritems(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
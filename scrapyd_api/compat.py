@@ -22,7 +22,27 @@ else:  # PY2
 
 try:
     # Python 3
-    from urllib.parse import urljoin
+    from urllib.parse import quote, urljoin
 except ImportError:
     # Python 2
+    from urllib import quote
     from urlparse import urljoin
+
+try:
+    # Python 3
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+if sys.version_info[:2] >= (3, 6) or PY2:
+    from json import loads as json_loads
+else:
+    import json
+
+    def json_loads(s, **kw):
+        # Python 3 before 3.6 only decodes text; it raises TypeError rather
+        # than ValueError when given the bytes of a response body.
+        if isinstance(s, bytes):
+            s = s.decode('utf-8')
+        return json.loads(s, **kw)
@@ -8,6 +8,7 @@ LIST_JOBS_ENDPOINT = 'list_jobs'
 LIST_PROJECTS_ENDPOINT = 'list_projects'
 LIST_SPIDERS_ENDPOINT = 'list_spiders'
 LIST_VERSIONS_ENDPOINT = 'list_versions'
+LOGS_ENDPOINT = 'logs'
 SCHEDULE_ENDPOINT = 'schedule'
 DAEMON_STATUS_ENDPOINT = 'daemonstatus'
 
@@ -20,6 +21,7 @@ DEFAULT_ENDPOINTS = {
     LIST_PROJECTS_ENDPOINT: '/listprojects.json',
     LIST_SPIDERS_ENDPOINT: '/listspiders.json',
     LIST_VERSIONS_ENDPOINT: '/listversions.json',
+    LOGS_ENDPOINT: '/logs/',
     SCHEDULE_ENDPOINT: '/schedule.json',
     DAEMON_STATUS_ENDPOINT: '/daemonstatus.json'
 }
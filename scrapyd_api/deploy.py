@@ -0,0 +1,192 @@
+from __future__ import unicode_literals
+
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from .exceptions import ScrapydError
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'scrapyd-api', 'eggs')
+
+# Build artefacts and VCS metadata which do not affect the built egg.
+IGNORED_DIRS = frozenset(['.git', '.hg', '.svn', '.tox', '__pycache__',
+                          'build', 'dist'])
+IGNORED_SUFFIXES = ('.pyc', '.pyo', '.egg-info')
+
+GENERATED_SETUP = """# Automatically created by python-scrapyd-api.
+from setuptools import setup, find_packages
+
+setup(
+    name={project!r},
+    version='1.0',
+    packages=find_packages(),
+    entry_points={{'scrapy': ['settings = {settings}']}},
+)
+"""
+
+
+class DeployResult(namedtuple('DeployResult', ['version', 'egg', 'uploaded',
+                                               'spiders'])):
+    """
+    The outcome of a deploy. `egg` is the path of the built egg, or None when
+    the deploy was skipped; `uploaded` is False when the target already had
+    the project's current contents; `spiders` is the number of spiders
+    Scrapyd reported, or None when nothing was uploaded.
+    """
+    __slots__ = ()
+
+
+def hash_project(project_dir):
+    """
+    Returns a SHA-256 hex digest of a project's source files: their paths
+    relative to `project_dir` and their contents. Build artefacts, bytecode
+    and VCS metadata are ignored so the digest only changes when the egg
+    would.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(name for name in dirs
+                         if name not in IGNORED_DIRS and
+                         not name.endswith(IGNORED_SUFFIXES))
+        for name in sorted(files):
+            if name.endswith(IGNORED_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, project_dir).replace(os.sep, '/')
+            digest.update(relative.encode('utf-8') + b'\0')
+            with open(path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(65536), b''):
+                    digest.update(chunk)
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def content_version(digest, timestamp=None):
+    """
+    Returns a version name which sorts by deploy time, so Scrapyd runs the
+    newest one, and ends in a numeric fingerprint of the content `digest`.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return '{0}.{1}'.format(int(timestamp), fingerprint(digest))
+
+
+def fingerprint(digest):
+    return str(int(digest[:12], 16))
+
+
+def read_settings_module(project_dir):
+    """
+    Reads the default settings module from a project's scrapy.cfg.
+    """
+    try:
+        from configparser import ConfigParser
+    except ImportError:  # Python 2
+        from ConfigParser import SafeConfigParser as ConfigParser
+    config = ConfigParser()
+    config.read(os.path.join(project_dir, 'scrapy.cfg'))
+    if not config.has_option('settings', 'default'):
+        raise ScrapydError('No setup.py in {0} and no default settings '
+                           'module in its scrapy.cfg'.format(project_dir))
+    return config.get('settings', 'default')
+
+
+class EggBuilder(object):
+    """
+    Builds project eggs and caches them by the digest of the project's
+    source, so an unchanged project is never built twice.
+
+    Eggs are built with the project's setup.py, exactly as `scrapyd-deploy`
+    does; when there is none a minimal one is generated from scrapy.cfg.
+    Each build runs in a temporary copy of the project, so the project
+    directory itself is never written to and concurrent builds of it do not
+    interfere.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, python=sys.executable):
+        self.cache_dir = cache_dir
+        self.python = python
+
+    def cached_egg(self, digest):
+        return os.path.join(self.cache_dir, digest + '.egg')
+
+    def build(self, project_dir, digest=None):
+        """
+        Returns the path to the egg for `project_dir`, building it only when
+        no egg for the project's current contents is cached.
+        """
+        if digest is None:
+            digest = hash_project(project_dir)
+        egg = self.cached_egg(digest)
+        if os.path.exists(egg):
+            return egg
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self._build(project_dir, egg)
+        return egg
+
+    def _build(self, project_dir, destination):
+        build_dir = tempfile.mkdtemp(prefix='scrapyd-api-')
+        try:
+            source_dir = os.path.join(build_dir, 'source')
+            out_dir = os.path.join(build_dir, 'out')
+            shutil.copytree(project_dir, source_dir, ignore=_ignored)
+            setup_py = os.path.join(source_dir, 'setup.py')
+            if not os.path.exists(setup_py):
+                name = os.path.basename(os.path.abspath(project_dir))
+                with open(setup_py, 'w') as fh:
+                    fh.write(GENERATED_SETUP.format(
+                        project=str(name),
+                        settings=read_settings_module(project_dir)))
+            process = subprocess.Popen(
+                [self.python, 'setup.py', 'bdist_egg', '-d', out_dir],
+                cwd=source_dir, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+            output = process.communicate()[0]
+            eggs = glob.glob(os.path.join(out_dir, '*.egg'))
+            if process.returncode != 0 or not eggs:
+                raise ScrapydError('Failed to build egg for {0}:\n{1}'.format(
+                    project_dir, output.decode('utf-8', 'replace')))
+            # Move into place atomically so concurrent builds never see a
+            # partially written egg.
+            partial = destination + '.partial'
+            shutil.move(eggs[0], partial)
+            os.rename(partial, destination)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def _ignored(directory, names):
+    """
+    Returns the build artefacts and VCS metadata among `names`, for
+    `shutil.copytree` to skip, as `hash_project` does.
+    """
+    return [name for name in names
+            if name in IGNORED_DIRS or name.endswith(IGNORED_SUFFIXES)]
+
+
+def deploy(api, project, project_dir, builder=None):
+    """
+    Deploys `project_dir` as `project` to the Scrapyd node behind `api`,
+    unless the node's newest version of the project already has the same
+    contents, in which case nothing is built or uploaded.
+
+    Versions are named by `content_version`. Returns a `DeployResult`.
+    """
+    digest = hash_project(project_dir)
+    versions = api.list_versions(project)
+    if versions and versions[-1].split('.')[-1] == fingerprint(digest):
+        return DeployResult(versions[-1], None, False, None)
+    if builder is None:
+        builder = EggBuilder()
+    egg = builder.build(project_dir, digest=digest)
+    version = content_version(digest)
+    spiders = api.add_version(project, version, egg, stream=True)
+    return DeployResult(version, egg, True, spiders)
@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+
+from collections import namedtuple
+from time import sleep
+
+from . import constants
+from .cluster import ScrapydCluster
+
+JOB_SCHEDULED = 'scheduled'
+JOB_STARTED = 'started'
+JOB_FINISHED = 'finished'
+JOB_DISAPPEARED = 'disappeared'
+
+# The event raised when a job is first seen in, or moves into, each state.
+STATE_EVENTS = {
+    constants.PENDING: JOB_SCHEDULED,
+    constants.RUNNING: JOB_STARTED,
+    constants.FINISHED: JOB_FINISHED,
+}
+
+
+class JobEvent(namedtuple('JobEvent', ['kind', 'target', 'project', 'job_id',
+                                       'job'])):
+    """
+    Something that happened to a job between two polls. `kind` is one of the
+    JOB_* constants of this module and `job` is the job's dict from the
+    latest list jobs response, or from the previous one for disappeared
+    jobs.
+    """
+    __slots__ = ()
+
+
+def snapshot_jobs(all_jobs):
+    """
+    Builds a dict of job id to (state, job dict) from a list jobs response.
+    Should a job appear under more than one state, the first in
+    `constants.JOB_STATES` wins.
+    """
+    snapshot = {}
+    for state in reversed(constants.JOB_STATES):
+        for job in all_jobs.get(state, ()):
+            snapshot[job['id']] = (state, job)
+    return snapshot
+
+
+def diff_snapshots(target, project, previous, current):
+    """
+    Returns the events which turn the `previous` snapshot into `current`,
+    in a single pass over each.
+    """
+    events = []
+    for job_id, (state, job) in current.items():
+        before = previous.get(job_id)
+        if before is None or before[0] != state:
+            events.append(JobEvent(STATE_EVENTS[state], target, project,
+                                   job_id, job))
+    for job_id, (state, job) in previous.items():
+        if job_id not in current:
+            events.append(JobEvent(JOB_DISAPPEARED, target, project, job_id,
+                                   job))
+    return events
+
+
+class JobWatcher(object):
+    """
+    Polls the list jobs endpoint for a set of projects, on a single node or
+    across a `ScrapydCluster`, and turns the differences between consecutive
+    responses into `JobEvent`s.
+
+    Each poll costs one list jobs call per project per node and one pass over
+    each response, however many callbacks are subscribed.
+    """
+
+    def __init__(self, source, projects, interval=5.0, emit_initial=False):
+        """
+        Args:
+          source: a `ScrapydAPI` or `ScrapydCluster` to poll.
+          projects: the names of the projects to watch.
+          interval (float): seconds between polls when iterating.
+          emit_initial (bool): whether the first poll reports every existing
+                               job as an event, rather than silently
+                               recording it as the baseline.
+        """
+        self.source = source
+        self.projects = list(projects)
+        self.interval = interval
+        self.emit_initial = emit_initial
+        self.subscribers = []
+        self._snapshots = {}
+
+    def subscribe(self, callback):
+        """
+        Registers `callback` to be called with every event produced by
+        `poll()`.
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def _fetch(self, project):
+        """
+        Returns a dict of target to list jobs response for `project`. Nodes
+        which fail to answer are left out so their jobs are not reported as
+        disappeared.
+        """
+        if isinstance(self.source, ScrapydCluster):
+            return self.source.list_jobs(project).results
+        return {self.source.target: self.source.list_jobs(project)}
+
+    def poll(self):
+        """
+        Polls every watched project once, dispatches the resulting events to
+        the subscribers and returns them.
+        """
+        events = []
+        for project in self.projects:
+            for target, all_jobs in self._fetch(project).items():
+                key = (target, project)
+                current = snapshot_jobs(all_jobs)
+                previous = self._snapshots.get(key)
+                self._snapshots[key] = current
+                if previous is None and not self.emit_initial:
+                    continue
+                events.extend(diff_snapshots(target, project,
+                                             previous or {}, current))
+        for callback in self.subscribers:
+            for event in events:
+                callback(event)
+        return events
+
+    def __iter__(self):
+        """
+        Polls forever, yielding events as they happen.
+        """
+        while True:
+            for event in self.poll():
+                yield event
+            sleep(self.interval)
@@ -20,3 +20,25 @@ class ScrapydError(Exception):
 class ScrapydResponseError(ScrapydError):
 
     default_detail = 'Scrapyd Response Error'
+
+    def __init__(self, detail=None, status_code=None):
+        super(ScrapydResponseError, self).__init__(detail)
+        self.status_code = status_code
+
+
+class ScrapydTimeoutError(ScrapydError):
+
+    default_detail = 'Scrapyd Timeout Error'
+
+
+class ScrapydBusyError(ScrapydTimeoutError):
+    """
+    Raised for a cluster node which is still busy with an earlier call that
+    outlived its deadline.
+    """
+    default_detail = 'Scrapyd Busy Error'
+
+
+class ScrapydCircuitOpenError(ScrapydError):
+
+    default_detail = 'Scrapyd Circuit Open Error'
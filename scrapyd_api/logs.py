@@ -0,0 +1,73 @@
+from __future__ import unicode_literals
+
+from time import sleep
+
+from . import constants
+from .exceptions import ScrapydResponseError
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class LogTail(object):
+    """
+    Follows a job's log file, remembering how many bytes have been read so
+    that each read only requests the bytes appended since the last one.
+    """
+
+    def __init__(self, api, project, spider, job, offset=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=1.0):
+        """
+        Args:
+          api: the `ScrapydAPI` serving the log.
+          project, spider, job: identify the job whose log to follow.
+          offset (int): the byte offset to start reading from.
+          chunk_size (int): the maximum size of the chunks yielded.
+          poll_interval (float): seconds to wait for new bytes when following.
+        """
+        self.api = api
+        self.project = project
+        self.spider = spider
+        self.job = job
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+
+    def read_new(self):
+        """
+        Yields the chunks appended to the log since the last read, advancing
+        the offset as they are consumed. A log which does not exist yet,
+        because the job has not started, reads as empty.
+        """
+        chunks = self.api.job_log(self.project, self.spider, self.job,
+                                  offset=self.offset,
+                                  chunk_size=self.chunk_size)
+        try:
+            for chunk in chunks:
+                self.offset += len(chunk)
+                yield chunk
+        except ScrapydResponseError as exc:
+            if exc.status_code != 404:
+                raise
+
+    def follow(self):
+        """
+        Yields new chunks as they are written, until the job has finished (or
+        is unknown to Scrapyd) and the log has been read to the end.
+        """
+        while True:
+            received = False
+            for chunk in self.read_new():
+                received = True
+                yield chunk
+            if received:
+                continue
+            state = self.api.job_status(self.project, self.job)
+            if state in (constants.FINISHED, ''):
+                # Catch anything written between the last read and the end.
+                for chunk in self.read_new():
+                    yield chunk
+                return
+            sleep(self.poll_interval)
+
+    def __iter__(self):
+        return self.follow()
@@ -0,0 +1,184 @@
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+
+from .compat import iteritems
+
+# The Prometheus client's default latency buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+class RequestInfo(object):
+    """
+    Describes one request made to Scrapyd, as passed to request hooks.
+
+    `endpoint` is the endpoint's name from `scrapyd_api.constants` and
+    `attempt` counts retries from zero. The remaining attributes are filled
+    in by the time `after_request` is called: `status_code` and the body
+    sizes in bytes are None when no response was received, and `error` is
+    the exception the request raised, if any.
+    """
+    __slots__ = ('endpoint', 'target', 'method', 'attempt', 'status_code',
+                 'bytes_sent', 'bytes_received', 'duration', 'error')
+
+    def __init__(self, endpoint, target, method, attempt=0):
+        self.endpoint = endpoint
+        self.target = target
+        self.method = method
+        self.attempt = attempt
+        self.status_code = None
+        self.bytes_sent = None
+        self.bytes_received = None
+        self.duration = None
+        self.error = None
+
+    def record_response(self, response, **kwargs):
+        """
+        A requests response hook which records the status and body sizes.
+        """
+        self.status_code = response.status_code
+        body = response.request.body
+        self.bytes_sent = len(body) if body is not None else 0
+        # Prefer the header so that streamed bodies are not read here.
+        length = response.headers.get('Content-Length')
+        if length is not None:
+            self.bytes_received = int(length)
+        else:
+            self.bytes_received = len(response.content)
+        return response
+
+
+class RequestHooks(object):
+    """
+    Base class for request instrumentation passed to `ScrapydAPI` with the
+    `hooks` argument. Both methods are called on the requesting thread and
+    do nothing by default.
+    """
+
+    def before_request(self, info):
+        """
+        Called with a `RequestInfo` just before a request is sent.
+        """
+
+    def after_request(self, info):
+        """
+        Called with the completed `RequestInfo` once a request has returned
+        or raised.
+        """
+
+
+class Histogram(object):
+    """
+    Counts observations into cumulative buckets, Prometheus style.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsCollector(RequestHooks):
+    """
+    Aggregates request counts, errors, latency histograms and bytes
+    transferred per endpoint and node, and renders them in the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='scrapyd_api'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = OrderedDict()
+            self.errors = OrderedDict()
+            self.durations = OrderedDict()
+            self.bytes_sent = OrderedDict()
+            self.bytes_received = OrderedDict()
+
+    def after_request(self, info):
+        key = (info.endpoint, info.target)
+        status = '' if info.status_code is None else str(info.status_code)
+        with self._lock:
+            _increment(self.requests, key + (status,))
+            if info.error is not None:
+                _increment(self.errors,
+                           key + (info.error.__class__.__name__,))
+            if key not in self.durations:
+                self.durations[key] = Histogram(self.buckets)
+            self.durations[key].observe(info.duration)
+            if info.bytes_sent is not None:
+                _increment(self.bytes_sent, key, info.bytes_sent)
+                _increment(self.bytes_received, key, info.bytes_received)
+
+    def to_prometheus(self):
+        """
+        Returns the collected metrics in the Prometheus text format.
+        """
+        key_labels = ('endpoint', 'target')
+        lines = []
+        with self._lock:
+            self._counter(lines, 'requests_total',
+                          'Requests made to Scrapyd.',
+                          key_labels + ('status',), self.requests)
+            self._counter(lines, 'request_errors_total',
+                          'Requests to Scrapyd which raised an exception.',
+                          key_labels + ('error',), self.errors)
+            self._counter(lines, 'request_bytes_total',
+                          'Request body bytes sent to Scrapyd.',
+                          key_labels, self.bytes_sent)
+            self._counter(lines, 'response_bytes_total',
+                          'Response body bytes received from Scrapyd.',
+                          key_labels, self.bytes_received)
+
+            name = self.prefix + '_request_duration_seconds'
+            lines.append('# HELP {0} Scrapyd request latency.'.format(name))
+            lines.append('# TYPE {0} histogram'.format(name))
+            for key, histogram in iteritems(self.durations):
+                labels = list(zip(key_labels, key))
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(_sample(name + '_bucket',
+                                         labels + [('le', repr(bound))],
+                                         count))
+                lines.append(_sample(name + '_bucket',
+                                     labels + [('le', '+Inf')],
+                                     histogram.count))
+                lines.append(_sample(name + '_sum', labels, histogram.sum))
+                lines.append(_sample(name + '_count', labels,
+                                     histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def _counter(self, lines, name, help_text, label_names, values):
+        name = '{0}_{1}'.format(self.prefix, name)
+        lines.append('# HELP {0} {1}'.format(name, help_text))
+        lines.append('# TYPE {0} counter'.format(name))
+        for key, value in iteritems(values):
+            lines.append(_sample(name, list(zip(label_names, key)), value))
+
+
+def _increment(counts, key, amount=1):
+    counts[key] = counts.get(key, 0) + amount
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _sample(name, labels, value):
+    rendered = ','.join('{0}="{1}"'.format(label, _escape(label_value))
+                        for label, label_value in labels)
+    return '{0}{{{1}}} {2}'.format(name, rendered, value)
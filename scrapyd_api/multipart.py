@@ -0,0 +1,167 @@
+from __future__ import unicode_literals
+
+import mmap
+import os
+import uuid
+from collections import namedtuple
+
+from .compat import iteritems, monotonic
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadProgress(namedtuple('UploadProgress',
+                                ['sent', 'total', 'elapsed'])):
+    """
+    A snapshot of an upload: bytes sent so far, the total body size in bytes
+    and the seconds elapsed since the first byte was read.
+    """
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """
+        The average throughput so far, in bytes per second.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.sent / self.elapsed
+
+
+class MultipartEncoder(object):
+    """
+    A file-like multipart/form-data body which reads a file part in chunks
+    as the body is sent, so memory use stays flat whatever the file's size.
+
+    The body's total length is known up front, which lets requests send it
+    with a Content-Length header rather than chunked transfer encoding.
+    """
+
+    def __init__(self, fields, name, fileobj, filename=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                 use_mmap=False):
+        """
+        Args:
+          fields: a dict of the plain form fields.
+          name: the form field name of the file part.
+          fileobj: a file object opened in binary mode, read from its
+                   current position to its end.
+          filename: the file name sent with the file part.
+          chunk_size (int): the size of the reads made from the file.
+          progress: an optional callable passed an `UploadProgress` after
+                    each chunk of the file is read.
+          use_mmap (bool): whether to read the file through a read-only
+                           memory map rather than with `read()` calls.
+        """
+        self.boundary = uuid.uuid4().hex
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+        start = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        self.file_size = fileobj.tell() - start
+        fileobj.seek(start)
+
+        self._mmap = None
+        self._mmap_pos = start
+        if use_mmap and self.file_size:
+            self._mmap = mmap.mmap(fileobj.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+        self._head = self._build_head(fields, name, filename or name)
+        self._tail = '\r\n--{0}--\r\n'.format(self.boundary).encode('utf-8')
+        self.len = len(self._head) + self.file_size + len(self._tail)
+        self.bytes_read = 0
+        self._file_read = 0
+        self._started = None
+        self._buffer = b''
+        self._buffer_pos = 0
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={0}'.format(self.boundary)
+
+    def __len__(self):
+        return self.len
+
+    def _build_head(self, fields, name, filename):
+        lines = []
+        for key, value in iteritems(fields):
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                lines.append('--{0}\r\n'.format(self.boundary))
+                lines.append('Content-Disposition: form-data; '
+                             'name="{0}"\r\n\r\n'.format(key))
+                lines.append('{0}\r\n'.format(item))
+        lines.append('--{0}\r\n'.format(self.boundary))
+        lines.append('Content-Disposition: form-data; name="{0}"; '
+                     'filename="{1}"\r\n'.format(name, filename))
+        lines.append('Content-Type: application/octet-stream\r\n\r\n')
+        return ''.join(lines).encode('utf-8')
+
+    def _read_file(self, size):
+        size = min(size, self.file_size - self._file_read)
+        if size <= 0:
+            return b''
+        if self._mmap is not None:
+            chunk = self._mmap[self._mmap_pos:self._mmap_pos + size]
+            self._mmap_pos += len(chunk)
+        else:
+            chunk = self.fileobj.read(size)
+        self._file_read += len(chunk)
+        if self.progress is not None:
+            self.progress(self.snapshot())
+        return chunk
+
+    def snapshot(self):
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = monotonic() - self._started
+        return UploadProgress(self._file_read, self.file_size, elapsed)
+
+    def read(self, size=-1):
+        """
+        Returns up to `size` bytes of the body, or the rest when `size` is
+        negative.
+        """
+        if self._started is None:
+            self._started = monotonic()
+        if size is None or size < 0:
+            size = self.len - self.bytes_read
+        chunks = []
+        wanted = size
+        while wanted > 0:
+            if self._buffer_pos >= len(self._buffer):
+                self._buffer = self._next_part()
+                self._buffer_pos = 0
+                if not self._buffer:
+                    break
+            end = self._buffer_pos + wanted
+            chunk = self._buffer[self._buffer_pos:end]
+            self._buffer_pos += len(chunk)
+            chunks.append(chunk)
+            wanted -= len(chunk)
+        data = b''.join(chunks)
+        self.bytes_read += len(data)
+        return data
+
+    def _next_part(self):
+        if self._head is not None:
+            head, self._head = self._head, None
+            return head
+        if self._file_read < self.file_size:
+            chunk = self._read_file(self.chunk_size)
+            if chunk:
+                return chunk
+            # The file shrank underneath us; stop reading it.
+            self._file_read = self.file_size
+        if self._tail is not None:
+            tail, self._tail = self._tail, None
+            return tail
+        return b''
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+from . import constants
+from .compat import monotonic
+from .exceptions import ScrapydTimeoutError
+
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 30.0
+
+
+class JobTransition(namedtuple('JobTransition',
+                               ['job_id', 'previous', 'state'])):
+    """
+    A change in a job's state. `previous` is None the first time a job is
+    seen; a `state` of '' means the job is not (or no longer) known to
+    Scrapyd.
+    """
+    __slots__ = ()
+
+
+DONE_STATES = (constants.FINISHED, '')
+
+
+def index_job_states(all_jobs):
+    """
+    Builds a dict of job id to state from a list jobs response, so that any
+    number of lookups cost one pass over the listing. Should a job appear
+    under more than one state, the first in `constants.JOB_STATES` wins.
+    """
+    index = {}
+    for state in reversed(constants.JOB_STATES):
+        for job in all_jobs.get(state, ()):
+            index[job['id']] = state
+    return index
+
+
+class AdaptiveInterval(object):
+    """
+    A polling interval which doubles each time it backs off, up to
+    `max_interval`, and drops back to `min_interval` when reset.
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, factor=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.current = min_interval
+
+    def reset(self):
+        self.current = self.min_interval
+        return self.current
+
+    def backoff(self):
+        self.current = min(self.current * self.factor, self.max_interval)
+        return self.current
+
+
+class JobWaiter(object):
+    """
+    Tracks the state of many jobs in one project from successive list jobs
+    responses, so that a single poll serves every watched job.
+
+    The poll interval adapts to what the jobs are doing: it stays at the
+    minimum while any job is pending or has just changed state, and backs off
+    towards the maximum while jobs are simply running.
+    """
+
+    def __init__(self, job_ids, timeout=None,
+                 min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, timer=None):
+        self.states = dict((job_id, None) for job_id in job_ids)
+        self.interval = AdaptiveInterval(min_interval, max_interval)
+        self.timer = timer or monotonic
+        self.timeout = timeout
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = self.timer() + timeout
+
+    @property
+    def done(self):
+        """
+        True once every watched job is finished or unknown to Scrapyd.
+        """
+        return all(state in DONE_STATES for state in self.states.values())
+
+    def update(self, all_jobs):
+        """
+        Applies a list jobs response and returns the resulting transitions.
+        """
+        index = index_job_states(all_jobs)
+        transitions = []
+        for job_id, previous in list(self.states.items()):
+            state = index.get(job_id, '')
+            if state != previous:
+                self.states[job_id] = state
+                transitions.append(JobTransition(job_id, previous, state))
+        waiting = any(state == constants.PENDING
+                      for state in self.states.values())
+        if transitions or waiting:
+            self.interval.reset()
+        else:
+            self.interval.backoff()
+        return transitions
+
+    def next_wait(self):
+        """
+        Returns how long to sleep before the next poll, raising
+        `ScrapydTimeoutError` once the timeout has passed.
+        """
+        wait = self.interval.current
+        if self.deadline is not None:
+            remaining = self.deadline - self.timer()
+            if remaining <= 0:
+                pending = sorted(job_id for job_id, state
+                                 in self.states.items()
+                                 if state not in DONE_STATES)
+                raise ScrapydTimeoutError(
+                    'Jobs still unfinished after {0}s: {1}'.format(
+                        self.timeout, ', '.join(pending)))
+            wait = min(wait, remaining)
+        return wait
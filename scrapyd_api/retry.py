@@ -0,0 +1,129 @@
+from __future__ import unicode_literals
+
+import random
+import threading
+
+from . import constants
+from .compat import monotonic
+from .exceptions import ScrapydCircuitOpenError, ScrapydResponseError
+
+# Endpoints which are safe to repeat should a request fail part way through.
+IDEMPOTENT_ENDPOINTS = frozenset([
+    constants.DAEMON_STATUS_ENDPOINT,
+    constants.LIST_JOBS_ENDPOINT,
+    constants.LIST_PROJECTS_ENDPOINT,
+    constants.LIST_SPIDERS_ENDPOINT,
+    constants.LIST_VERSIONS_ENDPOINT,
+])
+
+RETRY_STATUS_CODES = frozenset([500, 502, 503, 504])
+
+
+def is_node_failure(exc):
+    """
+    Whether an exception means the node itself is in trouble (it could not
+    be reached, timed out or answered with a 5xx), as opposed to Scrapyd
+    rejecting a request.
+    """
+    # Imported here so that importing the package does not import requests.
+    from requests.exceptions import ConnectionError, Timeout
+    if isinstance(exc, (ConnectionError, Timeout)):
+        return True
+    if isinstance(exc, ScrapydResponseError):
+        return exc.status_code in RETRY_STATUS_CODES
+    return False
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed requests are retried and how long to wait before
+    each attempt.
+
+    Only node failures (see `is_node_failure`) on the given endpoints are
+    retried; by default those are the read-only endpoints, which are safe to
+    repeat. Waits grow exponentially with "full jitter", i.e. a random
+    duration between zero and `backoff_factor * 2 ** attempt`, capped at
+    `max_backoff`, so that many clients retrying at once spread out.
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0,
+                 endpoints=IDEMPOTENT_ENDPOINTS):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.endpoints = frozenset(endpoints)
+
+    def should_retry(self, endpoint, exc, attempt):
+        """
+        Whether a request to `endpoint` which raised `exc` on its
+        zero-indexed `attempt` should be tried again.
+        """
+        return (attempt < self.max_retries and
+                endpoint in self.endpoints and
+                is_node_failure(exc))
+
+    def backoff(self, attempt):
+        """
+        Returns the seconds to wait before retrying after `attempt`.
+        """
+        ceiling = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker(object):
+    """
+    Fails requests to a node fast while it is unhealthy.
+
+    After `failure_threshold` consecutive node failures the circuit opens
+    and every request raises `ScrapydCircuitOpenError` without touching the
+    network. Once `recovery_timeout` seconds have passed the circuit goes
+    half open and lets `half_open_max_calls` probe requests through: a
+    success closes it again, a failure re-opens it for another timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0,
+                 half_open_max_calls=1, timer=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.timer = timer or monotonic
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises `ScrapydCircuitOpenError` if a request may not be made now.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.timer() - self._opened_at < self.recovery_timeout:
+                    raise ScrapydCircuitOpenError(
+                        'Circuit open after {0} consecutive failures'.format(
+                            self.failures))
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    raise ScrapydCircuitOpenError(
+                        'Circuit half open, waiting on probe requests')
+                self._probes += 1
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = self.timer()
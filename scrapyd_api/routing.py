@@ -0,0 +1,157 @@
+from __future__ import unicode_literals
+
+import threading
+
+from .compat import monotonic
+from .exceptions import ScrapydError
+
+
+class LoadAwareScheduler(object):
+    """
+    Routes `schedule()` calls across a `ScrapydCluster` to the node with the
+    most free capacity.
+
+    Free capacity is a node's slot limit minus its running and pending jobs,
+    as reported by Scrapyd's daemon status endpoint; a job is only routed to
+    a node with at least one free slot. The load view is cached
+    and refreshed by a background thread, so routing a call does not cost an
+    extra status round trip; between refreshes the view is kept up to date
+    by counting the jobs scheduled through this object. Without `start()`
+    there is no background thread, and `schedule()` refreshes the view
+    itself once it is older than `refresh_interval`.
+    """
+
+    def __init__(self, cluster, slots, refresh_interval=5.0, deadline=None):
+        """
+        Instantiates the scheduler for use.
+
+        Args:
+          cluster: the `ScrapydCluster` to route calls across.
+          slots: the number of concurrent jobs a node can take, either as an
+                 int applied to every node or a dict of target to int which
+                 must cover every node of the cluster.
+          refresh_interval (float): seconds between refreshes of the load
+                                    view.
+          deadline (float): how long a refresh waits for slow nodes; nodes
+                            which miss it are left out of routing until the
+                            next refresh they answer.
+        """
+        if isinstance(slots, dict):
+            missing = [target for target in cluster.nodes
+                       if target not in slots]
+            if missing:
+                raise ValueError('No slot limit given for {0}'.format(
+                    ', '.join(missing)))
+        self.cluster = cluster
+        self.slots = slots
+        self.refresh_interval = refresh_interval
+        self.deadline = deadline
+        self._load = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def slot_limit(self, target):
+        if isinstance(self.slots, dict):
+            return self.slots[target]
+        return self.slots
+
+    def refresh(self):
+        """
+        Refreshes the load view from every node's daemon status. Nodes which
+        fail to answer are excluded from routing until they answer again.
+        """
+        status = self.cluster.daemon_status(deadline=self.deadline)
+        load = {}
+        for target, result in status.results.items():
+            load[target] = int(result['running']) + int(result['pending'])
+        with self._lock:
+            self._load = load
+            self._refreshed_at = monotonic()
+        return status
+
+    def start(self):
+        """
+        Loads the initial view and starts the background refresh thread.
+        """
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background refresh thread.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the last known view; the next tick retries.
+                pass
+
+    def free_slots(self):
+        """
+        Returns a dict of target to free slots as currently known; a
+        negative value means the node's queue is backed up beyond its limit.
+        """
+        with self._lock:
+            return dict((target, self.slot_limit(target) - load)
+                        for target, load in self._load.items())
+
+    def _is_stale(self):
+        with self._lock:
+            return (not self._load or
+                    monotonic() - self._refreshed_at >= self.refresh_interval)
+
+    def _acquire_node(self):
+        with self._lock:
+            if not self._load:
+                raise ScrapydError('No Scrapyd node is available to '
+                                   'schedule on.')
+            target = max(self._load, key=lambda target: (
+                self.slot_limit(target) - self._load[target]))
+            if self.slot_limit(target) - self._load[target] <= 0:
+                raise ScrapydError('Every Scrapyd node is at its slot '
+                                   'limit.')
+            self._load[target] += 1
+            return target
+
+    def _release_node(self, target):
+        with self._lock:
+            if target in self._load:
+                self._load[target] -= 1
+
+    def schedule(self, project, spider, settings=None, **kwargs):
+        """
+        Schedules a spider on the node with the most free capacity. Takes
+        the same arguments as `ScrapydAPI.schedule` and returns a
+        (target, job id) tuple so the job can be followed up on its node.
+        """
+        if self._thread is None and self._is_stale():
+            self.refresh()
+        target = self._acquire_node()
+        try:
+            job_id = self.cluster.nodes[target].schedule(
+                project, spider, settings=settings, **kwargs)
+        except Exception:
+            self._release_node(target)
+            raise
+        return target, job_id
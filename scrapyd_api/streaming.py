@@ -0,0 +1,136 @@
+from __future__ import unicode_literals
+
+import re
+
+from .compat import json_loads
+
+_WHITESPACE = re.compile(br'[ \t\r\n]*')
+# A complete JSON string.
+_STRING = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"')
+# A number, true, false or null, up to the character that ends it.
+_LITERAL = re.compile(br'[^,}\]\s]+')
+# Everything up to the next bracket, stepping over complete strings and
+# whole objects which hold no brackets of their own (such as the jobs of a
+# listing), so that the regex engine rather than Python walks the bulk of a
+# skipped value.
+_FLAT = br'[^\[\]{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^\[\]{}"]*)*'
+_FLAT_RUN = re.compile(_FLAT + br'(?:\{' + _FLAT + br'\}' + _FLAT + br')*')
+_NOTHING = re.compile(b'')
+
+
+class _Reader(object):
+    """
+    A cursor over a JSON document arriving as an iterable of byte chunks,
+    which only holds the bytes it has yet to consume.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.data = b''
+        self.pos = 0
+
+    def fill(self):
+        """
+        Drops the consumed bytes and appends the next chunk. Raises
+        ValueError if the document ends first.
+        """
+        for chunk in self.chunks:
+            if chunk:
+                self.data = self.data[self.pos:] + chunk
+                self.pos = 0
+                return
+        raise ValueError('Unexpected end of JSON document')
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next byte without consuming it.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.data, self.pos).end()
+            if self.pos < len(self.data):
+                return self.data[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected {0!r} in JSON document, found '
+                             '{1!r}'.format(char, found))
+        self.pos += 1
+
+    def read_value(self, capture):
+        """
+        Consumes the next value, returning its raw bytes when `capture` is
+        set. Nested arrays and objects are stepped over by counting
+        brackets, so a value which is not captured is never decoded.
+        """
+        first = self.peek()
+        pieces = []
+        start = self.pos
+        depth = 0
+        while True:
+            data = self.data
+            if first in (b'[', b'{'):
+                pos = self.pos
+                end = None
+                while True:
+                    # Outside the value there is nothing to step over, and
+                    # a run would carry on past its end.
+                    run = _FLAT_RUN if depth else _NOTHING
+                    pos = run.match(data, pos).end()
+                    # Either the end of the buffer or a string which is not
+                    # complete in it: wait for more bytes.
+                    if pos >= len(data) or data[pos:pos + 1] == b'"':
+                        break
+                    depth += 1 if data[pos:pos + 1] in (b'[', b'{') else -1
+                    pos += 1
+                    if depth == 0:
+                        end = pos
+                        break
+                resume = pos
+            else:
+                pattern = _STRING if first == b'"' else _LITERAL
+                match = pattern.match(data, self.pos)
+                end = None
+                if match is not None and match.end() < len(data):
+                    end = match.end()
+                resume = self.pos
+
+            if end is not None:
+                self.pos = end
+                if capture:
+                    pieces.append(data[start:end])
+                    return b''.join(pieces)
+                return None
+            if capture:
+                pieces.append(data[start:resume])
+            self.pos = resume
+            self.fill()
+            start = 0
+
+
+def filter_object(chunks, keys, loads=json_loads):
+    """
+    Incrementally parses the JSON object in an iterable of byte chunks and
+    returns a dict of only its members named in `keys`.
+
+    The values of other members are scanned over without being decoded, so
+    no Python objects are built for them and the bytes are released as soon
+    as they have been passed.
+    """
+    reader = _Reader(chunks)
+    result = {}
+    reader.expect(b'{')
+    while True:
+        char = reader.peek()
+        if char == b'}':
+            return result
+        if char == b',':
+            reader.pos += 1
+            continue
+        key = loads(reader.read_value(capture=True))
+        reader.expect(b':')
+        if key in keys:
+            result[key] = loads(reader.read_value(capture=True))
+        else:
+            reader.read_value(capture=False)
@@ -0,0 +1,646 @@
+"""
+An in-process stand-in for a Scrapyd server, for exercising the wrapper in
+tests and load benchmarks without a real Scrapyd.
+
+    >>> from scrapyd_api import ScrapydAPI
+    >>> from scrapyd_api.testing import FakeScrapyd
+    >>> with FakeScrapyd() as server:
+    ...     server.add_project('project', spiders=['spider'])
+    ...     scrapyd = ScrapydAPI(server.url)
+    ...     job_id = scrapyd.schedule('project', 'spider')
+"""
+from __future__ import unicode_literals
+
+import base64
+import errno
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, unquote, urlsplit
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import parse_qs, urlsplit
+
+from . import constants
+from .compat import iteritems
+
+DEFAULT_SPIDERS = ('spider',)
+
+_DISPOSITION_NAME = re.compile(br'\bname="([^"]*)"')
+
+
+class InjectedError(object):
+    """
+    A failure the server answers with in place of a real response. A
+    `status_code` of 200 gives a Scrapyd style `{"status": "error"}` body,
+    anything else an HTTP error with `message` as the body.
+    """
+
+    def __init__(self, status_code=500, message=None, count=1):
+        self.status_code = status_code
+        self.message = message or 'Injected error'
+        self.count = count
+
+
+class FakeScrapyd(object):
+    """
+    Serves every endpoint in `constants.DEFAULT_ENDPOINTS` from memory on a
+    background thread.
+
+    Scheduled jobs move from pending to running once `pending_time` seconds
+    have passed and on to finished after a further `run_time` seconds; with
+    a `run_time` of None they run until cancelled or `finish_job()` is
+    called. Jobs can also be moved along by hand with `start_job()` and
+    `finish_job()`.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, endpoints=None, auth=None,
+                 latency=0.0, pending_time=0.0, run_time=None,
+                 stop_time=0.0, error_rate=0.0, node_name='fake-scrapyd',
+                 seed=None):
+        """
+        Args:
+          host, port: the address to listen on; port 0 picks a free port.
+          endpoints: custom endpoint paths, as per `ScrapydAPI`.
+          auth (str, str): user/pass details every request must carry.
+          latency: seconds to wait before answering each request, either a
+                   float or a dict keyed by endpoint name.
+          pending_time (float): seconds a scheduled job stays pending.
+          run_time (float): seconds a job runs for, or None to run until
+                            it is cancelled or finished by hand.
+          stop_time (float): seconds a running job takes to stop once
+                             cancelled, or None to only stop on a KILL
+                             signal; a KILL always stops it straight away.
+          error_rate (float): the fraction of requests, chosen at random,
+                              answered with a 503.
+          node_name (str): reported by the daemon status endpoint.
+          seed: seeds the random choice of failed requests.
+        """
+        self.host = host
+        self.port = port
+        self.endpoints = dict(constants.DEFAULT_ENDPOINTS)
+        if endpoints:
+            self.endpoints.update(endpoints)
+        self.auth = auth
+        self.latency = latency
+        self.pending_time = pending_time
+        self.run_time = run_time
+        self.stop_time = stop_time
+        self.error_rate = error_rate
+        self.node_name = node_name
+        self.request_counts = Counter()
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._projects = OrderedDict()
+        self._jobs = {}
+        self._logs = {}
+        self._errors = {}
+        self._listing_cache = {}
+        self._next_pid = 1000
+        self._server = None
+        self._thread = None
+
+    # Server life cycle.
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self):
+        if self._server is None:
+            raise RuntimeError('The server has not been started')
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def start(self):
+        """
+        Starts serving on a daemon thread.
+        """
+        if self._server is None:
+            self._server = _Server((self.host, self.port), _Handler)
+            self._server.fake = self
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name='fake-scrapyd',
+                kwargs={'poll_interval': 0.05})
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    # Setting up state.
+
+    def add_project(self, project, versions=('1',), spiders=DEFAULT_SPIDERS):
+        """
+        Deploys `project` with the given versions, each containing `spiders`.
+        """
+        with self._lock:
+            for version in versions:
+                self._deploy(project, version, spiders)
+
+    def add_history(self, project, count, spider='spider',
+                    state=constants.FINISHED):
+        """
+        Adds `count` synthetic jobs in the given state to `project`, for
+        exercising clients against long job listings. Returns their ids.
+        """
+        with self._lock:
+            jobs = self._project_jobs(project)
+            now = datetime.now()
+            job_ids = []
+            for _ in range(count):
+                job = self._new_job(project, spider, uuid.uuid4().hex)
+                job['start_time'] = job['end_time'] = now
+                job['state'] = state
+                if state == constants.PENDING:
+                    job['start_time'] = job['end_time'] = None
+                    job['scheduled_at'] = None
+                elif state == constants.RUNNING:
+                    job['end_time'] = None
+                    job['pid'] = self._pid()
+                    job['started_at'] = None
+                jobs[state][job['id']] = job
+                job_ids.append(job['id'])
+            self._changed(project)
+            return job_ids
+
+    def inject_error(self, endpoint, status_code=500, message=None, count=1):
+        """
+        Makes the next `count` requests to `endpoint` (a name from
+        `constants`) fail; a `count` of None fails them until
+        `clear_errors()` is called.
+        """
+        with self._lock:
+            self._errors.setdefault(endpoint, []).append(
+                InjectedError(status_code, message, count))
+
+    def clear_errors(self):
+        with self._lock:
+            self._errors.clear()
+
+    def write_log(self, job_id, data):
+        """
+        Appends `data` to a job's log.
+        """
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        with self._lock:
+            self._logs[job_id] = self._logs.get(job_id, b'') + data
+
+    # Driving jobs.
+
+    def job_signals(self, job_id):
+        """
+        Returns the signals sent to a running job by cancel requests, None
+        standing for Scrapyd's default.
+        """
+        with self._lock:
+            return list(self._jobs[job_id]['signals'])
+
+    def job_state(self, job_id):
+        """
+        Returns the state of a job, or None if it is unknown.
+        """
+        with self._lock:
+            self._advance()
+            job = self._jobs.get(job_id)
+            return job['state'] if job is not None else None
+
+    def start_job(self, job_id):
+        with self._lock:
+            self._start(self._jobs[job_id], datetime.now())
+
+    def finish_job(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job['state'] == constants.PENDING:
+                self._start(job, datetime.now())
+            self._finish(job, datetime.now())
+
+    def _deploy(self, project, version, spiders):
+        jobs = self._project_jobs(project)
+        jobs['versions'][version] = list(spiders)
+        self._changed(project)
+
+    def _pid(self):
+        self._next_pid += 1
+        return self._next_pid
+
+    def _project_jobs(self, project):
+        return self._projects.setdefault(project, {
+            'versions': OrderedDict(),
+            constants.PENDING: OrderedDict(),
+            constants.RUNNING: OrderedDict(),
+            constants.FINISHED: OrderedDict(),
+        })
+
+    def _new_job(self, project, spider, job_id):
+        job = {
+            'id': job_id,
+            'project': project,
+            'spider': spider,
+            'state': constants.PENDING,
+            'pid': None,
+            'start_time': None,
+            'end_time': None,
+            'scheduled_at': time.time(),
+            'started_at': None,
+            'stopping_at': None,
+            'signals': [],
+        }
+        self._jobs[job_id] = job
+        return job
+
+    def _changed(self, project):
+        self._listing_cache.pop(project, None)
+
+    def _start(self, job, now, at=None):
+        if job['state'] != constants.PENDING:
+            return
+        jobs = self._projects[job['project']]
+        del jobs[constants.PENDING][job['id']]
+        job['state'] = constants.RUNNING
+        job['pid'] = self._pid()
+        job['start_time'] = now
+        job['started_at'] = at if at is not None else time.time()
+        self._logs.setdefault(job['id'], b'')
+        jobs[constants.RUNNING][job['id']] = job
+        self._changed(job['project'])
+
+    def _finish(self, job, now):
+        if job['state'] != constants.RUNNING:
+            return
+        jobs = self._projects[job['project']]
+        del jobs[constants.RUNNING][job['id']]
+        job['state'] = constants.FINISHED
+        job['end_time'] = now
+        jobs[constants.FINISHED][job['id']] = job
+        self._changed(job['project'])
+
+    def _advance(self):
+        """
+        Moves time driven jobs along the pending, running, finished states.
+        """
+        clock = time.time()
+        now = datetime.now()
+        for jobs in self._projects.values():
+            for job in list(jobs[constants.PENDING].values()):
+                if (job['scheduled_at'] is not None and
+                        clock - job['scheduled_at'] >= self.pending_time):
+                    self._start(job, now,
+                                at=job['scheduled_at'] + self.pending_time)
+            for job in list(jobs[constants.RUNNING].values()):
+                if (job['stopping_at'] is not None and
+                        clock >= job['stopping_at']):
+                    self._finish(job, now)
+                elif (self.run_time is not None and
+                        job['started_at'] is not None and
+                        clock - job['started_at'] >= self.run_time):
+                    self._finish(job, now)
+
+    # Request handling.
+
+    def handle(self, method, path, query, headers, body):
+        """
+        Answers one request, returning a `(status, headers, body)` tuple.
+        """
+        if self.auth is not None and not self._authorized(headers):
+            return 401, {'WWW-Authenticate': 'Basic realm="Scrapyd"'}, \
+                b'Unauthorized'
+
+        endpoint = self._route(path)
+        if endpoint is None:
+            return 404, {}, b'No Such Resource'
+        with self._lock:
+            self.request_counts[endpoint] += 1
+        delay = self.latency
+        if isinstance(delay, dict):
+            delay = delay.get(endpoint, 0)
+        if delay:
+            time.sleep(delay)
+
+        error = self._take_error(endpoint)
+        if error is not None:
+            if error.status_code == 200:
+                return self._json({'status': 'error',
+                                   'message': error.message})
+            return error.status_code, {}, error.message.encode('utf-8')
+
+        if endpoint == constants.LOGS_ENDPOINT:
+            return self._serve_log(path, headers)
+
+        params = self._parse_params(query, headers, body)
+        with self._lock:
+            self._advance()
+            try:
+                return getattr(self, '_' + endpoint)(params)
+            except KeyError as exc:
+                return self._json({'status': 'error',
+                                   'message': exc.args[0]})
+
+    def _authorized(self, headers):
+        expected = base64.b64encode(
+            '{0}:{1}'.format(*self.auth).encode('utf-8')).decode('ascii')
+        return headers.get('Authorization') == 'Basic ' + expected
+
+    def _route(self, path):
+        logs = self.endpoints[constants.LOGS_ENDPOINT]
+        if path.startswith(logs):
+            return constants.LOGS_ENDPOINT
+        for endpoint, endpoint_path in iteritems(self.endpoints):
+            if path == endpoint_path:
+                return endpoint
+        return None
+
+    def _take_error(self, endpoint):
+        with self._lock:
+            pending = self._errors.get(endpoint)
+            if pending:
+                error = pending[0]
+                if error.count is not None:
+                    error.count -= 1
+                    if error.count <= 0:
+                        pending.pop(0)
+                return error
+        if self.error_rate and self._random.random() < self.error_rate:
+            return InjectedError(503, 'Service Unavailable')
+        return None
+
+    def _parse_params(self, query, headers, body):
+        params = parse_qs(query, keep_blank_values=True)
+        content_type = headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            boundary = content_type.split('boundary=', 1)[1].strip('"')
+            for name, value in _parse_multipart(body, boundary):
+                params.setdefault(name, []).append(value)
+        elif body:
+            for name, values in iteritems(parse_qs(body.decode('utf-8'),
+                                                   keep_blank_values=True)):
+                params.setdefault(name, []).extend(values)
+        return params
+
+    def _json(self, data):
+        return 200, {'Content-Type': 'application/json'}, \
+            json.dumps(data).encode('utf-8')
+
+    def _ok(self, **data):
+        data['status'] = 'ok'
+        data['node_name'] = self.node_name
+        return self._json(data)
+
+    def _project(self, params):
+        project = params['project'][0]
+        if project not in self._projects or \
+                not self._projects[project]['versions']:
+            raise KeyError("project '{0}' not found".format(project))
+        return project
+
+    # Endpoints, named after the constants they serve.
+
+    def _add_version(self, params):
+        project = params['project'][0]
+        version = params['version'][0]
+        if 'egg' not in params:
+            raise KeyError('Missing egg')
+        spiders = DEFAULT_SPIDERS
+        if project in self._projects and self._projects[project]['versions']:
+            spiders = list(self._projects[project]['versions'].values())[-1]
+        self._deploy(project, version, spiders)
+        return self._ok(project=project, version=version,
+                        spiders=len(spiders))
+
+    def _cancel(self, params):
+        project = self._project(params)
+        job = self._jobs.get(params['job'][0])
+        prevstate = None
+        if job is not None and job['project'] == project:
+            prevstate = job['state']
+            if prevstate == constants.PENDING:
+                del self._projects[project][constants.PENDING][job['id']]
+                del self._jobs[job['id']]
+                self._changed(project)
+            elif prevstate == constants.RUNNING:
+                signal = params.get('signal', [None])[0]
+                job['signals'].append(signal)
+                if signal == 'KILL' or self.stop_time == 0:
+                    self._finish(job, datetime.now())
+                elif (self.stop_time is not None and
+                        job['stopping_at'] is None):
+                    job['stopping_at'] = time.time() + self.stop_time
+            else:
+                prevstate = None
+        return self._ok(prevstate=prevstate)
+
+    def _delete_project(self, params):
+        project = self._project(params)
+        jobs = self._projects.pop(project)
+        for state in constants.JOB_STATES:
+            for job_id in jobs[state]:
+                self._jobs.pop(job_id, None)
+        self._changed(project)
+        return self._ok()
+
+    def _delete_version(self, params):
+        project = self._project(params)
+        version = params['version'][0]
+        versions = self._projects[project]['versions']
+        if version not in versions:
+            raise KeyError("version '{0}' not found".format(version))
+        del versions[version]
+        self._changed(project)
+        return self._ok()
+
+    def _list_jobs(self, params):
+        project = params['project'][0]
+        cached = self._listing_cache.get(project)
+        if cached is None:
+            jobs = self._projects.get(project, {})
+            cached = self._listing_cache[project] = json.dumps({
+                'status': 'ok',
+                'node_name': self.node_name,
+                'pending': [_describe(job) for job in
+                            jobs.get(constants.PENDING, {}).values()],
+                'running': [_describe(job) for job in
+                            jobs.get(constants.RUNNING, {}).values()],
+                'finished': [_describe(job) for job in
+                             jobs.get(constants.FINISHED, {}).values()],
+            }).encode('utf-8')
+        return 200, {'Content-Type': 'application/json'}, cached
+
+    def _list_projects(self, params):
+        return self._ok(projects=[name for name, jobs in
+                                  iteritems(self._projects)
+                                  if jobs['versions']])
+
+    def _list_spiders(self, params):
+        project = self._project(params)
+        versions = self._projects[project]['versions']
+        version = params.get('_version', [None])[0]
+        if version is None:
+            version = list(versions)[-1]
+        if version not in versions:
+            raise KeyError("version '{0}' not found".format(version))
+        return self._ok(spiders=versions[version])
+
+    def _list_versions(self, params):
+        project = params['project'][0]
+        versions = []
+        if project in self._projects:
+            versions = list(self._projects[project]['versions'])
+        return self._ok(versions=versions)
+
+    def _schedule(self, params):
+        project = self._project(params)
+        spider = params['spider'][0]
+        spiders = list(self._projects[project]['versions'].values())[-1]
+        if spider not in spiders:
+            raise KeyError("spider '{0}' not found".format(spider))
+        job_id = params.get('jobid', [uuid.uuid4().hex])[0]
+        job = self._new_job(project, spider, job_id)
+        job['settings'] = params.get('setting', [])
+        job['args'] = dict((key, values[0]) for key, values in
+                           iteritems(params)
+                           if key not in ('project', 'spider', 'jobid',
+                                          'setting', '_version'))
+        self._projects[project][constants.PENDING][job_id] = job
+        self._changed(project)
+        self._advance()
+        return self._ok(jobid=job_id)
+
+    def _daemonstatus(self, params):
+        counts = dict((state, 0) for state in constants.JOB_STATES)
+        for jobs in self._projects.values():
+            for state in constants.JOB_STATES:
+                counts[state] += len(jobs[state])
+        return self._ok(**counts)
+
+    def _serve_log(self, path, headers):
+        name = unquote(path[len(self.endpoints[constants.LOGS_ENDPOINT]):])
+        parts = name.split('/')
+        if len(parts) != 3 or not parts[2].endswith('.log'):
+            return 404, {}, b'No Such Resource'
+        job_id = parts[2][:-len('.log')]
+        with self._lock:
+            self._advance()
+            data = self._logs.get(job_id)
+        if data is None:
+            return 404, {}, b'No Such Resource'
+
+        match = re.match(r'bytes=(\d+)-$', headers.get('Range', ''))
+        if match is None:
+            return 200, {'Content-Type': 'text/plain'}, data
+        start = int(match.group(1))
+        if start >= len(data):
+            return 416, {'Content-Range': 'bytes */{0}'.format(len(data))}, \
+                b''
+        return 206, {
+            'Content-Type': 'text/plain',
+            'Content-Range': 'bytes {0}-{1}/{2}'.format(
+                start, len(data) - 1, len(data)),
+        }, data[start:]
+
+
+def _describe(job):
+    """
+    Formats a job as Scrapyd's list jobs endpoint does.
+    """
+    data = {'id': job['id'], 'spider': job['spider']}
+    if job['state'] != constants.PENDING:
+        data['pid'] = job['pid']
+        data['start_time'] = _format_time(job['start_time'])
+    if job['state'] == constants.FINISHED:
+        data['end_time'] = _format_time(job['end_time'])
+    return data
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f') if value else None
+
+
+def _parse_multipart(body, boundary):
+    """
+    Yields the `(name, value)` pairs of a multipart/form-data body; file
+    parts are yielded as bytes, other fields as text.
+    """
+    delimiter = b'--' + boundary.encode('ascii')
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b'--'):
+            break
+        head, _, value = part.partition(b'\r\n\r\n')
+        if value.endswith(b'\r\n'):
+            value = value[:-2]
+        match = _DISPOSITION_NAME.search(head)
+        if match is None:
+            continue
+        name = match.group(1).decode('utf-8')
+        if b'filename=' not in head:
+            value = value.decode('utf-8')
+        yield name, value
+
+
+_DISCONNECTS = (errno.EPIPE, errno.ECONNRESET)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response (a timed out request, a cancelled
+        # stream) are expected; anything else still gets its traceback.
+        error = sys.exc_info()[1]
+        if isinstance(error, socket.error) and error.errno in _DISCONNECTS:
+            return
+        HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        url = urlsplit(self.path)
+        status, headers, data = self.server.fake.handle(
+            method, url.path, url.query, self.headers, body)
+        self.send_response(status)
+        for name, value in iteritems(headers):
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,96 @@
+from __future__ import unicode_literals
+
+from .compat import iteritems, json_loads
+from .exceptions import ScrapydResponseError
+
+
+class Transport(object):
+    """
+    The interface `ScrapydAPI` makes its HTTP requests through. The default
+    `scrapyd_api.client.Client` implements it over requests, and
+    `scrapyd_api.urllib3_transport.Urllib3Transport` directly over a urllib3
+    connection pool.
+
+    `get` and `post` return the decoded JSON body of a Scrapyd response with
+    its `status` removed, raising `ScrapydResponseError` for an HTTP error or
+    an error status. `timeout` is either seconds as a float or a
+    (connect timeout, read timeout) tuple. `hooks` follows requests: its
+    'response' callable, when given, is passed the response as soon as it
+    has arrived.
+
+    `auth` holds the (user, password) pair for HTTP Basic Authentication,
+    if any.
+    """
+    auth = None
+    json_loads = staticmethod(json_loads)
+
+    def get(self, url, params=None, timeout=None, hooks=None):
+        raise NotImplementedError
+
+    def post(self, url, data=None, files=None, headers=None, timeout=None,
+             hooks=None):
+        """
+        Sends `data` form encoded, or with `files` (a dict of field name to
+        bytes or file object) as multipart/form-data. `data` may also be a
+        file-like body with a length, such as a `MultipartEncoder`, sent as
+        is with the given `headers`.
+        """
+        raise NotImplementedError
+
+    def get_members(self, url, keys, params=None, timeout=None, hooks=None):
+        """
+        Like `get`, but only the top level members named in `keys` need be
+        returned. By default the whole body is decoded and then filtered;
+        transports which can stream should skip the other members instead.
+        """
+        data = self.get(url, params=params, timeout=timeout, hooks=hooks)
+        return dict((key, value) for key, value in iteritems(data)
+                    if key in keys)
+
+    def iter_bytes(self, url, offset=0, chunk_size=65536, timeout=None):
+        """
+        Yields the raw body of a GET request to `url` in chunks, starting
+        `offset` bytes in.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Closes any pooled connections.
+        """
+
+    def _handle_data(self, data):
+        return handle_data(data)
+
+
+def handle_data(data):
+    """
+    Handles the status field of Scrapyd's decoded JSON response.
+    """
+    status = data.pop('status', None)
+    if status == 'ok':
+        return data
+    elif status == 'error':
+        raise ScrapydResponseError(data['message'])
+
+
+def status_error(status_code, text):
+    """
+    Returns the `ScrapydResponseError` for an HTTP error response.
+    """
+    return ScrapydResponseError(
+        "Scrapyd returned a {0} error: {1}".format(status_code, text),
+        status_code=status_code)
+
+
+def skip_bytes(chunks, count):
+    """
+    Yields the chunks of a body with its first `count` bytes dropped.
+    """
+    for chunk in chunks:
+        if count:
+            if len(chunk) <= count:
+                count -= len(chunk)
+                continue
+            chunk, count = chunk[count:], 0
+        yield chunk
@@ -0,0 +1,253 @@
+"""
+A `Transport` built directly on a urllib3 connection pool, for callers whose
+request rates make the per-request work of a requests session (hooks,
+cookies, redirect handling, adapter lookup and request preparation)
+noticeable. Errors are raised as the same requests exceptions the default
+client raises, so retry policies and circuit breakers treat both alike;
+requests itself is only imported once such an error occurs.
+"""
+from __future__ import unicode_literals
+
+from contextlib import closing
+
+import urllib3
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    HTTPError,
+    NewConnectionError,
+    ReadTimeoutError
+)
+
+from .compat import iteritems
+from .exceptions import ScrapydResponseError
+from .streaming import filter_object
+from .transport import Transport, skip_bytes, status_error
+
+try:
+    # Python 3
+    from urllib.parse import urlencode
+except ImportError:
+    # Python 2
+    from urllib import urlencode
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+
+class _Request(object):
+    __slots__ = ('method', 'url', 'body')
+
+    def __init__(self, method, url, body):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class _Response(object):
+    """
+    The parts of a requests response which response hooks rely on.
+    """
+    __slots__ = ('status_code', 'headers', 'content', 'request')
+
+    def __init__(self, status_code, headers, content, request):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.request = request
+
+
+class Urllib3Transport(Transport):
+    """
+    Sends requests through a `urllib3.PoolManager`. The pool options match
+    those of the default `Client`: `pool_connections` is the number of
+    per-host pools kept, `pool_maxsize` the number of connections kept open
+    to each host, and `pool_block` whether a request waits for a free
+    connection once `pool_maxsize` are in use. Setting `keep_alive` to False
+    closes each connection after its request.
+
+    No retries are made and redirects are not followed; retries are left to
+    `ScrapydAPI`'s retry policy.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, json_loads=None):
+        if json_loads is not None:
+            self.json_loads = json_loads
+        self.pool = urllib3.PoolManager(num_pools=pool_connections,
+                                        maxsize=pool_maxsize,
+                                        block=pool_block, retries=False)
+        self.headers = {}
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+        self._auth = None
+
+    @property
+    def auth(self):
+        return self._auth
+
+    @auth.setter
+    def auth(self, auth):
+        # Encoded once rather than on every request.
+        self._auth = auth
+        self.headers.pop('Authorization', None)
+        if auth is not None:
+            self.headers['Authorization'] = urllib3.make_headers(
+                basic_auth='{0}:{1}'.format(*auth))['authorization']
+
+    def get(self, url, params=None, timeout=None, hooks=None):
+        response = self._urlopen('GET', _with_query(url, params), None, {},
+                                 timeout, hooks)
+        return self._handle_response(response.status, response.data)
+
+    def post(self, url, data=None, files=None, headers=None, timeout=None,
+             hooks=None):
+        headers = dict(headers or {})
+        if hasattr(data, 'read'):
+            body = data
+            headers['Content-Length'] = str(len(data))
+        elif files:
+            fields = _form_fields(data)
+            for name, value in iteritems(files):
+                if hasattr(value, 'read'):
+                    value = value.read()
+                fields.append((name, (name, value)))
+            body, content_type = urllib3.encode_multipart_formdata(fields)
+            headers['Content-Type'] = content_type
+        else:
+            body = urlencode(_form_fields(data)).encode('utf-8')
+            headers['Content-Type'] = FORM_CONTENT_TYPE
+        response = self._urlopen('POST', url, body, headers, timeout, hooks)
+        return self._handle_response(response.status, response.data)
+
+    def get_members(self, url, keys, params=None, timeout=None, hooks=None,
+                    chunk_size=65536):
+        """
+        Streams the body of a GET request through `filter_object`, decoding
+        only the top level members named in `keys`; see
+        `Client.get_members`.
+        """
+        keys = frozenset(keys) | frozenset(['status', 'message'])
+        response = self._urlopen('GET', _with_query(url, params), None, {},
+                                 timeout, hooks, preload_content=False)
+        try:
+            if response.status >= 400:
+                raise status_error(response.status, _text(response.read()))
+            try:
+                data = filter_object(response.stream(chunk_size), keys,
+                                     self.json_loads)
+            except ValueError:
+                raise ScrapydResponseError("Scrapyd returned an invalid JSON "
+                                           "response")
+        finally:
+            # Reads whatever follows the object, so that the connection can
+            # go back to the pool rather than being closed.
+            response.drain_conn()
+            response.release_conn()
+        return self._handle_data(data)
+
+    def iter_bytes(self, url, offset=0, chunk_size=65536, timeout=None):
+        """
+        Yields the raw body of a GET request in chunks, starting `offset`
+        bytes in; see `Client.iter_bytes`.
+        """
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+        response = self._urlopen('GET', url, None, headers, timeout, None,
+                                 preload_content=False)
+        with closing(response):
+            if response.status == 416:
+                # Range not satisfiable: there is nothing past `offset`.
+                return
+            if response.status >= 400:
+                raise status_error(response.status, _text(response.read()))
+            skip = offset if response.status != 206 else 0
+            for chunk in skip_bytes(response.stream(chunk_size), skip):
+                yield chunk
+
+    def close(self):
+        self.pool.clear()
+
+    def _urlopen(self, method, url, body, headers, timeout, hooks,
+                 preload_content=True):
+        if self.headers:
+            headers = dict(self.headers, **headers)
+        try:
+            response = self.pool.urlopen(
+                method, url, body=body, headers=headers,
+                timeout=_timeout(timeout), redirect=False,
+                preload_content=preload_content)
+        except HTTPError as exc:
+            raise _requests_error(exc)
+        if hooks and hooks.get('response'):
+            # Streamed bodies are not read here; hooks can use the header.
+            content = response.data if preload_content else b''
+            hooks['response'](_Response(
+                response.status, response.headers, content,
+                _Request(method, url, body)))
+        return response
+
+    def _handle_response(self, status, body):
+        """
+        Handles the response received from Scrapyd.
+        """
+        if status >= 400:
+            raise status_error(status, _text(body))
+        try:
+            data = self.json_loads(body)
+        except ValueError:
+            raise ScrapydResponseError("Scrapyd returned an invalid JSON "
+                                       "response: {0}".format(_text(body)))
+        return self._handle_data(data)
+
+
+def _with_query(url, params):
+    if not params:
+        return url
+    return '{0}?{1}'.format(url, urlencode(_form_fields(params)))
+
+
+def _form_fields(data):
+    """
+    Flattens a dict of form data, whose values may be lists, into a list of
+    (name, value) pairs of strings.
+    """
+    fields = []
+    for key, value in iteritems(data or {}):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if not isinstance(item, bytes):
+                item = '{0}'.format(item).encode('utf-8')
+            fields.append((key, item))
+    return fields
+
+
+def _requests_error(exc):
+    """
+    Returns the requests exception the default client raises for a urllib3
+    error.
+    """
+    # Imported here so that using this transport does not import requests.
+    from requests.exceptions import (
+        ConnectionError,
+        ConnectTimeout,
+        ReadTimeout
+    )
+    # NewConnectionError subclasses ConnectTimeoutError, so goes first.
+    if isinstance(exc, NewConnectionError):
+        return ConnectionError(exc)
+    if isinstance(exc, ConnectTimeoutError):
+        return ConnectTimeout(exc)
+    if isinstance(exc, ReadTimeoutError):
+        return ReadTimeout(exc)
+    return ConnectionError(exc)
+
+
+def _timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return urllib3.Timeout(connect=connect, read=read)
+    return urllib3.Timeout(connect=timeout, read=timeout)
+
+
+def _text(body):
+    return body.decode('utf-8', 'replace')
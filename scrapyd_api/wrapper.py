@@ -1,16 +1,29 @@
 from __future__ import unicode_literals
 
-from copy import deepcopy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
 
 from . import constants
-from .client import Client
-from .compat import (
-    iteritems,
-    urljoin
+from .base import BaseScrapydAPI
+from .cache import TTLCache
+from .coalesce import COALESCED_ENDPOINTS, SingleFlight, request_key
+from .compat import iteritems, monotonic
+from .jobs import JobList
+from .logs import DEFAULT_CHUNK_SIZE, LogTail
+from .metrics import RequestInfo
+from .polling import (
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    JobWaiter,
+    index_job_states
 )
+from .retry import CircuitBreaker, is_node_failure
 
+_MISSING = object()
 
-class ScrapydAPI(object):
+
+class ScrapydAPI(BaseScrapydAPI):
     """
     Provides a thin Pythonic wrapper around the Scrapyd API. The public methods
     come in two types: first class, those that wrap a Scrapyd API endpoint
@@ -19,7 +32,11 @@ class ScrapydAPI(object):
     """
 
     def __init__(self, target='http://localhost:6800', auth=None,
-                 endpoints=None, client=None, timeout=None):
+                 endpoints=None, client=None, timeout=None, cache=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, retry=None, circuit_breaker=None,
+                 hooks=None, coalesce=False, transport=None,
+                 json_loads=None):
         """
         Instantiates the ScrapydAPI wrapper for use.
 
@@ -29,79 +46,339 @@ class ScrapydAPI(object):
                            used when `client` is not passed.
           endpoints: a dictionary of custom endpoints to apply on top of
                      the pre-existing defaults.
-          client: a pre-instantiated requests-like client. By default, we use
-                  our own client. Override for your own needs.
+          client: a pre-instantiated `scrapyd_api.transport.Transport`, or
+                  any requests-like client. By default, we use our own
+                  client. Override for your own needs.
           timeout: timeout for client requests in seconds, either as a float
                    or a (connect timeout, read timeout) tuple
+          cache: opt-in caching of the list projects, versions and spiders
+                 endpoints; either True for the defaults or a pre-instantiated
+                 `scrapyd_api.cache.TTLCache`. Entries are invalidated by
+                 deploys and deletions made through this wrapper.
+          pool_connections (int): the number of per-host connection pools
+                                  kept. Only used when `client` is not passed.
+          pool_maxsize (int): the number of connections kept open to the
+                              target; size this to the number of threads
+                              sharing the wrapper. Only used when `client` is
+                              not passed.
+          pool_block (bool): whether requests wait for a pooled connection
+                             once `pool_maxsize` are in use, rather than
+                             opening extra throwaway ones. Only used when
+                             `client` is not passed.
+          keep_alive (bool): whether connections are kept open between
+                             requests. Only used when `client` is not passed.
+          retry: a `scrapyd_api.retry.RetryPolicy` deciding which failed
+                 requests are retried, and after how long. No retries are
+                 made by default.
+          circuit_breaker: either True for the defaults or a pre-instantiated
+                           `scrapyd_api.retry.CircuitBreaker`, which fails
+                           requests fast while the target is unhealthy.
+          hooks: a list of `scrapyd_api.metrics.RequestHooks`, such as a
+                 `MetricsCollector`, told about every request made to the
+                 JSON endpoints. Custom clients must accept requests'
+                 `hooks` keyword argument for status and sizes to be
+                 recorded.
+          coalesce: either True or a pre-instantiated
+                    `scrapyd_api.coalesce.SingleFlight`, to have concurrent
+                    identical requests to the read endpoints (list jobs,
+                    projects, versions, spiders and daemon status) share
+                    one in flight HTTP call and its decoded result. Off by
+                    default, as the callers then share nested lists.
+          transport: the `Transport` class the client is built from when
+                     `client` is not passed, e.g.
+                     `scrapyd_api.urllib3_transport.Urllib3Transport`.
+                     Defaults to `scrapyd_api.client.Client`.
+          json_loads: a drop-in replacement for `json.loads`, such as
+                      `orjson.loads`, the client decodes response bodies
+                      with. Only used when `client` is not passed.
 
         """
-        if endpoints is None:
-            endpoints = {}
+        super(ScrapydAPI, self).__init__(target, endpoints=endpoints,
+                                         timeout=timeout)
+        # The client is built on first use, so that the transport, and
+        # requests with it, is only imported once a request is made.
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._transport = transport
+        self._transport_options = {
+            'pool_connections': pool_connections,
+            'pool_maxsize': pool_maxsize,
+            'pool_block': pool_block,
+            'keep_alive': keep_alive,
+        }
+        if json_loads is not None:
+            self._transport_options['json_loads'] = json_loads
+        self._auth = auth
+        if cache is True:
+            cache = TTLCache()
+        self.cache = cache
+        if circuit_breaker is True:
+            circuit_breaker = CircuitBreaker()
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.hooks = list(hooks or [])
+        if coalesce is True:
+            coalesce = SingleFlight()
+        elif coalesce is False:
+            coalesce = None
+        self.coalesce = coalesce
 
-        if client is None:
-            client = Client()
-            client.auth = auth
+    @property
+    def client(self):
+        """
+        The transport requests are made through, built on first access when
+        none was passed in.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
 
-        self.target = target
-        self.client = client
-        self.timeout = timeout
-        self.endpoints = deepcopy(constants.DEFAULT_ENDPOINTS)
-        self.endpoints.update(endpoints)
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-    def _build_url(self, endpoint):
+    def _build_client(self):
+        """
+        Builds the default client from the transport and pool options.
         """
-        Builds the absolute URL using the target and desired endpoint.
+        transport = self._transport
+        if transport is None:
+            from .client import Client
+            transport = Client
+        client = transport(**self._transport_options)
+        client.auth = self._auth
+        return client
+
+    def _request(self, method, endpoint, **kwargs):
+        """
+        Makes a request to `endpoint` with the client's `method` (either
+        'get' or 'post'), applying the retry policy and circuit breaker.
+        Concurrent identical reads share one call when coalescing is on.
+        """
+        url = self._build_url(endpoint)
+        if self.coalesce is not None and endpoint in COALESCED_ENDPOINTS:
+            return self.coalesce.do(
+                request_key(method, url, kwargs),
+                lambda: self._retrying(method, endpoint, url, kwargs))
+        return self._retrying(method, endpoint, url, kwargs)
+
+    def _retrying(self, method, endpoint, url, kwargs):
         """
+        Makes a request, retrying it as the retry policy allows.
+        """
+        breaker = self.circuit_breaker
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_call()
+            try:
+                result = self._send(method, endpoint, url, attempt, kwargs)
+            except Exception as exc:
+                if breaker is not None:
+                    if is_node_failure(exc):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if (self.retry is None or
+                        not self.retry.should_retry(endpoint, exc, attempt)):
+                    raise
+                sleep(self.retry.backoff(attempt))
+                attempt += 1
+                continue
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+    def _send(self, method, endpoint, url, attempt, kwargs):
+        """
+        Makes a single request, reporting it to the request hooks.
+        """
+        call = getattr(self.client, method)
+        if not self.hooks:
+            return call(url, timeout=self.timeout, **kwargs)
+
+        info = RequestInfo(endpoint, self.target, method, attempt)
+        for hook in self.hooks:
+            hook.before_request(info)
+        started = monotonic()
         try:
-            path = self.endpoints[endpoint]
-        except KeyError:
-            msg = 'Unknown endpoint `{0}`'
-            raise ValueError(msg.format(endpoint))
-        absolute_url = urljoin(self.target, path)
-        return absolute_url
+            return call(url, timeout=self.timeout,
+                        hooks={'response': info.record_response}, **kwargs)
+        except Exception as exc:
+            info.error = exc
+            if info.status_code is None:
+                info.status_code = getattr(exc, 'status_code', None)
+            raise
+        finally:
+            info.duration = monotonic() - started
+            for hook in self.hooks:
+                hook.after_request(info)
+
+    def _cached(self, endpoint, key, fetch):
+        """
+        Returns the cached answer for `endpoint` and `key` when caching is
+        enabled and an entry is live, otherwise calls `fetch` for it.
+        """
+        if self.cache is None:
+            return fetch()
+        value = self.cache.get(endpoint, key, _MISSING)
+        if value is _MISSING:
+            value = fetch()
+            self.cache.set(endpoint, key, value)
+        return value
 
-    def add_version(self, project, version, egg):
+    def _invalidate_project(self, project):
+        """
+        Drops any cached metadata which a change to `project` may affect.
+        """
+        if self.cache is None:
+            return
+        self.cache.invalidate(constants.LIST_PROJECTS_ENDPOINT)
+        self.cache.invalidate(constants.LIST_VERSIONS_ENDPOINT, project)
+        self.cache.invalidate(constants.LIST_SPIDERS_ENDPOINT, project)
+
+    def add_version(self, project, version, egg, stream=False,
+                    progress=None, use_mmap=False):
         """
         Adds a new project egg to the Scrapyd service. First class, maps to
         Scrapyd's add version endpoint.
+
+        With `stream` the egg, given as a path or a file opened in binary
+        mode, is read in chunks while it is uploaded rather than being held
+        in memory, optionally through a memory map with `use_mmap`. A
+        `progress` callable is passed an `UploadProgress` after each chunk.
+        Passing `progress` or `use_mmap` implies `stream`.
         """
-        url = self._build_url(constants.ADD_VERSION_ENDPOINT)
         data = {
             'project': project,
             'version': version
         }
-        files = {
-            'egg': egg
-        }
-        json = self.client.post(url, data=data, files=files,
-                                timeout=self.timeout)
+        if stream or progress is not None or use_mmap:
+            json = self._stream_egg(data, egg, progress, use_mmap)
+        else:
+            files = {
+                'egg': egg
+            }
+            json = self._request('post', constants.ADD_VERSION_ENDPOINT,
+                                 data=data, files=files)
+        self._invalidate_project(project)
         return json['spiders']
 
+    def _stream_egg(self, data, egg, progress, use_mmap):
+        """
+        Uploads an egg to the add version endpoint as a streamed multipart
+        body.
+        """
+        from .multipart import MultipartEncoder
+        fileobj = egg
+        if not hasattr(egg, 'read'):
+            fileobj = open(egg, 'rb')
+        try:
+            body = MultipartEncoder(data, 'egg', fileobj, filename='egg',
+                                    progress=progress, use_mmap=use_mmap)
+            try:
+                return self._request(
+                    'post', constants.ADD_VERSION_ENDPOINT, data=body,
+                    headers={'Content-Type': body.content_type})
+            finally:
+                body.close()
+        finally:
+            if fileobj is not egg:
+                fileobj.close()
+
     def cancel(self, project, job, signal=None):
         """
         Cancels a job from a specific project. First class, maps to
         Scrapyd's cancel job endpoint.
         """
-        url = self._build_url(constants.CANCEL_ENDPOINT)
         data = {
             'project': project,
             'job': job,
         }
         if signal is not None:
             data['signal'] = signal
-        json = self.client.post(url, data=data, timeout=self.timeout)
+        json = self._request('post', constants.CANCEL_ENDPOINT, data=data)
         return json['prevstate']
 
+    def cancel_many(self, project, job_ids, signal=None, max_workers=8,
+                    grace_period=None, escalation_signal='KILL',
+                    poll_interval=1.0):
+        """
+        Cancels many jobs of a project concurrently. Derived, submits to
+        Scrapyd's cancel endpoint from a bounded pool of threads.
+
+        With a `grace_period` in seconds, the jobs are then watched with one
+        list jobs call per `poll_interval`, and any still pending or running
+        once the grace period is over are cancelled again with
+        `escalation_signal`. Returns a dict of job id to the state each job
+        was in when first cancelled, or the exception raised for it.
+        """
+        def submit(job_id, signal=signal):
+            try:
+                return self.cancel(project, job_id, signal=signal)
+            except Exception as exc:
+                return exc
+
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        workers = min(max_workers, len(job_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            prevstates = dict(zip(job_ids, executor.map(submit, job_ids)))
+            if grace_period is None:
+                return prevstates
+
+            deadline = monotonic() + grace_period
+            remaining = [job_id for job_id, state in iteritems(prevstates)
+                         if state in (constants.PENDING, constants.RUNNING)]
+            while remaining:
+                active = self._active_job_ids(project)
+                remaining = [job_id for job_id in remaining
+                             if job_id in active]
+                if not remaining or monotonic() >= deadline:
+                    break
+                sleep(min(poll_interval, max(deadline - monotonic(), 0)))
+            list(executor.map(
+                lambda job_id: submit(job_id, signal=escalation_signal),
+                remaining))
+        return prevstates
+
+    def cancel_matching(self, project, spider=None,
+                        states=(constants.PENDING, constants.RUNNING),
+                        **kwargs):
+        """
+        Cancels every job of a project in the given `states`, optionally only
+        those of one `spider`. Derived, finds the jobs with a single call to
+        Scrapyd's list jobs endpoint, then cancels them with `cancel_many`,
+        which the other keyword arguments are passed on to.
+        """
+        jobs = self.list_jobs(project, states=list(states))
+        job_ids = [job['id'] for state in states for job in jobs[state]
+                   if spider is None or job.get('spider') == spider]
+        return self.cancel_many(project, job_ids, **kwargs)
+
+    def _active_job_ids(self, project):
+        """
+        Returns the ids of a project's pending and running jobs.
+        """
+        jobs = self.list_jobs(project,
+                              states=[constants.PENDING, constants.RUNNING])
+        return set(job['id'] for state in (constants.PENDING,
+                                           constants.RUNNING)
+                   for job in jobs[state])
+
     def delete_project(self, project):
         """
         Deletes all versions of a project. First class, maps to Scrapyd's
         delete project endpoint.
         """
-        url = self._build_url(constants.DELETE_PROJECT_ENDPOINT)
         data = {
             'project': project,
         }
-        self.client.post(url, data=data, timeout=self.timeout)
+        self._request('post', constants.DELETE_PROJECT_ENDPOINT, data=data)
+        self._invalidate_project(project)
         return True
 
     def delete_version(self, project, version):
@@ -109,12 +386,12 @@ class ScrapydAPI(object):
         Deletes a specific version of a project. First class, maps to
         Scrapyd's delete version endpoint.
         """
-        url = self._build_url(constants.DELETE_VERSION_ENDPOINT)
         data = {
             'project': project,
             'version': version
         }
-        self.client.post(url, data=data, timeout=self.timeout)
+        self._request('post', constants.DELETE_VERSION_ENDPOINT, data=data)
+        self._invalidate_project(project)
         return True
 
     def job_status(self, project, job_id):
@@ -123,20 +400,111 @@ class ScrapydAPI(object):
         utilises Scrapyd's list jobs endpoint to provide the answer.
         """
         all_jobs = self.list_jobs(project)
-        for state in constants.JOB_STATES:
-            job_ids = [job['id'] for job in all_jobs[state]]
-            if job_id in job_ids:
-                return state
-        return ''  # Job not found, state unknown.
+        # Job not found, state unknown.
+        return index_job_states(all_jobs).get(job_id, '')
+
+    def job_statuses(self, project, job_ids):
+        """
+        Retrieves the 'status' of many jobs at once from a single listing.
+        Derived, utilises Scrapyd's list jobs endpoint to provide the answer.
+        Returns a dict of job id to state, with '' for unknown jobs.
+        """
+        index = index_job_states(self.list_jobs(project))
+        return dict((job_id, index.get(job_id, '')) for job_id in job_ids)
+
+    def iter_job_transitions(self, project, job_ids, timeout=None,
+                             min_interval=DEFAULT_MIN_INTERVAL,
+                             max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        Yields a `JobTransition` each time one of the given jobs changes
+        state, stopping once all of them are finished or unknown. Derived,
+        makes a single call to Scrapyd's list jobs endpoint per poll for all
+        of the jobs.
+
+        The poll interval stays at `min_interval` while jobs are pending or
+        changing state and backs off towards `max_interval` while they are
+        only running. Raises `ScrapydTimeoutError` if the jobs have not all
+        finished within `timeout` seconds.
+        """
+        waiter = JobWaiter(job_ids, timeout=timeout,
+                           min_interval=min_interval,
+                           max_interval=max_interval)
+        while True:
+            for transition in waiter.update(self.list_jobs(project)):
+                yield transition
+            if waiter.done:
+                return
+            sleep(waiter.next_wait())
+
+    def wait_for_jobs(self, project, job_ids, timeout=None,
+                      min_interval=DEFAULT_MIN_INTERVAL,
+                      max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        Blocks until all of the given jobs are finished or unknown. Derived,
+        see `iter_job_transitions`. Returns a dict of job id to final state.
+        """
+        job_ids = list(job_ids)
+        states = dict((job_id, None) for job_id in job_ids)
+        for transition in self.iter_job_transitions(
+                project, job_ids, timeout=timeout,
+                min_interval=min_interval, max_interval=max_interval):
+            states[transition.job_id] = transition.state
+        return states
+
+    def job_log(self, project, spider, job, offset=0,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Streams a job's log file as chunks of bytes, starting `offset` bytes
+        in, without holding the whole log in memory. First class, maps to
+        the log files Scrapyd serves under its logs directory; requires a
+        client with an `iter_bytes` method such as the default client.
+        """
+        url = self._build_log_url(project, spider, job)
+        return self.client.iter_bytes(url, offset=offset,
+                                      chunk_size=chunk_size,
+                                      timeout=self.timeout)
+
+    def tail_log(self, project, spider, job, offset=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=1.0):
+        """
+        Returns a `LogTail` which follows a job's log, requesting only the
+        bytes appended since its last read. Derived, iterating over it yields
+        new chunks until the job has finished, as per the list jobs endpoint.
+        """
+        return LogTail(self, project, spider, job, offset=offset,
+                       chunk_size=chunk_size, poll_interval=poll_interval)
 
-    def list_jobs(self, project):
+    def list_jobs(self, project, typed=False, states=None):
         """
         Lists all known jobs for a project. First class, maps to Scrapyd's
         list jobs endpoint.
+
+        With `typed` the jobs are returned as a `scrapyd_api.jobs.JobList` of
+        compact `Job` records rather than as dicts.
+
+        Passing `states`, e.g. `[RUNNING, PENDING]`, returns only the jobs in
+        those states. The default client then parses the response as it is
+        streamed in and skips over the other states' jobs without decoding
+        them, which saves building the usually huge list of finished jobs.
         """
-        url = self._build_url(constants.LIST_JOBS_ENDPOINT)
         params = {'project': project}
-        jobs = self.client.get(url, params=params, timeout=self.timeout)
+        if states is None:
+            jobs = self._request('get', constants.LIST_JOBS_ENDPOINT,
+                                 params=params)
+        elif hasattr(self.client, 'get_members'):
+            keys = list(states) + ['node_name']
+            jobs = self._request('get_members', constants.LIST_JOBS_ENDPOINT,
+                                 keys=keys, params=params)
+        else:
+            jobs = self._request('get', constants.LIST_JOBS_ENDPOINT,
+                                 params=params)
+            jobs = dict((key, value) for key, value in iteritems(jobs)
+                        if key in states or key == 'node_name')
+        if states is not None:
+            for state in states:
+                jobs.setdefault(state, [])
+        if typed:
+            return JobList.from_response(jobs)
         return jobs
 
     def list_projects(self):
@@ -144,37 +512,40 @@ class ScrapydAPI(object):
         Lists all deployed projects. First class, maps to Scrapyd's
         list projects endpoint.
         """
-        url = self._build_url(constants.LIST_PROJECTS_ENDPOINT)
-        json = self.client.get(url, timeout=self.timeout)
-        return json['projects']
+        def fetch():
+            json = self._request('get', constants.LIST_PROJECTS_ENDPOINT)
+            return json['projects']
+        return self._cached(constants.LIST_PROJECTS_ENDPOINT, None, fetch)
 
     def list_spiders(self, project):
         """
         Lists all known spiders for a specific project. First class, maps
         to Scrapyd's list spiders endpoint.
         """
-        url = self._build_url(constants.LIST_SPIDERS_ENDPOINT)
-        params = {'project': project}
-        json = self.client.get(url, params=params, timeout=self.timeout)
-        return json['spiders']
+        def fetch():
+            params = {'project': project}
+            json = self._request('get', constants.LIST_SPIDERS_ENDPOINT,
+                                 params=params)
+            return json['spiders']
+        return self._cached(constants.LIST_SPIDERS_ENDPOINT, project, fetch)
 
     def list_versions(self, project):
         """
         Lists all deployed versions of a specific project. First class, maps
         to Scrapyd's list versions endpoint.
         """
-        url = self._build_url(constants.LIST_VERSIONS_ENDPOINT)
-        params = {'project': project}
-        json = self.client.get(url, params=params, timeout=self.timeout)
-        return json['versions']
+        def fetch():
+            params = {'project': project}
+            json = self._request('get', constants.LIST_VERSIONS_ENDPOINT,
+                                 params=params)
+            return json['versions']
+        return self._cached(constants.LIST_VERSIONS_ENDPOINT, project, fetch)
 
     def schedule(self, project, spider, settings=None, **kwargs):
         """
         Schedules a spider from a specific project to run. First class, maps
         to Scrapyd's scheduling endpoint.
         """
-
-        url = self._build_url(constants.SCHEDULE_ENDPOINT)
         data = {
             'project': project,
             'spider': spider
@@ -185,14 +556,38 @@ class ScrapydAPI(object):
             for setting_name, value in iteritems(settings):
                 setting_params.append('{0}={1}'.format(setting_name, value))
             data['setting'] = setting_params
-        json = self.client.post(url, data=data, timeout=self.timeout)
+        json = self._request('post', constants.SCHEDULE_ENDPOINT, data=data)
         return json['jobid']
 
+    def schedule_many(self, requests, max_workers=8):
+        """
+        Schedules many spider runs concurrently. Derived, submits to Scrapyd's
+        scheduling endpoint from a bounded pool of threads which share the
+        client's pooled connections.
+
+        Each request is a dict of `schedule()` keyword arguments, i.e. it must
+        contain `project` and `spider` and may contain `settings` and any
+        extra spider arguments. Returns a list in the same order as the
+        requests holding either the job id or the exception raised for that
+        item, so one failure does not abort the rest of the batch.
+        """
+        def submit(request):
+            try:
+                return self.schedule(**request)
+            except Exception as exc:
+                return exc
+
+        requests = list(requests)
+        if not requests:
+            return []
+        workers = min(max_workers, len(requests))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(submit, requests))
+
     def daemon_status(self):
         """
         Displays the load status of a service.
         :rtype: dict
         """
-        url = self._build_url(constants.DAEMON_STATUS_ENDPOINT)
-        json = self.client.get(url, timeout=self.timeout)
+        json = self._request('get', constants.DAEMON_STATUS_ENDPOINT)
         return json
@@ -46,8 +46,13 @@ setup(
     include_package_data=True,
     setup_requires=['setuptools>=38.6.0'],
     install_requires=[
-        'requests'
+        'requests',
+        'futures; python_version < "3"'
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'urllib3': ['urllib3>=1.25.9'],
+    },
     license="BSD",
     zip_safe=False,
     classifiers=[
@@ -0,0 +1,44 @@
+import sys
+
+import pytest
+
+from scrapyd_api.testing import FakeScrapyd
+
+PROJECT = 'project'
+
+collect_ignore = []
+if sys.version_info < (3, 8):
+    # The asyncio tests are written with async syntax and unittest.mock's
+    # AsyncMock, neither of which older interpreters can even import.
+    collect_ignore.append('test_aio.py')
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def timer():
+    """
+    A clock for the code under test which only moves when `now` is set.
+    """
+    return FakeTimer()
+
+
+@pytest.fixture
+def server(request):
+    """
+    A running `FakeScrapyd` with one project deployed, at version '1' with
+    two spiders. A test module can pass options to `FakeScrapyd` through a
+    module level SERVER_OPTIONS dict.
+    """
+    options = getattr(request.module, 'SERVER_OPTIONS', {})
+    with FakeScrapyd(**options) as server:
+        server.add_project(PROJECT, versions=['1'],
+                           spiders=['spider', 'other'])
+        yield server
@@ -0,0 +1,275 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from unittest.mock import AsyncMock
+
+from aiohttp import web
+
+from scrapyd_api.aio import AsyncClient, AsyncScrapydAPI
+from scrapyd_api.constants import FINISHED, PENDING, RUNNING
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.polling import JobTransition
+from scrapyd_api.testing import FakeScrapyd
+from scrapyd_api.wrapper import ScrapydAPI
+
+HOST_URL = 'http://localhost'
+AUTH = ('username', 'password')
+PROJECT = 'project'
+VERSION = '45'
+SPIDER = 'spider'
+JOB = 'd131dd02c5e6eec4693d9a0698aff95c'
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_auth_gets_applied_when_client_is_not_supplied():
+    api = AsyncScrapydAPI(HOST_URL, auth=AUTH)
+    assert isinstance(api.client, AsyncClient)
+    assert api.client.auth == AUTH
+
+
+def test_every_public_method_has_an_async_counterpart():
+    # The async wrapper only shares URL building with the synchronous one,
+    # so a method added to ScrapydAPI is missing here rather than inherited
+    # as synchronous code.
+    assert not issubclass(AsyncScrapydAPI, ScrapydAPI)
+    for name, value in vars(ScrapydAPI).items():
+        if callable(value) and not name.startswith('_'):
+            assert name in vars(AsyncScrapydAPI), name
+
+
+def test_add_version():
+    mock_client = AsyncMock()
+    mock_client.post.return_value = {'spiders': 3}
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.add_version(PROJECT, VERSION, b'Test egg'))
+    assert rtn == 3
+    mock_client.post.assert_called_with(
+        'http://localhost/addversion.json',
+        data={
+            'project': PROJECT,
+            'version': VERSION
+        },
+        files={
+            'egg': b'Test egg'
+        },
+        timeout=None
+    )
+
+
+def test_cancel_with_signal():
+    mock_client = AsyncMock()
+    mock_client.post.return_value = {'prevstate': 'running'}
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.cancel(PROJECT, JOB, signal='TERM'))
+    assert rtn == 'running'
+    mock_client.post.assert_called_with(
+        'http://localhost/cancel.json',
+        data={
+            'project': PROJECT,
+            'job': JOB,
+            'signal': 'TERM'
+        },
+        timeout=None
+    )
+
+
+def test_job_status():
+    mock_client = AsyncMock()
+    mock_client.get.return_value = {
+        'pending': [{'id': 'abc'}, {'id': 'def'}],
+        'running': [],
+        'finished': [{'id': 'ghi'}],
+    }
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    assert run(api.job_status(PROJECT, 'abc')) == PENDING
+    assert run(api.job_status(PROJECT, 'ghi')) == FINISHED
+    assert run(api.job_status(PROJECT, 'xyz')) == ''
+
+
+def test_wait_for_jobs():
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = [
+        {'pending': [{'id': 'abc'}], 'running': [], 'finished': []},
+        {'pending': [], 'running': [], 'finished': [{'id': 'abc'}]},
+    ]
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.wait_for_jobs(PROJECT, ['abc'], min_interval=0))
+    assert rtn == {'abc': FINISHED}
+    assert mock_client.get.call_count == 2
+
+
+def test_iter_job_transitions():
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = [
+        {'pending': [{'id': 'abc'}], 'running': [], 'finished': []},
+        {'pending': [], 'running': [{'id': 'abc'}], 'finished': []},
+        {'pending': [], 'running': [], 'finished': [{'id': 'abc'}]},
+    ]
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+
+    async def collect():
+        return [transition async for transition in
+                api.iter_job_transitions(PROJECT, ['abc'], min_interval=0)]
+
+    assert run(collect()) == [
+        JobTransition('abc', None, PENDING),
+        JobTransition('abc', PENDING, RUNNING),
+        JobTransition('abc', RUNNING, FINISHED),
+    ]
+    assert mock_client.get.call_count == 3
+
+
+def test_schedule():
+    mock_client = AsyncMock()
+    mock_client.post.return_value = {'jobid': JOB}
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.schedule(PROJECT, SPIDER, settings={'DOWNLOAD_DELAY': 2},
+                           extra_detail='Test'))
+    assert rtn == JOB
+    mock_client.post.assert_called_with(
+        'http://localhost/schedule.json',
+        data={
+            'project': PROJECT,
+            'spider': SPIDER,
+            'extra_detail': 'Test',
+            'setting': ['DOWNLOAD_DELAY=2']
+        },
+        timeout=None
+    )
+
+
+def test_schedule_many():
+    mock_client = AsyncMock()
+    mock_client.post.side_effect = [
+        {'jobid': 'one'}, ScrapydResponseError('boom'), {'jobid': 'two'}]
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.schedule_many([
+        {'project': PROJECT, 'spider': SPIDER},
+        {'project': PROJECT, 'spider': SPIDER},
+        {'project': PROJECT, 'spider': SPIDER},
+    ], max_workers=1))
+    assert rtn[0] == 'one'
+    assert isinstance(rtn[1], ScrapydResponseError)
+    assert rtn[2] == 'two'
+
+
+def test_cancel_many_escalates_after_grace_period():
+    mock_client = AsyncMock()
+    mock_client.post.side_effect = [
+        {'prevstate': 'running'}, {'prevstate': 'pending'},
+        {'prevstate': 'running'}]
+    mock_client.get.return_value = {
+        'pending': [], 'running': [{'id': 'abc'}], 'finished': []}
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    rtn = run(api.cancel_many(PROJECT, ['abc', 'def'], grace_period=0,
+                              max_workers=1))
+    assert rtn == {'abc': 'running', 'def': 'pending'}
+    mock_client.post.assert_called_with(
+        'http://localhost/cancel.json',
+        data={'project': PROJECT, 'job': 'abc', 'signal': 'KILL'},
+        timeout=None
+    )
+
+
+def test_list_projects():
+    mock_client = AsyncMock()
+    mock_client.get.return_value = {'projects': ['test', 'test2']}
+    api = AsyncScrapydAPI(HOST_URL, client=mock_client)
+    assert run(api.list_projects()) == ['test', 'test2']
+    mock_client.get.assert_called_with(
+        'http://localhost/listprojects.json',
+        timeout=None
+    )
+
+
+def test_client_handle_response():
+    client = AsyncClient()
+    assert client._handle_response(
+        200, b'{"status": "ok", "key": "value"}') == {'key': 'value'}
+    with pytest.raises(ScrapydResponseError) as excinfo:
+        client._handle_response(500, b'this-aint-json')
+    assert '500 error' in str(excinfo.value)
+    with pytest.raises(ScrapydResponseError) as excinfo:
+        client._handle_response(200, b'this-aint-json')
+    assert 'invalid JSON' in str(excinfo.value)
+    with pytest.raises(ScrapydResponseError) as excinfo:
+        client._handle_response(
+            200, b'{"status": "error", "message": "some-error"}')
+    assert 'some-error' in str(excinfo.value)
+
+
+def test_requests_against_a_local_server():
+    """
+    The client should reuse its session across requests made to a real
+    HTTP server and encode form data the way Scrapyd expects.
+    """
+    received = []
+
+    async def listjobs(request):
+        received.append(dict(request.query))
+        return web.json_response({'status': 'ok', 'pending': [],
+                                  'running': [{'id': JOB}], 'finished': []})
+
+    async def schedule(request):
+        form = await request.post()
+        received.append(form.getall('setting'))
+        return web.json_response({'status': 'ok', 'jobid': JOB})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/listjobs.json', listjobs)
+        app.router.add_post('/schedule.json', schedule)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncScrapydAPI('http://127.0.0.1:%d' % port) as api:
+                state = await api.job_status(PROJECT, JOB)
+                session = api.client._session
+                jobid = await api.schedule(PROJECT, SPIDER,
+                                           settings={'A': 1})
+                assert api.client._session is session
+            assert api.client._session is None
+            return state, jobid
+        finally:
+            await runner.cleanup()
+
+    state, jobid = run(scenario())
+    assert state == 'running'
+    assert jobid == JOB
+    assert received == [{'project': PROJECT}, ['A=1']]
+
+
+def test_job_log_and_tail_log():
+    async def collect(chunks):
+        return b''.join([chunk async for chunk in chunks])
+
+    async def scenario(server):
+        async with AsyncScrapydAPI(server.url) as api:
+            job_id = await api.schedule(PROJECT, SPIDER)
+            server.write_log(job_id, 'first line\n')
+            whole = await collect(api.job_log(PROJECT, SPIDER, job_id))
+            tail = api.tail_log(PROJECT, SPIDER, job_id, poll_interval=0.01)
+            first = await collect(tail.read_new())
+            server.write_log(job_id, 'second line\n')
+            server.finish_job(job_id)
+            rest = await collect(tail)
+            with pytest.raises(ScrapydResponseError) as excinfo:
+                await collect(api.job_log(PROJECT, SPIDER, 'unknown'))
+            return whole, first, rest, excinfo.value.status_code
+
+    with FakeScrapyd(pending_time=0) as server:
+        server.add_project(PROJECT)
+        whole, first, rest, status_code = run(scenario(server))
+    assert whole == b'first line\n'
+    assert first == b'first line\n'
+    assert rest == b'second line\n'
+    assert status_code == 404
@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_json_decode_micro_benchmark_runs():
+    # A small run, so that the benchmark keeps working as the client
+    # changes; the timings themselves are not checked.
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.check_output(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'json_decode.py'),
+         '--jobs', '100', '--repeat', '1'], env=env)
+    assert b'json.loads on bytes' in output
@@ -0,0 +1,55 @@
+from scrapyd_api.cache import TTLCache
+from scrapyd_api.constants import (
+    LIST_PROJECTS_ENDPOINT,
+    LIST_VERSIONS_ENDPOINT
+)
+
+
+def test_entries_expire_per_endpoint_ttl(timer):
+    cache = TTLCache(ttls={LIST_PROJECTS_ENDPOINT: 10}, default_ttl=60,
+                     timer=timer)
+    cache.set(LIST_PROJECTS_ENDPOINT, None, ['project'])
+    cache.set(LIST_VERSIONS_ENDPOINT, 'project', ['1', '2'])
+    timer.now = 9
+    assert cache.get(LIST_PROJECTS_ENDPOINT) == ['project']
+    timer.now = 10
+    assert cache.get(LIST_PROJECTS_ENDPOINT) is None
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'project') == ['1', '2']
+    timer.now = 60
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'project', 'miss') == 'miss'
+
+
+def test_zero_ttl_disables_an_endpoint():
+    cache = TTLCache(ttls={LIST_PROJECTS_ENDPOINT: 0})
+    cache.set(LIST_PROJECTS_ENDPOINT, None, ['project'])
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set(LIST_VERSIONS_ENDPOINT, 'a', ['1'])
+    cache.set(LIST_VERSIONS_ENDPOINT, 'b', ['2'])
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'a') == ['1']
+    cache.set(LIST_VERSIONS_ENDPOINT, 'c', ['3'])
+    assert len(cache) == 2
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'b') is None
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'a') == ['1']
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'c') == ['3']
+
+
+def test_returned_values_are_copies():
+    cache = TTLCache()
+    cache.set(LIST_PROJECTS_ENDPOINT, None, ['project'])
+    cache.get(LIST_PROJECTS_ENDPOINT).append('mutated')
+    assert cache.get(LIST_PROJECTS_ENDPOINT) == ['project']
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache()
+    cache.set(LIST_VERSIONS_ENDPOINT, 'a', ['1'])
+    cache.set(LIST_VERSIONS_ENDPOINT, 'b', ['2'])
+    cache.invalidate(LIST_VERSIONS_ENDPOINT, 'a')
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'a') is None
+    assert cache.get(LIST_VERSIONS_ENDPOINT, 'b') == ['2']
+    cache.clear()
+    assert len(cache) == 0
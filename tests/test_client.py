@@ -114,3 +114,109 @@ def test_with_auth():
     call = responses.calls[0]
     assert 'Authorization' in call.request.headers
     assert 'Basic' in call.request.headers['Authorization']
+
+
+@responses.activate
+def test_stream_requests_range_from_offset():
+    """
+    Streaming from an offset should only request the remaining bytes.
+    """
+    client = Client()
+    responses.add(responses.GET, URL, body=b'world', status=206)
+    chunks = list(client.iter_bytes(URL, offset=6, chunk_size=2))
+    assert b''.join(chunks) == b'world'
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert responses.calls[0].request.headers['Range'] == 'bytes=6-'
+
+
+@responses.activate
+def test_stream_without_offset_sends_no_range():
+    client = Client()
+    responses.add(responses.GET, URL, body=b'hello world', status=200)
+    assert b''.join(client.iter_bytes(URL)) == b'hello world'
+    assert 'Range' not in responses.calls[0].request.headers
+
+
+@responses.activate
+def test_stream_skips_offset_when_range_is_ignored():
+    client = Client()
+    responses.add(responses.GET, URL, body=b'hello world', status=200)
+    chunks = list(client.iter_bytes(URL, offset=6, chunk_size=4))
+    assert b''.join(chunks) == b'world'
+
+
+@responses.activate
+def test_stream_at_end_of_body_yields_nothing():
+    client = Client()
+    responses.add(responses.GET, URL, body=b'', status=416)
+    assert list(client.iter_bytes(URL, offset=11)) == []
+
+
+@responses.activate
+def test_stream_http_error():
+    client = Client()
+    responses.add(responses.GET, URL, body='Not found', status=404)
+    with pytest.raises(ScrapydResponseError) as excinfo:
+        list(client.iter_bytes(URL))
+    assert excinfo.value.status_code == 404
+
+
+def test_pool_options_configure_the_adapters():
+    client = Client(pool_connections=4, pool_maxsize=64, pool_block=True)
+    for prefix in ('http://', 'https://'):
+        adapter = client.get_adapter(prefix + 'localhost')
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 64
+        assert adapter._pool_block is True
+    assert client.headers.get('Connection') != 'close'
+
+
+@responses.activate
+def test_keep_alive_can_be_disabled():
+    client = Client(keep_alive=False)
+    responses.add(responses.GET, URL, body=OK_JSON, status=200)
+    client.get(URL)
+    assert responses.calls[0].request.headers['Connection'] == 'close'
+
+
+class FakeResponse(object):
+    """
+    A response whose text must not be touched on the success path.
+    """
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    @property
+    def text(self):
+        if self.status_code < 400:
+            raise AssertionError('response.text read on the success path')
+        return self.content.decode('utf-8')
+
+
+def test_handle_response_decodes_raw_bytes_with_custom_decoder():
+    decoded = []
+
+    def json_loads(body):
+        decoded.append(body)
+        return json.loads(body)
+
+    client = Client(json_loads=json_loads)
+    body = json.dumps({
+        'status': 'ok',
+        'finished': [{'id': str(i), 'spider': 'spider'}
+                     for i in range(20000)],
+    }).encode('utf-8')
+    rtn = client._handle_response(FakeResponse(body))
+    assert decoded == [body]
+    assert len(rtn['finished']) == 20000
+    assert 'status' not in rtn
+
+
+def test_handle_response_only_reads_text_for_errors():
+    client = Client()
+    with pytest.raises(ScrapydResponseError) as excinfo:
+        client._handle_response(FakeResponse(b'oops', status_code=503))
+    assert excinfo.value.status_code == 503
+    assert 'oops' in str(excinfo.value)
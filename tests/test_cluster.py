@@ -0,0 +1,353 @@
+import socket
+import threading
+import time
+
+from mock import MagicMock
+
+from scrapyd_api import PENDING, RUNNING
+from scrapyd_api.cluster import ClusterResult, ScrapydCluster
+from scrapyd_api.constants import (
+    ADD_VERSION_ENDPOINT,
+    LIST_JOBS_ENDPOINT,
+    LIST_PROJECTS_ENDPOINT
+)
+from scrapyd_api.deploy import EggBuilder, content_version, hash_project
+from scrapyd_api.exceptions import (
+    ScrapydBusyError,
+    ScrapydResponseError,
+    ScrapydTimeoutError
+)
+from scrapyd_api.retry import CircuitBreaker, RetryPolicy
+from scrapyd_api.testing import FakeScrapyd
+from scrapyd_api.wrapper import ScrapydAPI
+
+PROJECT = 'project'
+
+
+def make_node(target, **attrs):
+    node = MagicMock(spec=ScrapydAPI)
+    node.target = target
+    for name, value in attrs.items():
+        setattr(node, name, value)
+    return node
+
+
+def test_nodes_are_built_from_target_strings():
+    cluster = ScrapydCluster(['http://node1:6800', 'http://node2:6800'],
+                             auth=('user', 'pass'), timeout=3)
+    assert list(cluster.nodes) == ['http://node1:6800', 'http://node2:6800']
+    assert len(cluster) == 2
+    node = cluster.nodes['http://node2:6800']
+    assert isinstance(node, ScrapydAPI)
+    assert node.client.auth == ('user', 'pass')
+    assert node.timeout == 3
+    assert cluster.max_workers == 2
+
+
+def test_nodes_get_the_json_decoder():
+    def json_loads(body):
+        return {}
+
+    cluster = ScrapydCluster(['http://node1:6800'], json_loads=json_loads)
+    assert cluster.nodes['http://node1:6800'].client.json_loads is json_loads
+
+
+def test_nodes_get_their_own_circuit_breakers():
+    policy = RetryPolicy()
+    cluster = ScrapydCluster(['http://node1:6800', 'http://node2:6800'],
+                             retry=policy, circuit_breaker=True)
+    node1, node2 = cluster.nodes.values()
+    assert node1.retry is node2.retry is policy
+    assert isinstance(node1.circuit_breaker, CircuitBreaker)
+    assert node1.circuit_breaker is not node2.circuit_breaker
+    assert ScrapydCluster(['http://node1:6800']).nodes[
+        'http://node1:6800'].circuit_breaker is None
+
+
+def test_call_collects_results_and_errors_per_node():
+    ok = make_node('http://ok')
+    ok.list_jobs.return_value = {'pending': [], 'running': [],
+                                 'finished': []}
+    broken = make_node('http://broken')
+    broken.list_jobs.side_effect = ScrapydResponseError('boom')
+    with ScrapydCluster([ok, broken]) as cluster:
+        result = cluster.list_jobs(PROJECT)
+    assert isinstance(result, ClusterResult)
+    assert not result.ok
+    assert result.results == {'http://ok': {'pending': [], 'running': [],
+                                            'finished': []}}
+    assert list(result.errors) == ['http://broken']
+    assert str(result.errors['http://broken']) == 'boom'
+    ok.list_jobs.assert_called_once_with(PROJECT)
+    broken.list_jobs.assert_called_once_with(PROJECT)
+
+
+def test_calls_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def daemon_status():
+        barrier.wait()
+        return {'running': 0}
+
+    nodes = [make_node('http://node%d' % i, daemon_status=daemon_status)
+             for i in range(3)]
+    with ScrapydCluster(nodes) as cluster:
+        result = cluster.daemon_status()
+    assert result.ok
+    assert len(result.results) == 3
+
+
+def test_slow_node_does_not_stall_the_rest():
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return ['late']
+
+    fast = make_node('http://fast')
+    fast.list_projects.return_value = ['project']
+    slow_node = make_node('http://slow', list_projects=slow)
+    with ScrapydCluster([fast, slow_node]) as cluster:
+        started = time.time()
+        result = cluster.list_projects(deadline=0.1)
+        assert time.time() - started < 1
+        release.set()
+    assert result.results == {'http://fast': ['project']}
+    assert isinstance(result.errors['http://slow'], ScrapydTimeoutError)
+
+
+def test_cluster_result_getitem_raises_node_errors():
+    result = ClusterResult()
+    result.results['a'] = 1
+    result.errors['b'] = ScrapydResponseError('boom')
+    assert result['a'] == 1
+    try:
+        result['b']
+    except ScrapydResponseError as exc:
+        assert str(exc) == 'boom'
+    else:
+        assert False, 'Expected the node error to be raised'
+
+
+def test_add_version_reads_the_egg_once_and_uploads_to_every_node(tmpdir):
+    egg = tmpdir.join('project.egg')
+    egg.write_binary(b'egg bytes')
+    uploaded = {}
+
+    def uploader(target):
+        def add_version(project, version, body, stream=False):
+            assert stream
+            uploaded[target] = body.read()
+            return 2
+        return add_version
+
+    nodes = [make_node('http://node%d' % i,
+                       add_version=uploader('http://node%d' % i))
+             for i in range(3)]
+    with ScrapydCluster(nodes) as cluster:
+        result = cluster.add_version(PROJECT, '1', str(egg),
+                                     max_concurrency=2)
+    assert result.ok
+    assert result.rollback is None
+    assert list(result.results.values()) == [2, 2, 2]
+    assert uploaded == dict((node.target, b'egg bytes') for node in nodes)
+
+
+def test_add_version_limits_concurrent_uploads():
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def add_version(project, version, body, stream=False):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return 1
+
+    nodes = [make_node('http://node%d' % i, add_version=add_version)
+             for i in range(6)]
+    with ScrapydCluster(nodes) as cluster:
+        result = cluster.add_version(PROJECT, '1', b'egg', max_concurrency=2)
+    assert result.ok
+    assert peak[0] == 2
+
+
+def test_add_version_rolls_back_partial_failures():
+    ok = make_node('http://ok')
+    ok.add_version.return_value = 3
+    broken = make_node('http://broken')
+    broken.add_version.side_effect = ScrapydResponseError('boom')
+    with ScrapydCluster([ok, broken]) as cluster:
+        result = cluster.add_version(PROJECT, '1', b'egg', rollback=True)
+    assert result.results == {'http://ok': 3}
+    assert list(result.errors) == ['http://broken']
+    assert result.rollback.ok
+    ok.delete_version.assert_called_once_with(PROJECT, '1')
+    broken.delete_version.assert_not_called()
+
+
+def test_add_version_rolls_back_uploads_which_missed_the_deadline():
+    with FakeScrapyd() as fast, \
+            FakeScrapyd(latency={ADD_VERSION_ENDPOINT: 1.0}) as slow, \
+            FakeScrapyd() as broken:
+        for server in (fast, slow, broken):
+            server.add_project(PROJECT, versions=['1'])
+        broken.inject_error(ADD_VERSION_ENDPOINT, status_code=500)
+        with ScrapydCluster([fast.url, slow.url, broken.url]) as cluster:
+            result = cluster.add_version(PROJECT, '2', b'egg', rollback=True,
+                                         deadline=0.3)
+            assert list(result.results) == [fast.url]
+            assert isinstance(result.errors[slow.url], ScrapydTimeoutError)
+            assert sorted(result.rollback.results) == sorted([fast.url,
+                                                              slow.url])
+            versions = cluster.list_versions(PROJECT)
+        assert list(versions.results.values()) == [['1'], ['1'], ['1']]
+
+
+def test_add_version_does_not_roll_back_by_default():
+    ok = make_node('http://ok')
+    broken = make_node('http://broken')
+    broken.add_version.side_effect = ScrapydResponseError('boom')
+    with ScrapydCluster([ok, broken]) as cluster:
+        result = cluster.add_version(PROJECT, '1', b'egg')
+    assert result.rollback is None
+    ok.delete_version.assert_not_called()
+
+
+def test_deploy_builds_once_and_skips_up_to_date_nodes(tmpdir):
+    project_dir = tmpdir.mkdir('proj')
+    project_dir.join('settings.py').write('BOT_NAME = "proj"\n')
+    current = content_version(hash_project(str(project_dir)), timestamp=1)
+    fresh = make_node('http://fresh')
+    fresh.list_versions.return_value = [current]
+    stale = make_node('http://stale')
+    stale.list_versions.return_value = ['1.0']
+    stale.add_version.return_value = 4
+    down = make_node('http://down')
+    down.list_versions.side_effect = ScrapydResponseError('boom')
+    down.add_version.return_value = 4
+    egg = tmpdir.join('built.egg')
+    egg.write_binary(b'egg')
+    builder = MagicMock(spec=EggBuilder)
+    builder.build.return_value = str(egg)
+
+    with ScrapydCluster([fresh, stale, down]) as cluster:
+        result = cluster.deploy(PROJECT, str(project_dir), builder=builder)
+    assert result.results == {'http://stale': 4, 'http://down': 4,
+                              'http://fresh': None}
+    builder.build.assert_called_once()
+    fresh.add_version.assert_not_called()
+    version = stale.add_version.call_args[0][1]
+    assert version.endswith(current.split('.')[-1])
+
+
+def test_list_all_jobs_merges_every_project_on_every_node():
+    node1 = make_node('http://node1')
+    node1.list_projects.return_value = ['a', 'b']
+    node1.list_jobs.side_effect = lambda project, states=None: {
+        'pending': [], 'finished': [],
+        'running': [{'id': project + '1', 'spider': 'spider'}]}
+    node2 = make_node('http://node2')
+    node2.list_projects.return_value = ['a']
+    node2.list_jobs.return_value = {
+        'pending': [{'id': 'a1', 'spider': 'spider'}], 'running': [],
+        'finished': []}
+    down = make_node('http://down')
+    down.list_projects.side_effect = ScrapydResponseError('boom')
+
+    with ScrapydCluster([node1, node2, down]) as cluster:
+        index = cluster.list_all_jobs(states=[PENDING, RUNNING])
+    assert list(index) == [('http://node1', 'a', 'a1'),
+                           ('http://node1', 'b', 'b1'),
+                           ('http://node2', 'a', 'a1')]
+    job = index[('http://node1', 'b', 'b1')]
+    assert (job.project, job.state) == ('b', RUNNING)
+    assert list(index.by_state(PENDING)) == [('http://node2', 'a', 'a1')]
+    assert not index.ok
+    assert list(index.errors) == [('http://down', None)]
+    node1.list_jobs.assert_any_call('a', states=[PENDING, RUNNING])
+    down.list_jobs.assert_not_called()
+
+
+def test_list_all_jobs_for_given_projects():
+    node = make_node('http://node')
+    node.list_jobs.side_effect = ScrapydResponseError('boom')
+    with ScrapydCluster([node]) as cluster:
+        index = cluster.list_all_jobs(projects=['a'])
+    node.list_projects.assert_not_called()
+    assert len(index) == 0
+    assert list(index.errors) == [('http://node', 'a')]
+
+
+def test_list_all_jobs_reuses_cached_project_lists():
+    with FakeScrapyd() as server:
+        server.add_project('a')
+        server.add_project('b')
+        with ScrapydCluster([server.url], cache=True) as cluster:
+            running = cluster.nodes[server.url].schedule('b', 'spider')
+            for _ in range(3):
+                index = cluster.list_all_jobs()
+        assert index[(server.url, 'b', running)].state == RUNNING
+        assert server.request_counts[LIST_PROJECTS_ENDPOINT] == 1
+        assert server.request_counts[LIST_JOBS_ENDPOINT] == 6
+
+
+def test_list_all_jobs_is_not_held_up_by_a_slow_node():
+    projects = ['a', 'b', 'c', 'd']
+    with FakeScrapyd(latency={LIST_JOBS_ENDPOINT: 1.0}) as slow, \
+            FakeScrapyd() as fast:
+        for server in (slow, fast):
+            for project in projects:
+                server.add_project(project)
+        with ScrapydCluster([slow.url, fast.url]) as cluster:
+            index = cluster.list_all_jobs(projects=projects, deadline=0.5)
+        slow_url = slow.url
+    assert sorted(index.errors) == [(slow_url, project)
+                                    for project in projects]
+    assert all(isinstance(error, ScrapydTimeoutError)
+               for error in index.errors.values())
+
+
+def test_concurrent_calls_on_a_healthy_cluster():
+    servers = [FakeScrapyd(latency=0.2) for _ in range(3)]
+    for server in servers:
+        server.start()
+    results = {}
+    try:
+        with ScrapydCluster([server.url for server in servers]) as cluster:
+            threads = [
+                threading.Thread(target=lambda name=name: results.update(
+                    {name: getattr(cluster, name)(deadline=5)}))
+                for name in ('daemon_status', 'list_projects')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        for server in servers:
+            server.stop()
+    assert results['daemon_status'].ok, results['daemon_status'].errors
+    assert results['list_projects'].ok, results['list_projects'].errors
+
+
+def test_a_hung_node_does_not_stall_the_others():
+    # Accepts connections but never answers them.
+    hole = socket.socket()
+    hole.bind(('127.0.0.1', 0))
+    hole.listen(16)
+    hung = 'http://127.0.0.1:{0}'.format(hole.getsockname()[1])
+    try:
+        with FakeScrapyd() as one, FakeScrapyd() as two:
+            with ScrapydCluster([hung, one.url, two.url],
+                                timeout=5) as cluster:
+                for call in range(5):
+                    result = cluster.daemon_status(deadline=0.3)
+                    assert list(result.results) == [one.url, two.url]
+                    error = result.errors[hung]
+                    assert isinstance(error, ScrapydTimeoutError)
+                    assert isinstance(error, ScrapydBusyError) == (call > 0)
+    finally:
+        hole.close()
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from scrapyd_api.coalesce import SingleFlight, request_key
+
+
+def run_concurrently(count, func):
+    results = [None] * count
+    threads = []
+    for index in range(count):
+        def target(index=index):
+            try:
+                results[index] = func()
+            except Exception as exc:
+                results[index] = exc
+        threads.append(threading.Thread(target=target))
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'projects': ['one']}
+
+    threads, results = run_concurrently(
+        5, lambda: flight.do('key', fetch))
+    while flight.shared < 4:
+        release.wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'projects': ['one']}] * 5
+    # Each caller gets its own copy of the outer dict.
+    assert len(set(id(result) for result in results)) == 5
+    assert len(flight) == 0
+
+
+def test_concurrent_calls_share_one_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    error = ValueError('boom')
+
+    def fetch():
+        release.wait(5)
+        raise error
+
+    threads, results = run_concurrently(3, lambda: flight.do('key', fetch))
+    while flight.shared < 2:
+        release.wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [error] * 3
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    values = iter([1, 2])
+    assert flight.do('key', lambda: next(values)) == 1
+    assert flight.do('key', lambda: next(values)) == 2
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.shared == 0
+    assert len(flight) == 0
+
+
+def test_request_key_ignores_argument_order():
+    assert (request_key('get', 'url', {'params': {'a': 1, 'b': [2]}}) ==
+            request_key('get', 'url', {'params': {'b': [2], 'a': 1}}))
+    assert (request_key('get', 'url', {'params': {'project': 'a'}}) !=
+            request_key('get', 'url', {'params': {'project': 'b'}}))
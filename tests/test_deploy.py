@@ -0,0 +1,121 @@
+import os
+import zipfile
+
+import pytest
+from mock import MagicMock
+
+from scrapyd_api.deploy import (
+    DeployResult,
+    EggBuilder,
+    content_version,
+    deploy,
+    fingerprint,
+    hash_project
+)
+from scrapyd_api.exceptions import ScrapydError
+from scrapyd_api.wrapper import ScrapydAPI
+
+PROJECT = 'project'
+
+
+def make_project(tmpdir, setup_py=False):
+    root = tmpdir.mkdir('proj')
+    root.join('scrapy.cfg').write('[settings]\ndefault = proj.settings\n')
+    package = root.mkdir('proj')
+    package.join('__init__.py').write('')
+    package.join('settings.py').write("BOT_NAME = 'proj'\n")
+    package.mkdir('spiders').join('__init__.py').write('')
+    if setup_py:
+        root.join('setup.py').write(
+            'from setuptools import setup, find_packages\n'
+            "setup(name='proj', version='1.0', packages=find_packages())\n")
+    return root
+
+
+def test_hash_changes_with_content_but_not_build_artefacts(tmpdir):
+    root = make_project(tmpdir)
+    digest = hash_project(str(root))
+    assert digest == hash_project(str(root))
+    root.mkdir('build').join('junk').write('x')
+    root.mkdir('proj.egg-info').join('PKG-INFO').write('x')
+    root.join('proj', 'settings.pyc').write('x')
+    root.join('proj').mkdir('__pycache__').join('a.pyc').write('x')
+    assert hash_project(str(root)) == digest
+    root.join('proj', 'settings.py').write("BOT_NAME = 'changed'\n")
+    assert hash_project(str(root)) != digest
+
+
+def test_content_version_sorts_by_time_and_ends_in_fingerprint():
+    digest = 'ab' * 32
+    version = content_version(digest, timestamp=1500000000.5)
+    assert version == '1500000000.' + fingerprint(digest)
+    assert version.split('.')[-1].isdigit()
+
+
+def test_builder_builds_once_per_digest(tmpdir):
+    root = make_project(tmpdir)
+    builder = EggBuilder(cache_dir=str(tmpdir.join('cache')))
+    built = []
+
+    def fake_build(project_dir, destination):
+        built.append(project_dir)
+        with open(destination, 'wb') as fh:
+            fh.write(b'egg')
+
+    builder._build = fake_build
+    egg = builder.build(str(root))
+    assert egg == builder.cached_egg(hash_project(str(root)))
+    assert builder.build(str(root)) == egg
+    assert len(built) == 1
+
+
+@pytest.mark.parametrize('setup_py', [False, True])
+def test_builder_builds_a_real_egg(tmpdir, setup_py):
+    root = make_project(tmpdir, setup_py=setup_py)
+    before = sorted(str(path) for path in root.visit())
+    builder = EggBuilder(cache_dir=str(tmpdir.join('cache')))
+    egg = builder.build(str(root))
+    assert os.path.exists(egg)
+    names = zipfile.ZipFile(egg).namelist()
+    assert 'proj/settings.py' in names
+    # The build runs in a copy, leaving no setup.py, build/ or egg-info.
+    assert sorted(str(path) for path in root.visit()) == before
+
+
+def test_builder_reports_build_failures(tmpdir):
+    root = tmpdir.mkdir('broken')
+    root.join('setup.py').write('raise SystemExit(1)\n')
+    builder = EggBuilder(cache_dir=str(tmpdir.join('cache')))
+    with pytest.raises(ScrapydError):
+        builder.build(str(root))
+    assert root.listdir() == [root.join('setup.py')]
+
+
+def test_deploy_uploads_new_content(tmpdir):
+    root = make_project(tmpdir)
+    api = MagicMock(spec=ScrapydAPI)
+    api.list_versions.return_value = ['1500000000.1']
+    api.add_version.return_value = 2
+    builder = MagicMock(spec=EggBuilder)
+    builder.build.return_value = '/cache/egg.egg'
+    result = deploy(api, PROJECT, str(root), builder=builder)
+    digest = hash_project(str(root))
+    assert result.uploaded
+    assert result.spiders == 2
+    assert result.egg == '/cache/egg.egg'
+    assert result.version.endswith('.' + fingerprint(digest))
+    builder.build.assert_called_once_with(str(root), digest=digest)
+    api.add_version.assert_called_once_with(PROJECT, result.version,
+                                            '/cache/egg.egg', stream=True)
+
+
+def test_deploy_skips_unchanged_content(tmpdir):
+    root = make_project(tmpdir)
+    latest = content_version(hash_project(str(root)), timestamp=1)
+    api = MagicMock(spec=ScrapydAPI)
+    api.list_versions.return_value = ['0.5', latest]
+    builder = MagicMock(spec=EggBuilder)
+    result = deploy(api, PROJECT, str(root), builder=builder)
+    assert result == DeployResult(latest, None, False, None)
+    builder.build.assert_not_called()
+    api.add_version.assert_not_called()
@@ -0,0 +1,103 @@
+from mock import MagicMock
+
+from scrapyd_api.cluster import ScrapydCluster
+from scrapyd_api.events import (
+    JOB_DISAPPEARED,
+    JOB_FINISHED,
+    JOB_SCHEDULED,
+    JOB_STARTED,
+    JobWatcher,
+    diff_snapshots,
+    snapshot_jobs
+)
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.wrapper import ScrapydAPI
+
+PROJECT = 'project'
+
+
+def listing(pending=(), running=(), finished=()):
+    return {
+        'pending': [{'id': job_id, 'spider': 'spider'} for job_id in pending],
+        'running': [{'id': job_id, 'spider': 'spider'} for job_id in running],
+        'finished': [{'id': job_id, 'spider': 'spider'}
+                     for job_id in finished],
+    }
+
+
+def kinds(events):
+    return sorted((event.kind, event.job_id) for event in events)
+
+
+def make_node(target, listings):
+    node = MagicMock(spec=ScrapydAPI)
+    node.target = target
+    node.list_jobs.side_effect = listings
+    return node
+
+
+def test_diff_snapshots():
+    previous = snapshot_jobs(listing(pending=['a', 'b'], running=['c'],
+                                     finished=['d']))
+    current = snapshot_jobs(listing(pending=['b'], running=['a', 'e'],
+                                    finished=['c', 'f']))
+    events = diff_snapshots('http://node', PROJECT, previous, current)
+    assert kinds(events) == [
+        (JOB_DISAPPEARED, 'd'),
+        (JOB_FINISHED, 'c'),
+        (JOB_FINISHED, 'f'),
+        (JOB_STARTED, 'a'),
+        (JOB_STARTED, 'e'),
+    ]
+    event = [e for e in events if e.job_id == 'a'][0]
+    assert event.target == 'http://node'
+    assert event.project == PROJECT
+    assert event.job == {'id': 'a', 'spider': 'spider'}
+
+
+def test_first_poll_is_a_silent_baseline():
+    node = make_node('http://node', [
+        listing(pending=['a'], finished=['old']),
+        listing(running=['a'], pending=['b'], finished=['old']),
+    ])
+    watcher = JobWatcher(node, [PROJECT])
+    assert watcher.poll() == []
+    assert kinds(watcher.poll()) == [(JOB_SCHEDULED, 'b'),
+                                     (JOB_STARTED, 'a')]
+    node.list_jobs.assert_called_with(PROJECT)
+
+
+def test_emit_initial():
+    node = make_node('http://node', [listing(pending=['a'])])
+    watcher = JobWatcher(node, [PROJECT], emit_initial=True)
+    assert kinds(watcher.poll()) == [(JOB_SCHEDULED, 'a')]
+
+
+def test_subscribers_share_one_poll():
+    node = make_node('http://node', [listing(), listing(pending=['a'])])
+    watcher = JobWatcher(node, [PROJECT])
+    first, second = [], []
+    watcher.subscribe(first.append)
+    watcher.subscribe(second.append)
+    watcher.poll()
+    watcher.poll()
+    assert kinds(first) == kinds(second) == [(JOB_SCHEDULED, 'a')]
+    assert node.list_jobs.call_count == 2
+
+
+def test_cluster_nodes_that_fail_keep_their_snapshot():
+    healthy = make_node('http://healthy', [listing(running=['a']),
+                                           listing(finished=['a'])])
+    flaky = make_node('http://flaky', [listing(running=['b']),
+                                       ScrapydResponseError('down'),
+                                       listing(finished=['b'])])
+    with ScrapydCluster([healthy, flaky]) as cluster:
+        watcher = JobWatcher(cluster, [PROJECT])
+        watcher.poll()
+        events = watcher.poll()
+        assert [(e.kind, e.target) for e in events] == [
+            (JOB_FINISHED, 'http://healthy')]
+        healthy.list_jobs.side_effect = [listing(finished=['a'])]
+        events = watcher.poll()
+        assert [(e.kind, e.target) for e in events] == [
+            (JOB_FINISHED, 'http://flaky')]
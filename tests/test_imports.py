@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import json, sys
+import scrapyd_api
+from scrapyd_api import ScrapydAPI, ScrapydCluster
+api = ScrapydAPI('http://localhost:6800', auth=('user', 'pass'))
+ScrapydCluster(['http://one:6800', 'http://two:6800'])
+loaded = sorted(name for name in sys.modules
+                if name.split('.')[0] in ('requests', 'urllib3', 'subprocess')
+                or name == 'scrapyd_api.client')
+api.client
+print(json.dumps({'loaded': loaded,
+                  'after_use': 'requests' in sys.modules}))
+"""
+
+
+def run_in_subprocess(source):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.check_output([sys.executable, '-c', source], env=env)
+    return json.loads(output.decode('utf-8'))
+
+
+def test_importing_the_package_does_not_import_the_transport():
+    # Short-lived scripts which only build the wrapper should not pay for
+    # importing requests, urllib3 and their dependencies.
+    result = run_in_subprocess(SNIPPET)
+    assert result['loaded'] == []
+    assert result['after_use'] is True
+
+
+def test_the_urllib3_transport_does_not_import_requests():
+    result = run_in_subprocess("""
+import json, sys
+from scrapyd_api import ScrapydAPI
+from scrapyd_api.urllib3_transport import Urllib3Transport
+ScrapydAPI('http://localhost:6800', transport=Urllib3Transport).client
+print(json.dumps({'loaded': 'requests' in sys.modules}))
+""")
+    assert result['loaded'] is False
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from scrapyd_api import FINISHED, PENDING, RUNNING, ScrapydAPI
+from scrapyd_api.jobs import Job, JobList, parse_time
+from scrapyd_api.testing import FakeScrapyd
+
+LISTING = {
+    'node_name': 'node',
+    'pending': [{'id': 'p1', 'spider': 'spider1'}],
+    'running': [{'id': 'r1', 'spider': 'spider2', 'pid': 93956,
+                 'start_time': '2014-06-17 22:45:31.975358'},
+                # A job listed twice takes the first state in JOB_STATES.
+                {'id': 'f2', 'spider': 'spider2'}],
+    'finished': [
+        {'id': 'f1', 'spider': 'spider1', 'project': 'project',
+         'start_time': '2014-06-17 22:45:31.975358',
+         'end_time': '2014-06-17 22:46:31.975358',
+         'log_url': '/logs/project/spider1/f1.log', 'items_url': None},
+        {'id': 'f2', 'spider': 'spider2', 'version': '1',
+         'start_time': '2014-06-17 22:45:31',
+         'end_time': '2014-06-17 22:45:41'},
+    ],
+}
+
+
+def test_parse_time():
+    assert parse_time('2014-06-17 22:45:31.975358') == datetime(
+        2014, 6, 17, 22, 45, 31, 975358)
+    assert parse_time('2014-06-17 22:45:31') == datetime(
+        2014, 6, 17, 22, 45, 31)
+    assert parse_time(None) is None
+    assert parse_time('') is None
+
+
+def test_job_from_dict():
+    job = Job.from_dict(LISTING['finished'][0], FINISHED)
+    assert job.id == 'f1'
+    assert job.project == 'project'
+    assert job.spider == 'spider1'
+    assert job.state == FINISHED
+    assert job.pid is None
+    assert job.duration == timedelta(minutes=1)
+    assert job.log_url == '/logs/project/spider1/f1.log'
+    assert job.extra is None
+    assert Job.from_dict(LISTING['finished'][1], FINISHED).extra == {
+        'version': '1'}
+    assert Job.from_dict(LISTING['pending'][0], PENDING).duration is None
+    assert not hasattr(job, '__dict__')
+    assert job == Job.from_dict(LISTING['finished'][0], FINISHED)
+    assert job != Job.from_dict(LISTING['finished'][0], RUNNING)
+
+
+def test_job_list_indexes():
+    jobs = JobList.from_response(LISTING)
+    assert jobs.node_name == 'node'
+    assert len(jobs) == 4
+    assert [job.id for job in jobs] == ['p1', 'r1', 'f1', 'f2']
+    assert jobs['r1'].state == RUNNING
+    assert jobs['r1'].pid == 93956
+    assert 'f2' in jobs
+    assert 'missing' not in jobs
+    assert jobs.get('missing') is None
+    assert jobs.state_of('p1') == PENDING
+    assert jobs.state_of('f2') == FINISHED
+    assert jobs.state_of('missing') == ''
+    assert [job.id for job in jobs.running] == ['r1']
+    assert [job.id for job in jobs.finished] == ['f1', 'f2']
+    assert [job.id for job in jobs.pending] == ['p1']
+    assert [job.id for job in jobs.by_spider('spider2')] == ['f2', 'r1']
+    assert jobs.by_spider('missing') == []
+    assert repr(jobs) == 'JobList(pending=1, running=1, finished=2)'
+
+
+def test_spider_names_are_shared():
+    jobs = JobList.from_response(LISTING)
+    assert jobs['r1'].spider is jobs['f2'].spider
+
+
+def test_list_jobs_typed():
+    with FakeScrapyd() as server:
+        server.add_project('project')
+        job_ids = server.add_history('project', 3)
+        api = ScrapydAPI(server.url)
+        running = api.schedule('project', 'spider')
+        jobs = api.list_jobs('project', typed=True)
+        assert isinstance(jobs, JobList)
+        assert jobs.state_of(running) == RUNNING
+        assert [job.id for job in jobs.finished] == job_ids
+        assert isinstance(jobs[job_ids[0]].end_time, datetime)
+        assert isinstance(api.list_jobs('project'), dict)
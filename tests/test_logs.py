@@ -0,0 +1,84 @@
+import pytest
+from mock import MagicMock, patch
+
+from scrapyd_api.constants import FINISHED, RUNNING
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.logs import LogTail
+from scrapyd_api.wrapper import ScrapydAPI
+
+HOST_URL = 'http://localhost'
+PROJECT = 'project'
+SPIDER = 'spider'
+JOB = 'd131dd02c5e6eec4693d9a0698aff95c'
+
+
+class FakeLogClient(object):
+    """
+    Serves a growing log from memory the way `Client.iter_bytes` would.
+    """
+
+    def __init__(self):
+        self.log = b''
+        self.offsets = []
+
+    def iter_bytes(self, url, offset=0, chunk_size=None, timeout=None):
+        self.offsets.append(offset)
+        if not self.log:
+            raise ScrapydResponseError('Not found', status_code=404)
+        data = self.log[offset:]
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+
+def test_job_log_streams_from_the_logs_directory():
+    mock_client = MagicMock()
+    mock_client.iter_bytes.return_value = iter([b'abc', b'def'])
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    rtn = api.job_log(PROJECT, 'my spider', JOB, offset=3, chunk_size=10)
+    assert list(rtn) == [b'abc', b'def']
+    mock_client.iter_bytes.assert_called_with(
+        'http://localhost/logs/project/my%20spider/' + JOB + '.log',
+        offset=3,
+        chunk_size=10,
+        timeout=None
+    )
+
+
+def test_read_new_only_requests_appended_bytes():
+    client = FakeLogClient()
+    api = ScrapydAPI(HOST_URL, client=client)
+    tail = api.tail_log(PROJECT, SPIDER, JOB, chunk_size=4)
+    assert isinstance(tail, LogTail)
+    assert list(tail.read_new()) == []
+    client.log = b'line one\n'
+    assert b''.join(tail.read_new()) == b'line one\n'
+    client.log += b'line two\n'
+    assert b''.join(tail.read_new()) == b'line two\n'
+    assert tail.offset == 18
+    assert client.offsets == [0, 0, 9]
+
+
+def test_read_new_raises_other_errors():
+    api = MagicMock()
+    api.job_log.side_effect = ScrapydResponseError('boom', status_code=500)
+    tail = LogTail(api, PROJECT, SPIDER, JOB)
+    with pytest.raises(ScrapydResponseError):
+        list(tail.read_new())
+
+
+def test_follow_stops_once_the_job_has_finished():
+    client = FakeLogClient()
+    client.log = b'start\n'
+    api = ScrapydAPI(HOST_URL, client=client)
+    states = iter([RUNNING, FINISHED])
+
+    def job_status(project, job):
+        state = next(states)
+        client.log += b'more\n' if state == RUNNING else b'done\n'
+        return state
+
+    api.job_status = job_status
+    with patch('scrapyd_api.logs.sleep') as mock_sleep:
+        output = b''.join(api.tail_log(PROJECT, SPIDER, JOB))
+    assert output == b'start\nmore\ndone\n'
+    assert mock_sleep.call_count == 1
@@ -0,0 +1,116 @@
+import pytest
+
+from scrapyd_api import ScrapydAPI
+from scrapyd_api import constants
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.metrics import (
+    Histogram,
+    MetricsCollector,
+    RequestHooks,
+    RequestInfo
+)
+from scrapyd_api.retry import RetryPolicy
+
+PROJECT = 'project'
+
+
+class Recorder(RequestHooks):
+
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, info):
+        self.calls.append(('before', info.endpoint, info.status_code))
+
+    def after_request(self, info):
+        self.calls.append(('after', info.endpoint, info.status_code))
+        self.last = info
+
+
+def test_hooks_see_every_request(server):
+    recorder = Recorder()
+    api = ScrapydAPI(server.url, hooks=[recorder])
+    api.schedule(PROJECT, 'spider', arg='value')
+    assert recorder.calls == [('before', constants.SCHEDULE_ENDPOINT, None),
+                              ('after', constants.SCHEDULE_ENDPOINT, 200)]
+    info = recorder.last
+    assert info.target == server.url
+    assert info.method == 'post'
+    assert info.attempt == 0
+    assert info.bytes_sent > 0
+    assert info.bytes_received > 0
+    assert info.duration > 0
+    assert info.error is None
+
+
+def test_hooks_see_failures_and_retries(server):
+    recorder = Recorder()
+    api = ScrapydAPI(server.url, hooks=[recorder],
+                     retry=RetryPolicy(backoff_factor=0))
+    server.inject_error(constants.LIST_PROJECTS_ENDPOINT, status_code=503)
+    assert api.list_projects() == [PROJECT]
+    assert [call[2] for call in recorder.calls] == [None, 503, None, 200]
+    assert recorder.last.attempt == 1
+
+    server.inject_error(constants.SCHEDULE_ENDPOINT, status_code=200,
+                        message='busy')
+    with pytest.raises(ScrapydResponseError):
+        api.schedule(PROJECT, 'spider')
+    assert isinstance(recorder.last.error, ScrapydResponseError)
+    assert recorder.last.status_code == 200
+
+
+def test_collector_renders_prometheus_text(server):
+    collector = MetricsCollector(buckets=(0.5, 60))
+    api = ScrapydAPI(server.url, hooks=[collector])
+    api.list_jobs(PROJECT)
+    api.list_jobs(PROJECT)
+    server.inject_error(constants.LIST_JOBS_ENDPOINT, status_code=500)
+    with pytest.raises(ScrapydResponseError):
+        api.list_jobs(PROJECT)
+
+    key = (constants.LIST_JOBS_ENDPOINT, server.url)
+    assert collector.requests[key + ('200',)] == 2
+    assert collector.requests[key + ('500',)] == 1
+    assert collector.errors[key + ('ScrapydResponseError',)] == 1
+    assert collector.durations[key].count == 3
+
+    text = collector.to_prometheus()
+    labels = 'endpoint="list_jobs",target="{0}"'.format(server.url)
+    assert '# TYPE scrapyd_api_requests_total counter' in text
+    assert 'scrapyd_api_requests_total{%s,status="200"} 2' % labels in text
+    assert ('scrapyd_api_request_errors_total{%s,'
+            'error="ScrapydResponseError"} 1' % labels) in text
+    assert ('scrapyd_api_request_duration_seconds_bucket{%s,le="+Inf"} 3'
+            % labels) in text
+    assert 'scrapyd_api_request_duration_seconds_count{%s} 3' % labels in text
+
+    collector.reset()
+    assert not collector.requests
+
+
+def test_collector_counts_requests_without_a_response():
+    collector = MetricsCollector()
+    info = RequestInfo(constants.DAEMON_STATUS_ENDPOINT, 'http:/"x"', 'get')
+    info.duration = 0.1
+    info.error = ValueError()
+    collector.after_request(info)
+    text = collector.to_prometheus()
+    assert ('scrapyd_api_requests_total{endpoint="daemonstatus",'
+            'target="http:/\\"x\\"",status=""} 1') in text
+    assert not collector.bytes_sent
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(1, 2, 3))
+    for value in (0.5, 1.5, 2.5, 5):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 3]
+    assert histogram.count == 4
+    assert histogram.sum == 9.5
+
+
+def test_no_hooks_by_default(server):
+    api = ScrapydAPI(server.url)
+    assert api.hooks == []
+    assert api.list_projects() == [PROJECT]
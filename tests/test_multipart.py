@@ -0,0 +1,86 @@
+from email.parser import BytesParser
+
+from requests import Request
+
+from scrapyd_api.multipart import MultipartEncoder, UploadProgress
+
+EGG = b''.join(bytes(bytearray([i % 256])) * 1000 for i in range(300))
+
+
+def parse(encoder, body):
+    message = BytesParser().parsebytes(
+        b'Content-Type: ' + encoder.content_type.encode('ascii') +
+        b'\r\n\r\n' + body)
+    return dict((part.get_param('name', header='content-disposition'),
+                 part.get_payload(decode=True))
+                for part in message.get_payload())
+
+
+def make_egg(tmpdir):
+    path = tmpdir.join('project.egg')
+    path.write_binary(EGG)
+    return str(path)
+
+
+def test_body_is_valid_multipart(tmpdir):
+    with open(make_egg(tmpdir), 'rb') as egg:
+        encoder = MultipartEncoder({'project': 'p', 'version': '1',
+                                    'setting': ['A=1', 'B=2']}, 'egg', egg,
+                                   chunk_size=4096)
+        body = encoder.read()
+    assert len(body) == len(encoder)
+    parts = parse(encoder, body)
+    assert parts['project'] == b'p'
+    assert parts['version'] == b'1'
+    assert parts['egg'] == EGG
+
+
+def test_small_reads_match_a_full_read(tmpdir):
+    path = make_egg(tmpdir)
+    with open(path, 'rb') as egg:
+        encoder = MultipartEncoder({'project': 'p'}, 'egg', egg,
+                                   chunk_size=7000)
+        chunks = []
+        while True:
+            chunk = encoder.read(8192)
+            if not chunk:
+                break
+            assert len(chunk) <= 8192
+            chunks.append(chunk)
+    body = b''.join(chunks)
+    assert len(body) == len(encoder)
+    assert parse(encoder, body)['egg'] == EGG
+
+
+def test_memory_mapped_reads(tmpdir):
+    with open(make_egg(tmpdir), 'rb') as egg:
+        encoder = MultipartEncoder({'project': 'p'}, 'egg', egg,
+                                   chunk_size=65536, use_mmap=True)
+        body = encoder.read()
+        encoder.close()
+    assert parse(encoder, body)['egg'] == EGG
+
+
+def test_progress_is_reported_per_chunk(tmpdir):
+    seen = []
+    with open(make_egg(tmpdir), 'rb') as egg:
+        encoder = MultipartEncoder({'project': 'p'}, 'egg', egg,
+                                   chunk_size=100000, progress=seen.append)
+        encoder.read()
+    assert [p.sent for p in seen] == [100000, 200000, 300000]
+    assert all(isinstance(p, UploadProgress) for p in seen)
+    assert all(p.total == len(EGG) for p in seen)
+    assert UploadProgress(10, 10, 2.0).rate == 5.0
+    assert UploadProgress(0, 10, 0).rate == 0.0
+
+
+def test_requests_sends_a_content_length(tmpdir):
+    with open(make_egg(tmpdir), 'rb') as egg:
+        encoder = MultipartEncoder({'project': 'p'}, 'egg', egg)
+        prepared = Request('POST', 'http://localhost/addversion.json',
+                           data=encoder,
+                           headers={'Content-Type': encoder.content_type}
+                           ).prepare()
+    assert prepared.headers['Content-Length'] == str(len(encoder))
+    assert 'Transfer-Encoding' not in prepared.headers
+    assert prepared.body is encoder
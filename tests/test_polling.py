@@ -0,0 +1,70 @@
+import pytest
+
+from scrapyd_api.constants import FINISHED, PENDING, RUNNING
+from scrapyd_api.exceptions import ScrapydTimeoutError
+from scrapyd_api.polling import AdaptiveInterval, JobTransition, JobWaiter
+
+
+def listing(pending=(), running=(), finished=()):
+    return {
+        'pending': [{'id': job_id} for job_id in pending],
+        'running': [{'id': job_id} for job_id in running],
+        'finished': [{'id': job_id} for job_id in finished],
+    }
+
+
+def test_adaptive_interval():
+    interval = AdaptiveInterval(1, 5)
+    assert interval.current == 1
+    assert [interval.backoff() for _ in range(4)] == [2, 4, 5, 5]
+    assert interval.reset() == 1
+
+
+def test_waiter_reports_transitions_once():
+    waiter = JobWaiter(['a', 'b'])
+    assert sorted(waiter.update(listing(pending=['a', 'b']))) == [
+        JobTransition('a', None, PENDING),
+        JobTransition('b', None, PENDING),
+    ]
+    assert waiter.update(listing(pending=['a', 'b'])) == []
+    assert waiter.update(listing(running=['a'], pending=['b'])) == [
+        JobTransition('a', PENDING, RUNNING)]
+    assert not waiter.done
+    assert sorted(waiter.update(listing(finished=['a', 'b']))) == [
+        JobTransition('a', RUNNING, FINISHED),
+        JobTransition('b', PENDING, FINISHED),
+    ]
+    assert waiter.done
+
+
+def test_waiter_backs_off_only_while_jobs_run():
+    waiter = JobWaiter(['a', 'b'], min_interval=1, max_interval=8)
+    waiter.update(listing(pending=['a'], running=['b']))
+    assert waiter.next_wait() == 1
+    waiter.update(listing(pending=['a'], running=['b']))
+    assert waiter.next_wait() == 1
+    waiter.update(listing(running=['a', 'b']))
+    assert waiter.next_wait() == 1
+    waiter.update(listing(running=['a', 'b']))
+    waiter.update(listing(running=['a', 'b']))
+    assert waiter.next_wait() == 4
+    waiter.update(listing(running=['a'], finished=['b']))
+    assert waiter.next_wait() == 1
+
+
+def test_unknown_jobs_count_as_done():
+    waiter = JobWaiter(['gone'])
+    assert waiter.update(listing()) == [JobTransition('gone', None, '')]
+    assert waiter.done
+
+
+def test_waiter_timeout(timer):
+    waiter = JobWaiter(['a', 'b'], timeout=10, min_interval=4, timer=timer)
+    waiter.update(listing(running=['a'], finished=['b']))
+    assert waiter.next_wait() == 4
+    timer.now = 8
+    assert waiter.next_wait() == 2
+    timer.now = 10
+    with pytest.raises(ScrapydTimeoutError) as excinfo:
+        waiter.next_wait()
+    assert 'a' in str(excinfo.value)
@@ -0,0 +1,78 @@
+import pytest
+from requests.exceptions import ConnectionError, Timeout
+
+from scrapyd_api.constants import (
+    LIST_JOBS_ENDPOINT,
+    SCHEDULE_ENDPOINT
+)
+from scrapyd_api.exceptions import (
+    ScrapydCircuitOpenError,
+    ScrapydResponseError
+)
+from scrapyd_api.retry import CircuitBreaker, RetryPolicy, is_node_failure
+
+
+def test_is_node_failure():
+    assert is_node_failure(ConnectionError())
+    assert is_node_failure(Timeout())
+    assert is_node_failure(ScrapydResponseError('x', status_code=503))
+    assert not is_node_failure(ScrapydResponseError('x', status_code=404))
+    assert not is_node_failure(ScrapydResponseError('spider not found'))
+    assert not is_node_failure(ValueError())
+
+
+def test_retry_policy_only_retries_idempotent_endpoints_by_default():
+    policy = RetryPolicy(max_retries=2)
+    exc = ScrapydResponseError('x', status_code=502)
+    assert policy.should_retry(LIST_JOBS_ENDPOINT, exc, 0)
+    assert policy.should_retry(LIST_JOBS_ENDPOINT, exc, 1)
+    assert not policy.should_retry(LIST_JOBS_ENDPOINT, exc, 2)
+    assert not policy.should_retry(SCHEDULE_ENDPOINT, exc, 0)
+    assert not policy.should_retry(
+        LIST_JOBS_ENDPOINT, ScrapydResponseError('bad project'), 0)
+    opted_in = RetryPolicy(endpoints=[SCHEDULE_ENDPOINT])
+    assert opted_in.should_retry(SCHEDULE_ENDPOINT, exc, 0)
+
+
+def test_retry_policy_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+    for attempt, ceiling in ((0, 1), (1, 2), (2, 4), (3, 5), (10, 5)):
+        waits = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= wait <= ceiling for wait in waits)
+        assert len(set(waits)) > 1
+
+
+def test_circuit_opens_after_consecutive_failures(timer):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10,
+                             timer=timer)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(ScrapydCircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit(timer):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10,
+                             timer=timer)
+    breaker.record_failure()
+    timer.now = 10
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(ScrapydCircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    timer.now = 15
+    with pytest.raises(ScrapydCircuitOpenError):
+        breaker.before_call()
+    timer.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.before_call()
@@ -0,0 +1,120 @@
+import pytest
+from mock import MagicMock
+
+from scrapyd_api.cluster import ScrapydCluster
+from scrapyd_api.exceptions import ScrapydError, ScrapydResponseError
+from scrapyd_api.routing import LoadAwareScheduler
+from scrapyd_api.wrapper import ScrapydAPI
+
+PROJECT = 'project'
+SPIDER = 'spider'
+
+
+def make_node(target, running, pending):
+    node = MagicMock(spec=ScrapydAPI)
+    node.target = target
+    node.daemon_status.return_value = {
+        'running': running, 'pending': pending, 'finished': 0,
+        'node_name': target
+    }
+    node.schedule.return_value = 'job-' + target
+    return node
+
+
+def test_schedule_routes_to_the_node_with_most_free_slots():
+    busy = make_node('http://busy', running=3, pending=1)
+    idle = make_node('http://idle', running=1, pending=0)
+    scheduler = LoadAwareScheduler(ScrapydCluster([busy, idle]), slots=4)
+    target, job_id = scheduler.schedule(PROJECT, SPIDER, settings={'A': 1},
+                                        extra='value')
+    assert target == 'http://idle'
+    assert job_id == 'job-http://idle'
+    idle.schedule.assert_called_once_with(PROJECT, SPIDER,
+                                          settings={'A': 1}, extra='value')
+    busy.schedule.assert_not_called()
+
+
+def test_routing_uses_the_cached_view_between_refreshes():
+    first = make_node('http://first', running=0, pending=0)
+    second = make_node('http://second', running=1, pending=0)
+    scheduler = LoadAwareScheduler(ScrapydCluster([first, second]), slots=4)
+    targets = [scheduler.schedule(PROJECT, SPIDER)[0] for _ in range(4)]
+    # Each call bumps the local view, so load alternates across the nodes.
+    assert targets == ['http://first', 'http://first', 'http://second',
+                       'http://first']
+    assert first.daemon_status.call_count == 1
+    assert scheduler.free_slots() == {'http://first': 1, 'http://second': 2}
+
+
+def test_schedule_refreshes_a_stale_view_without_a_background_thread():
+    first = make_node('http://first', running=0, pending=0)
+    second = make_node('http://second', running=1, pending=0)
+    scheduler = LoadAwareScheduler(ScrapydCluster([first, second]), slots=4,
+                                   refresh_interval=0)
+    targets = [scheduler.schedule(PROJECT, SPIDER)[0] for _ in range(3)]
+    # Every call sees the nodes' reported load rather than its own counts.
+    assert targets == ['http://first'] * 3
+    assert first.daemon_status.call_count == 3
+
+
+def test_per_node_slot_limits():
+    small = make_node('http://small', running=0, pending=0)
+    large = make_node('http://large', running=2, pending=0)
+    scheduler = LoadAwareScheduler(
+        ScrapydCluster([small, large]),
+        slots={'http://small': 1, 'http://large': 8})
+    assert scheduler.schedule(PROJECT, SPIDER)[0] == 'http://large'
+
+
+def test_every_node_needs_a_slot_limit():
+    nodes = [make_node('http://one', running=0, pending=0),
+             make_node('http://two', running=0, pending=0)]
+    with pytest.raises(ValueError) as excinfo:
+        LoadAwareScheduler(ScrapydCluster(nodes), slots={'http://one': 1})
+    assert 'http://two' in str(excinfo.value)
+
+
+def test_full_nodes_are_not_scheduled_on():
+    full = make_node('http://full', running=2, pending=0)
+    free = make_node('http://free', running=1, pending=0)
+    scheduler = LoadAwareScheduler(ScrapydCluster([full, free]), slots=2)
+    assert scheduler.schedule(PROJECT, SPIDER)[0] == 'http://free'
+    with pytest.raises(ScrapydError):
+        scheduler.schedule(PROJECT, SPIDER)
+    assert full.schedule.call_count == 0
+    assert free.schedule.call_count == 1
+
+
+def test_dead_nodes_are_excluded_and_failed_schedules_released():
+    dead = make_node('http://dead', running=0, pending=0)
+    dead.daemon_status.side_effect = ScrapydResponseError('down')
+    live = make_node('http://live', running=0, pending=0)
+    live.schedule.side_effect = ScrapydResponseError('boom')
+    scheduler = LoadAwareScheduler(ScrapydCluster([dead, live]), slots=2)
+    with pytest.raises(ScrapydResponseError):
+        scheduler.schedule(PROJECT, SPIDER)
+    assert scheduler.free_slots() == {'http://live': 2}
+
+
+def test_no_available_nodes_raises():
+    dead = make_node('http://dead', running=0, pending=0)
+    dead.daemon_status.side_effect = ScrapydResponseError('down')
+    scheduler = LoadAwareScheduler(ScrapydCluster([dead]), slots=2)
+    with pytest.raises(ScrapydError):
+        scheduler.schedule(PROJECT, SPIDER)
+
+
+def test_background_refresh():
+    node = make_node('http://node', running=0, pending=0)
+    with LoadAwareScheduler(ScrapydCluster([node]), slots=2,
+                            refresh_interval=0.01) as scheduler:
+        node.daemon_status.return_value = {'running': 2, 'pending': 3}
+        for _ in range(200):
+            if scheduler.free_slots() == {'http://node': -3}:
+                break
+            scheduler._stopped.wait(0.01)
+        assert scheduler.free_slots() == {'http://node': -3}
+        with pytest.raises(ScrapydError):
+            scheduler.schedule(PROJECT, SPIDER)
+    assert scheduler._thread is None
+    node.schedule.assert_not_called()
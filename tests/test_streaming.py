@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from mock import MagicMock
+
+from scrapyd_api import FINISHED, PENDING, RUNNING, ScrapydAPI
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.jobs import JobList
+from scrapyd_api.metrics import MetricsCollector
+from scrapyd_api.streaming import filter_object
+
+PROJECT = 'project'
+
+DOCUMENT = {
+    'status': 'ok',
+    'skipped': [{'a': '[{"tricky\\" string}]', 'b': [1, {'c': None}]},
+                {'d': {}}, [], 'x', -1.5e3, True],
+    'nested': {'e': [1, 2, {'f': '}'}]},
+    'text': 'a "quoted" é \\ string',
+    'number': 12,
+    'literal': None,
+}
+
+
+def split(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+def test_filter_object_across_chunk_boundaries(size):
+    body = json.dumps(DOCUMENT).encode('utf-8')
+    keys = ['status', 'nested', 'text', 'number', 'literal']
+    expected = dict((key, DOCUMENT[key]) for key in keys)
+    assert filter_object(split(body, size), keys) == expected
+    assert filter_object(split(body, size), ['skipped']) == {
+        'skipped': DOCUMENT['skipped']}
+    assert filter_object(split(body, size), []) == {}
+
+
+def test_filter_object_with_whitespace():
+    body = json.dumps(DOCUMENT, indent=4).encode('utf-8')
+    assert filter_object(split(body, 5), ['number']) == {'number': 12}
+
+
+def test_filter_object_rejects_truncated_documents():
+    body = json.dumps(DOCUMENT).encode('utf-8')
+    with pytest.raises(ValueError):
+        filter_object(split(body[:-10], 10), ['number'])
+    with pytest.raises(ValueError):
+        filter_object([b'[1, 2]'], ['number'])
+
+
+@pytest.fixture
+def server(server):
+    server.add_history(PROJECT, 2000)
+    server.add_history(PROJECT, 2, state=PENDING)
+    return server
+
+
+def test_list_jobs_by_state(server):
+    metrics = MetricsCollector()
+    api = ScrapydAPI(server.url, hooks=[metrics])
+    running = api.schedule(PROJECT, 'spider')
+    jobs = api.list_jobs(PROJECT, states=[RUNNING, PENDING])
+    assert sorted(jobs) == ['node_name', PENDING, RUNNING]
+    assert [job['id'] for job in jobs[RUNNING]] == [running]
+    assert len(jobs[PENDING]) == 2
+    assert api.list_jobs(PROJECT, states=[FINISHED])[FINISHED] == \
+        api.list_jobs(PROJECT)[FINISHED]
+
+    typed = api.list_jobs(PROJECT, states=[RUNNING], typed=True)
+    assert isinstance(typed, JobList)
+    assert [job.id for job in typed] == [running]
+
+    received = sum(metrics.bytes_received.values())
+    assert received > 2000 * 50
+
+
+def test_list_jobs_by_state_reports_errors(server):
+    api = ScrapydAPI(server.url)
+    server.inject_error('list_jobs', status_code=200, message='nope')
+    with pytest.raises(ScrapydResponseError) as exc:
+        api.list_jobs(PROJECT, states=[RUNNING])
+    assert str(exc.value) == 'nope'
+    server.inject_error('list_jobs', status_code=502)
+    with pytest.raises(ScrapydResponseError) as exc:
+        api.list_jobs(PROJECT, states=[RUNNING])
+    assert exc.value.status_code == 502
+
+
+def test_list_jobs_by_state_with_a_custom_client():
+    client = MagicMock(spec=['get', 'post'])
+    client.get.return_value = {'node_name': 'node', 'pending': [],
+                               'running': [{'id': 'a', 'spider': 's'}],
+                               'finished': [{'id': 'b', 'spider': 's'}]}
+    api = ScrapydAPI('http://localhost', client=client)
+    assert api.list_jobs(PROJECT, states=[RUNNING]) == {
+        'node_name': 'node', 'running': [{'id': 'a', 'spider': 's'}]}
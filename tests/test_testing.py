@@ -0,0 +1,157 @@
+import time
+
+import pytest
+
+from scrapyd_api import FINISHED, PENDING, RUNNING, ScrapydAPI
+from scrapyd_api import constants
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.testing import FakeScrapyd
+
+PROJECT = 'project'
+# Passed to FakeScrapyd by the server fixture in conftest.py.
+SERVER_OPTIONS = {'run_time': None}
+
+
+@pytest.fixture
+def api(server):
+    return ScrapydAPI(server.url)
+
+
+def test_project_endpoints(server, api):
+    assert api.list_projects() == [PROJECT]
+    assert api.list_versions(PROJECT) == ['1']
+    assert api.list_spiders(PROJECT) == ['spider', 'other']
+    assert api.add_version(PROJECT, '2', b'egg bytes') == 2
+    assert api.add_version(PROJECT, '3', b'egg bytes', stream=False) == 2
+    assert api.list_versions(PROJECT) == ['1', '2', '3']
+    assert api.delete_version(PROJECT, '1') is True
+    assert api.list_versions(PROJECT) == ['2', '3']
+    assert api.delete_project(PROJECT) is True
+    assert api.list_projects() == []
+
+
+def test_streamed_egg_uploads_are_parsed(server, api, tmpdir):
+    egg = tmpdir.join('project.egg')
+    egg.write_binary(b'\x00' * 100000)
+    assert api.add_version('new', '1', str(egg), stream=True) == 1
+    assert api.list_versions('new') == ['1']
+
+
+def test_jobs_move_through_states(server, api):
+    job_id = api.schedule(PROJECT, 'spider', settings={'A': 'b'}, arg='x')
+    assert api.job_status(PROJECT, job_id) == RUNNING
+    assert api.daemon_status()['running'] == 1
+    server.finish_job(job_id)
+    jobs = api.list_jobs(PROJECT)
+    assert [job['id'] for job in jobs[FINISHED]] == [job_id]
+    assert set(jobs[FINISHED][0]) == {'id', 'spider', 'pid', 'start_time',
+                                      'end_time'}
+    assert server._jobs[job_id]['args'] == {'arg': 'x'}
+    assert server._jobs[job_id]['settings'] == ['A=b']
+
+
+def test_time_driven_state_machine():
+    with FakeScrapyd(pending_time=0.05, run_time=0.05) as server:
+        server.add_project(PROJECT)
+        api = ScrapydAPI(server.url)
+        job_id = api.schedule(PROJECT, 'spider')
+        assert api.job_status(PROJECT, job_id) == PENDING
+        time.sleep(0.06)
+        assert api.job_status(PROJECT, job_id) == RUNNING
+        time.sleep(0.06)
+        assert api.job_status(PROJECT, job_id) == FINISHED
+
+
+def test_cancel(server, api):
+    with FakeScrapyd(pending_time=60) as pending_server:
+        pending_server.add_project(PROJECT)
+        pending_api = ScrapydAPI(pending_server.url)
+        job_id = pending_api.schedule(PROJECT, 'spider')
+        assert pending_api.cancel(PROJECT, job_id) == PENDING
+        assert pending_api.job_status(PROJECT, job_id) == ''
+    job_id = api.schedule(PROJECT, 'spider')
+    assert api.cancel(PROJECT, job_id, signal='TERM') == RUNNING
+    assert api.job_status(PROJECT, job_id) == FINISHED
+    assert api.cancel(PROJECT, job_id) is None
+
+
+def test_scrapyd_errors(api):
+    with pytest.raises(ScrapydResponseError) as exc:
+        api.schedule(PROJECT, 'missing')
+    assert "spider 'missing' not found" in str(exc.value)
+    with pytest.raises(ScrapydResponseError):
+        api.list_spiders('missing')
+
+
+def test_injected_errors(server, api):
+    server.inject_error(constants.LIST_PROJECTS_ENDPOINT, status_code=503,
+                        count=2)
+    for _ in range(2):
+        with pytest.raises(ScrapydResponseError) as exc:
+            api.list_projects()
+        assert exc.value.status_code == 503
+    assert api.list_projects() == [PROJECT]
+    server.inject_error(constants.SCHEDULE_ENDPOINT, status_code=200,
+                        message='busy', count=None)
+    for _ in range(3):
+        with pytest.raises(ScrapydResponseError) as exc:
+            api.schedule(PROJECT, 'spider')
+        assert str(exc.value) == 'busy'
+    server.clear_errors()
+    assert api.schedule(PROJECT, 'spider')
+
+
+def test_error_rate():
+    with FakeScrapyd(error_rate=0.5, seed=1) as server:
+        api = ScrapydAPI(server.url)
+        failures = 0
+        for _ in range(40):
+            try:
+                api.daemon_status()
+            except ScrapydResponseError:
+                failures += 1
+        assert 5 < failures < 35
+        assert server.request_counts[constants.DAEMON_STATUS_ENDPOINT] == 40
+
+
+def test_latency():
+    latency = {constants.LIST_PROJECTS_ENDPOINT: 0.1}
+    with FakeScrapyd(latency=latency) as server:
+        api = ScrapydAPI(server.url)
+        started = time.time()
+        api.daemon_status()
+        assert time.time() - started < 0.1
+        api.list_projects()
+        assert time.time() - started >= 0.1
+
+
+def test_synthetic_history(server, api):
+    job_ids = server.add_history(PROJECT, 1000)
+    server.add_history(PROJECT, 5, state=PENDING)
+    jobs = api.list_jobs(PROJECT)
+    assert len(jobs[FINISHED]) == 1000
+    assert len(jobs[PENDING]) == 5
+    assert api.job_status(PROJECT, job_ids[-1]) == FINISHED
+
+
+def test_logs_support_range_requests(server, api):
+    job_id = api.schedule(PROJECT, 'spider')
+    server.write_log(job_id, 'first line\n')
+    assert b''.join(api.job_log(PROJECT, 'spider', job_id)) == b'first line\n'
+    tail = api.tail_log(PROJECT, 'spider', job_id)
+    assert b''.join(tail.read_new()) == b'first line\n'
+    server.write_log(job_id, 'second line\n')
+    assert b''.join(tail.read_new()) == b'second line\n'
+    assert b''.join(tail.read_new()) == b''
+    with pytest.raises(ScrapydResponseError) as exc:
+        list(api.job_log(PROJECT, 'spider', 'unknown'))
+    assert exc.value.status_code == 404
+
+
+def test_auth():
+    with FakeScrapyd(auth=('user', 'pass')) as server:
+        assert ScrapydAPI(server.url,
+                          auth=('user', 'pass')).list_projects() == []
+        with pytest.raises(ScrapydResponseError) as exc:
+            ScrapydAPI(server.url).list_projects()
+        assert exc.value.status_code == 401
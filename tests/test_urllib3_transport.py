@@ -0,0 +1,127 @@
+import pytest
+
+# HTTPResponse.drain_conn, which the transport relies on, is new in 1.25.9.
+pytest.importorskip('urllib3', minversion='1.25.9')
+
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from scrapyd_api import FINISHED, PENDING, RUNNING, ScrapydAPI, ScrapydCluster
+from scrapyd_api import constants
+from scrapyd_api.exceptions import ScrapydResponseError
+from scrapyd_api.metrics import MetricsCollector
+from scrapyd_api.retry import is_node_failure
+from scrapyd_api.testing import FakeScrapyd
+from scrapyd_api.transport import Transport
+from scrapyd_api.urllib3_transport import Urllib3Transport
+
+PROJECT = 'project'
+# Passed to FakeScrapyd by the server fixture in conftest.py.
+SERVER_OPTIONS = {'pending_time': 60}
+
+
+@pytest.fixture
+def api(server):
+    return ScrapydAPI(server.url, transport=Urllib3Transport)
+
+
+def test_transport_is_used_when_client_is_not_supplied(api):
+    assert isinstance(api.client, Urllib3Transport)
+    assert isinstance(api.client, Transport)
+    cluster = ScrapydCluster(['http://one', 'http://two'],
+                             transport=Urllib3Transport)
+    assert all(isinstance(node.client, Urllib3Transport)
+               for node in cluster.nodes.values())
+
+
+def test_get_and_post(server, api, tmpdir):
+    assert api.list_projects() == [PROJECT]
+    assert api.add_version(PROJECT, '2', b'egg bytes') == 2
+    egg = tmpdir.join('project.egg')
+    egg.write_binary(b'streamed egg')
+    assert api.add_version(PROJECT, '3', str(egg), stream=True) == 2
+    assert api.list_versions(PROJECT) == ['1', '2', '3']
+    job_id = api.schedule(PROJECT, 'spider', settings={'A': 1, 'B': 2},
+                          extra='value')
+    assert server.job_state(job_id) == PENDING
+    assert api.cancel(PROJECT, job_id, signal='TERM') == PENDING
+    assert api.daemon_status()['pending'] == 0
+
+
+def test_list_jobs_by_state(server, api):
+    server.add_history(PROJECT, 20)
+    job_id = api.schedule(PROJECT, 'spider')
+    jobs = api.list_jobs(PROJECT, states=[PENDING, RUNNING])
+    assert [job['id'] for job in jobs[PENDING]] == [job_id]
+    assert jobs[RUNNING] == []
+    assert FINISHED not in jobs
+    assert len(api.list_jobs(PROJECT)[FINISHED]) == 20
+
+
+def test_errors(server, api):
+    with pytest.raises(ScrapydResponseError) as exc:
+        api.schedule(PROJECT, 'missing')
+    assert "spider 'missing' not found" in str(exc.value)
+    server.inject_error(constants.LIST_PROJECTS_ENDPOINT, status_code=503)
+    with pytest.raises(ScrapydResponseError) as exc:
+        api.list_projects()
+    assert exc.value.status_code == 503
+    assert is_node_failure(exc.value)
+
+
+def test_connection_errors_are_raised_as_requests_exceptions():
+    api = ScrapydAPI('http://127.0.0.1:1', transport=Urllib3Transport)
+    with pytest.raises(ConnectionError) as exc:
+        api.daemon_status()
+    assert is_node_failure(exc.value)
+    with FakeScrapyd(latency=0.5) as server:
+        api = ScrapydAPI(server.url, transport=Urllib3Transport,
+                         timeout=(1, 0.05))
+        with pytest.raises(ReadTimeout):
+            api.daemon_status()
+
+
+def test_logs_support_range_requests(server, api):
+    job_id = api.schedule(PROJECT, 'spider')
+    server.write_log(job_id, 'first line\nsecond line\n')
+    assert (b''.join(api.job_log(PROJECT, 'spider', job_id)) ==
+            b'first line\nsecond line\n')
+    assert (b''.join(api.job_log(PROJECT, 'spider', job_id, offset=11)) ==
+            b'second line\n')
+    assert b''.join(api.job_log(PROJECT, 'spider', job_id, offset=23)) == b''
+    with pytest.raises(ScrapydResponseError) as exc:
+        list(api.job_log(PROJECT, 'spider', 'unknown'))
+    assert exc.value.status_code == 404
+
+
+def test_auth():
+    with FakeScrapyd(auth=('user', 'pass')) as server:
+        api = ScrapydAPI(server.url, auth=('user', 'pass'),
+                         transport=Urllib3Transport)
+        assert api.list_projects() == []
+        api.client.auth = None
+        with pytest.raises(ScrapydResponseError) as exc:
+            api.list_projects()
+        assert exc.value.status_code == 401
+
+
+def test_hooks_record_responses(server):
+    metrics = MetricsCollector()
+    api = ScrapydAPI(server.url, transport=Urllib3Transport, hooks=[metrics])
+    api.schedule(PROJECT, 'spider')
+    api.list_jobs(PROJECT, states=[PENDING])
+    key = (constants.SCHEDULE_ENDPOINT, server.url)
+    assert metrics.requests[key + ('200',)] == 1
+    assert metrics.bytes_sent[key] > 0
+    assert metrics.bytes_received[key] > 0
+    assert metrics.bytes_received[(constants.LIST_JOBS_ENDPOINT,
+                                   server.url)] > 0
+
+
+def test_default_get_members_filters_a_full_decode():
+
+    class DictTransport(Transport):
+
+        def get(self, url, params=None, timeout=None, hooks=None):
+            return {'pending': [], 'finished': [{'id': 'abc'}]}
+
+    assert DictTransport().get_members('url', ['pending']) == {'pending': []}
@@ -1,15 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from mock import MagicMock
+from mock import MagicMock, patch
 from requests import Timeout
 
+from scrapyd_api.cache import TTLCache
+from scrapyd_api.coalesce import SingleFlight
 from scrapyd_api.compat import StringIO
 from scrapyd_api.constants import (
     ADD_VERSION_ENDPOINT,
     CANCEL_ENDPOINT,
+    LIST_JOBS_ENDPOINT,
     FINISHED,
-    PENDING
+    PENDING,
+    RUNNING
+)
+from scrapyd_api.exceptions import (
+    ScrapydCircuitOpenError,
+    ScrapydResponseError
 )
-from scrapyd_api.wrapper import ScrapydAPI
+from scrapyd_api.multipart import MultipartEncoder
+from scrapyd_api.polling import JobTransition
+from scrapyd_api.retry import CircuitBreaker, RetryPolicy
+from scrapyd_api.testing import FakeScrapyd
+from scrapyd_api.wrapper import ScrapydAPI, index_job_states
 
 HOST_URL = 'http://localhost'
 AUTH = ('username', 'password')
@@ -38,6 +52,24 @@ def test_auth_doesnt_get_applied_when_client_is_supplied():
     assert api.client.auth != AUTH
 
 
+def test_pool_options_get_applied_when_client_is_not_supplied():
+    api = ScrapydAPI(HOST_URL, pool_maxsize=64, pool_block=True,
+                     keep_alive=False)
+    adapter = api.client.get_adapter(HOST_URL)
+    assert adapter._pool_maxsize == 64
+    assert adapter._pool_block is True
+    assert api.client.headers['Connection'] == 'close'
+
+
+def test_json_loads_gets_applied_when_client_is_not_supplied():
+    def json_loads(body):
+        return {}
+
+    assert ScrapydAPI(HOST_URL, json_loads=json_loads).client.json_loads \
+        is json_loads
+    assert ScrapydAPI(HOST_URL).client.json_loads is not json_loads
+
+
 def test_build_url_with_default_endpoints():
     """
     Absolute URL constructor should form correct URL when
@@ -105,6 +137,39 @@ def test_add_version():
     )
 
 
+def test_add_version_streaming_from_a_path(tmpdir):
+    egg_path = tmpdir.join('project.egg')
+    egg_path.write_binary(b'Test egg')
+    mock_client = MagicMock()
+    mock_client.post.return_value = {'spiders': 3}
+    seen = []
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    rtn = api.add_version(PROJECT, VERSION, str(egg_path),
+                          progress=seen.append)
+    assert rtn == 3
+    args, kwargs = mock_client.post.call_args
+    assert args == ('http://localhost/addversion.json',)
+    body = kwargs['data']
+    assert isinstance(body, MultipartEncoder)
+    assert kwargs['headers'] == {'Content-Type': body.content_type}
+    assert 'files' not in kwargs
+    assert body.file_size == len(b'Test egg')
+    assert body.fileobj.closed
+
+
+def test_add_version_streaming_from_a_file(tmpdir):
+    egg_path = tmpdir.join('project.egg')
+    egg_path.write_binary(b'Test egg')
+    mock_client = MagicMock()
+    mock_client.post.return_value = {'spiders': 3}
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    with open(str(egg_path), 'rb') as egg:
+        api.add_version(PROJECT, VERSION, egg, stream=True)
+        assert not egg.closed
+    body = mock_client.post.call_args[1]['data']
+    assert body.fileobj is egg
+
+
 def test_cancelling_running_job():
     mock_client = MagicMock()
     mock_client.post.return_value = {
@@ -210,6 +275,83 @@ def test_job_status():
         assert rtn == expected_result
 
 
+def test_job_statuses():
+    mock_client = MagicMock()
+    mock_client.get.return_value = {
+        'pending': [{'id': 'abc'}, {'id': 'def'}],
+        'running': [{'id': 'jkl'}],
+        'finished': [{'id': 'ghi'}],
+    }
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    rtn = api.job_statuses(PROJECT, ['abc', 'ghi', 'jkl', 'xyz'])
+    assert rtn == {
+        'abc': PENDING,
+        'ghi': FINISHED,
+        'jkl': RUNNING,
+        'xyz': ''
+    }
+    assert mock_client.get.call_count == 1
+
+
+def test_index_job_states_prefers_earlier_states():
+    index = index_job_states({
+        'pending': [{'id': 'abc'}],
+        'running': [{'id': 'abc'}],
+        'finished': [{'id': 'abc'}],
+    })
+    assert index == {'abc': FINISHED}
+
+
+def test_wait_for_jobs_polls_once_per_interval():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = [
+        {'pending': [{'id': 'a'}, {'id': 'b'}], 'running': [],
+         'finished': []},
+        {'pending': [], 'running': [{'id': 'a'}, {'id': 'b'}],
+         'finished': []},
+        {'pending': [], 'running': [{'id': 'b'}], 'finished': [{'id': 'a'}]},
+        {'pending': [], 'running': [], 'finished': [{'id': 'a'}, {'id': 'b'}]},
+    ]
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    with patch('scrapyd_api.wrapper.sleep') as mock_sleep:
+        transitions = list(api.iter_job_transitions(PROJECT, ['a', 'b']))
+    assert mock_client.get.call_count == 4
+    assert mock_sleep.call_count == 3
+    assert [t for t in transitions if t.job_id == 'a'] == [
+        JobTransition('a', None, PENDING),
+        JobTransition('a', PENDING, RUNNING),
+        JobTransition('a', RUNNING, FINISHED),
+    ]
+    assert transitions[-1] == JobTransition('b', RUNNING, FINISHED)
+
+
+def test_wait_for_jobs_returns_final_states():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = [
+        {'pending': [], 'running': [{'id': 'a'}], 'finished': []},
+        {'pending': [], 'running': [], 'finished': [{'id': 'a'}]},
+    ]
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    with patch('scrapyd_api.wrapper.sleep'):
+        rtn = api.wait_for_jobs(PROJECT, ['a', 'gone'], timeout=60)
+    assert rtn == {'a': FINISHED, 'gone': ''}
+
+
+def test_wait_for_jobs_accepts_a_generator_of_job_ids():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = [
+        {'pending': [], 'running': [{'id': 'a'}, {'id': 'b'}],
+         'finished': []},
+        {'pending': [], 'running': [],
+         'finished': [{'id': 'a'}, {'id': 'b'}]},
+    ]
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    with patch('scrapyd_api.wrapper.sleep'):
+        rtn = api.wait_for_jobs(PROJECT, (job_id for job_id in 'ab'))
+    assert rtn == {'a': FINISHED, 'b': FINISHED}
+    assert mock_client.get.call_count == 2
+
+
 def test_list_jobs():
     mock_client = MagicMock()
     mock_client.get.return_value = {
@@ -282,6 +424,64 @@ def test_list_versions():
     )
 
 
+def test_metadata_cache_is_opt_in():
+    mock_client = MagicMock()
+    mock_client.get.return_value = {'projects': ['test']}
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    assert api.cache is None
+    api.list_projects()
+    api.list_projects()
+    assert mock_client.get.call_count == 2
+
+
+def test_metadata_cache_serves_repeat_reads():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = [
+        {'projects': ['test']},
+        {'versions': ['1']},
+        {'spiders': ['spider']},
+        {'versions': ['2']},
+    ]
+    api = ScrapydAPI(HOST_URL, client=mock_client, cache=True)
+    assert isinstance(api.cache, TTLCache)
+    for _ in range(2):
+        assert api.list_projects() == ['test']
+        assert api.list_versions(PROJECT) == ['1']
+        assert api.list_spiders(PROJECT) == ['spider']
+    assert mock_client.get.call_count == 3
+    assert api.list_versions('other') == ['2']
+    assert mock_client.get.call_count == 4
+
+
+def test_metadata_cache_invalidated_by_writes():
+    mock_client = MagicMock()
+    mock_client.post.return_value = {'spiders': 1}
+    api = ScrapydAPI(HOST_URL, client=mock_client, cache=TTLCache())
+    writes = (
+        lambda: api.add_version(PROJECT, VERSION, StringIO('egg')),
+        lambda: api.delete_version(PROJECT, VERSION),
+        lambda: api.delete_project(PROJECT),
+    )
+    for write in writes:
+        mock_client.get.reset_mock()
+        mock_client.get.side_effect = [
+            {'projects': ['test']}, {'versions': ['1']}, {'spiders': ['a']},
+            {'versions': ['1']}, {'projects': ['test']}, {'versions': ['1']},
+            {'spiders': ['a']},
+        ]
+        api.cache.clear()
+        api.list_projects()
+        api.list_versions(PROJECT)
+        api.list_spiders(PROJECT)
+        api.list_versions('other')
+        write()
+        api.list_projects()
+        api.list_versions(PROJECT)
+        api.list_spiders(PROJECT)
+        api.list_versions('other')
+        assert mock_client.get.call_count == 7
+
+
 def test_schedule():
     mock_client = MagicMock()
     job_id = 'ce54b67080280d1ec69821bcb6a88393'
@@ -313,6 +513,55 @@ def test_schedule():
     assert data_kw['spider'] == SPIDER
 
 
+def test_retry_policy_retries_node_failures():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = [
+        ScrapydResponseError('Bad gateway', status_code=502),
+        Timeout(),
+        {'projects': ['test']},
+    ]
+    api = ScrapydAPI(HOST_URL, client=mock_client,
+                     retry=RetryPolicy(max_retries=2))
+    with patch('scrapyd_api.wrapper.sleep') as mock_sleep:
+        assert api.list_projects() == ['test']
+    assert mock_client.get.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+def test_retry_policy_leaves_writes_alone_by_default():
+    mock_client = MagicMock()
+    mock_client.post.side_effect = ScrapydResponseError('Bad gateway',
+                                                        status_code=502)
+    api = ScrapydAPI(HOST_URL, client=mock_client, retry=RetryPolicy())
+    with patch('scrapyd_api.wrapper.sleep'):
+        with pytest.raises(ScrapydResponseError):
+            api.schedule(PROJECT, SPIDER)
+    assert mock_client.post.call_count == 1
+
+
+def test_circuit_breaker_fails_fast_while_open():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = Timeout()
+    breaker = CircuitBreaker(failure_threshold=2)
+    api = ScrapydAPI(HOST_URL, client=mock_client, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(Timeout):
+            api.daemon_status()
+    with pytest.raises(ScrapydCircuitOpenError):
+        api.daemon_status()
+    assert mock_client.get.call_count == 2
+
+
+def test_circuit_breaker_ignores_scrapyd_errors():
+    mock_client = MagicMock()
+    mock_client.get.side_effect = ScrapydResponseError('no such project')
+    api = ScrapydAPI(HOST_URL, client=mock_client, circuit_breaker=True)
+    for _ in range(10):
+        with pytest.raises(ScrapydResponseError):
+            api.list_versions(PROJECT)
+    assert api.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
 def test_request_timeout():
     """
     The client should raise an exception when the server does not respond
@@ -332,3 +581,131 @@ def test_daemon_status():
     assert 'pending' in rtn
     assert 'node_name' in rtn
     assert isinstance(rtn['finished'], int)
+
+
+def test_schedule_many():
+    mock_client = MagicMock()
+
+    def post(url, data, timeout):
+        if data['spider'] == 'broken':
+            raise ScrapydResponseError('spider not found')
+        return {'jobid': 'job-' + data['spider']}
+
+    mock_client.post.side_effect = post
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    requests = [
+        {'project': PROJECT, 'spider': 'one'},
+        {'project': PROJECT, 'spider': 'broken'},
+        {'project': PROJECT, 'spider': 'two', 'settings': {'A': 1},
+         'extra': 'value'},
+    ]
+    rtn = api.schedule_many(requests, max_workers=2)
+    assert rtn[0] == 'job-one'
+    assert isinstance(rtn[1], ScrapydResponseError)
+    assert str(rtn[1]) == 'spider not found'
+    assert rtn[2] == 'job-two'
+    assert mock_client.post.call_count == 3
+    mock_client.post.assert_any_call(
+        'http://localhost/schedule.json',
+        data={
+            'project': PROJECT,
+            'spider': 'two',
+            'setting': ['A=1'],
+            'extra': 'value'
+        },
+        timeout=None
+    )
+    assert api.schedule_many([]) == []
+
+
+def test_cancel_many():
+    with FakeScrapyd(pending_time=60) as server:
+        server.add_project(PROJECT)
+        api = ScrapydAPI(server.url)
+        running = api.schedule(PROJECT, SPIDER)
+        server.start_job(running)
+        pending = api.schedule(PROJECT, SPIDER)
+        rtn = api.cancel_many(PROJECT, [running, pending], max_workers=2)
+        assert rtn == {running: RUNNING, pending: PENDING}
+        assert server.job_state(running) == FINISHED
+        assert api.cancel_many(PROJECT, []) == {}
+
+
+def test_cancel_many_reports_errors_per_job():
+    mock_client = MagicMock()
+
+    def post(url, data, timeout):
+        if data['job'] == 'broken':
+            raise ScrapydResponseError('job not found')
+        return {'prevstate': RUNNING}
+
+    mock_client.post.side_effect = post
+    api = ScrapydAPI(HOST_URL, client=mock_client)
+    rtn = api.cancel_many(PROJECT, ['one', 'broken'])
+    assert rtn['one'] == RUNNING
+    assert isinstance(rtn['broken'], ScrapydResponseError)
+
+
+def test_cancel_many_escalates_after_grace_period():
+    # With no stop time, running jobs ignore every signal but KILL.
+    with FakeScrapyd(stop_time=None) as server:
+        server.add_project(PROJECT)
+        api = ScrapydAPI(server.url)
+        job_id = api.schedule(PROJECT, SPIDER)
+        server.start_job(job_id)
+        rtn = api.cancel_many(PROJECT, [job_id], grace_period=0.1,
+                              poll_interval=0.02)
+        assert rtn == {job_id: RUNNING}
+        assert server.job_signals(job_id) == [None, 'KILL']
+        assert server.job_state(job_id) == FINISHED
+
+
+def test_cancel_many_does_not_escalate_stopped_jobs():
+    with FakeScrapyd(stop_time=0.05) as server:
+        server.add_project(PROJECT)
+        api = ScrapydAPI(server.url)
+        job_id = api.schedule(PROJECT, SPIDER)
+        server.start_job(job_id)
+        api.cancel_many(PROJECT, [job_id], signal='TERM', grace_period=5,
+                        poll_interval=0.02)
+        assert server.job_signals(job_id) == ['TERM']
+        assert server.job_state(job_id) == FINISHED
+
+
+def test_cancel_matching():
+    with FakeScrapyd(pending_time=60) as server:
+        server.add_project(PROJECT, spiders=[SPIDER, 'other'])
+        api = ScrapydAPI(server.url)
+        first = api.schedule(PROJECT, SPIDER)
+        second = api.schedule(PROJECT, SPIDER)
+        server.start_job(second)
+        other = api.schedule(PROJECT, 'other')
+        rtn = api.cancel_matching(PROJECT, spider=SPIDER)
+        assert rtn == {first: PENDING, second: RUNNING}
+        assert server.job_state(other) == PENDING
+        assert api.cancel_matching(PROJECT, states=[RUNNING]) == {}
+
+
+def test_coalescing_is_opt_in():
+    assert ScrapydAPI(HOST_URL).coalesce is None
+    assert isinstance(ScrapydAPI(HOST_URL, coalesce=True).coalesce,
+                      SingleFlight)
+
+
+def test_concurrent_list_jobs_share_one_request():
+    with FakeScrapyd(latency=0.3) as server:
+        server.add_project(PROJECT)
+        server.add_history(PROJECT, 10)
+        api = ScrapydAPI(server.url, coalesce=True)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(api.list_jobs, PROJECT)
+                       for _ in range(10)]
+            futures.append(executor.submit(api.list_projects))
+            results = [future.result() for future in futures]
+        assert all(len(result['finished']) == 10 for result in results[:10])
+        assert results[10] == [PROJECT]
+        assert server.request_counts[LIST_JOBS_ENDPOINT] == 1
+        assert api.coalesce.shared == 9
+        # Writes are never coalesced.
+        assert api.cancel_many(PROJECT, ['a', 'b']) is not None
+        assert server.request_counts[CANCEL_ENDPOINT] == 2